@@ -1,123 +1,484 @@
 import os
+import time
+import threading
 import cv2          # OpenCV: Used to read and process images
 import json         # JSON: Used to parse data sent from the mobile app
-import pyodbc       # PyODBC: Used to connect to SQL Server
 import numpy as np  # NumPy: Used for vector math
-import pickle       # Pickle: Used to read the 'Brain' file
-from flask import Flask, request, jsonify
-from insightface.app import FaceAnalysis 
+from flask import Flask, request, jsonify, g, Response
 from scipy.spatial.distance import cosine
 from datetime import datetime 
+from collections import namedtuple
+from gallery import FaceGallery, load_gallery, match_faces_across  # Contiguous float32 matrix of known faces
+from matchers import build_matcher
+from enrolled_faces import EnrolledFaces   # Students enrolled into the DB since the last train.py run
+from image_decode import decode_image
+from inference_pool import InferenceScheduler, SchedulerBusy
+from db_pool import ConnectionPool
+from repository import build_repository, DB_BACKEND   # All SQL lives here (SQL Server / SQLite / PostgreSQL)
+from schedule_cache import ScheduleCache
+from attendance_journal import AttendanceJournal
+from checkin import check_in
+from scan_cache import ScanCache, content_digest
+import metrics   # Prometheus-style histograms served at GET /metrics
+
+STARTUP_BEGAN = time.perf_counter()   # Startup phases are reported relative to this (after library imports)
 
 # ==========================================
 # SECTION 1: CONFIGURATION
 # ==========================================
-SERVER_NAME = r'ABDULRHMANSEYAM'
-DATABASE_NAME = 'Attendsystem'
-BRAIN_FILE = 'face_encodings.pkl' 
+BRAIN_FILE = 'face_gallery.json'            # Binary gallery written by train.py (memory-mapped)
+LEGACY_BRAIN_FILE = 'face_encodings.pkl'    # Old pickle format, used only if BRAIN_FILE is missing
+ENGINE_PROFILE = 'kiosk'   # Detector size / model pack / ORT threads, see PROFILES in embedder.py
+ENGINE = os.environ.get("AMS_ENGINE", "insightface")   # 'stub' = deterministic fake model for load tests (stub_embedder.py)
+MATCH_MODE = 'exact'    # 'exact' = flat scan | 'centroid' = coarse-then-exact | 'ivf' = approximate (50k+ students)
+                        # 'int8' = flat scan of a 4x smaller int8 copy + float32 re-score of the top rows
+INDEX_FILE = os.path.splitext(BRAIN_FILE)[0] + f'.{MATCH_MODE}.npz'   # Saved ANN index (persistent modes only)
+BRAIN_POLL_SECONDS = 5      # How often to check the brain file for a new train.py run (0 = never)
+ENROLLED_SYNC_SECONDS = 5   # How often to pull faces enrolled/changed in the DB by enroll.py (0 = file gallery only)
+ADMIN_TOKEN = os.environ.get("AMS_ADMIN_TOKEN")   # If set, admin routes need header 'X-Admin-Token'
+INFERENCE_REPLICAS = 2      # Model copies serving scans in parallel (see inference_pool.py for batching)
+LAZY_MODELS = True          # Load gallery + models in a background thread: other routes are served right away
+WARMUP_SCAN = True          # One scan per replica on a bundled sample image before /kiosk_scan opens
+SCAN_TIMEOUT_SECONDS = 30
+MATCH_THRESHOLD = 0.5       # Minimum cosine similarity to accept a face as a student
+CLASSROOM_PROFILE = 'classroom'   # Large-detector profile for /classroom_scan room photos
+CLASSROOM_MAX_PHOTOS = 5
+CLASSROOM_MAX_SIDE = 2560   # Room photos keep more pixels than kiosk selfies (faces are small)
+CLASSROOM_MIN_FACE = 24     # Faces narrower than this (px) are too small to recognize reliably
+SCAN_CACHE = True           # Reuse results of recent rescans (same bytes / near-identical face), see scan_cache.py
+DB_POOL_SIZE = 10           # Max DB connections shared by all routes (see db_pool.py)
+SCHEDULE_TTL_SECONDS = 300  # Kiosk timetable cache refresh (also POST /admin/reload_schedule)
+ATTENDANCE_JOURNAL = 'attendance_journal.log'   # Check-ins are fsync'd to attendance_journal.<pid>.log (one per worker), then batch-written to the DB
+METRICS_SAMPLE_RATE = float(os.environ.get("AMS_METRICS_SAMPLE_RATE", "1.0"))   # Share of requests timed (0 = off)
 
 app = Flask(__name__)
 
+# Stage timings of sampled requests (seconds). Gauges are read at scrape time.
+SCAN_STAGE_SECONDS = metrics.REGISTRY.histogram(
+    'ams_kiosk_scan_stage_seconds', 'Time spent in each stage of /kiosk_scan', ['stage'])
+# Scheduler timings are per batch; everything else is per scan
+SCAN_STAGES = [('decode_ms', 'decode'), ('queue_ms', 'queue'), ('detect_ms', 'detection'),
+               ('embed_ms', 'embedding'), ('match_ms', 'gallery_match'), ('schedule_ms', 'schedule_query'),
+               ('write_ms', 'attendance_write')]
+SCAN_CACHE_HITS = metrics.REGISTRY.counter(
+    'ams_scan_cache_hits_total', 'Sampled kiosk scans answered from the scan cache', ['kind'])
+REQUEST_SECONDS = metrics.REGISTRY.histogram(
+    'ams_http_request_seconds', 'Request latency per route', ['route', 'method', 'status'])
+DB_ACQUIRE_SECONDS = metrics.REGISTRY.histogram(
+    'ams_db_acquire_seconds', 'Time to check a connection out of the DB pool')
+MODEL_LOAD_SECONDS = metrics.REGISTRY.gauge(
+    'ams_model_load_seconds', 'Time taken to load the face models, per profile', ['profile'])
+GALLERY_LOAD_SECONDS = metrics.REGISTRY.gauge(
+    'ams_gallery_load_seconds', 'Time taken by the last successful brain file load')
+STARTUP_SECONDS = metrics.REGISTRY.gauge(
+    'ams_startup_seconds', 'Seconds from app import until each startup phase was done '
+    '(serving, gallery, models, ready)', ['phase'])
+
+
+def startup_phase(phase):
+    seconds = time.perf_counter() - STARTUP_BEGAN
+    STARTUP_SECONDS.set(round(seconds, 3), phase)
+    return seconds
+
 # ==========================================
 # SECTION 2: THE AI BRAIN (FaceEngine)
 # ==========================================
+# Everything a scan needs from the trained gallery, swapped as ONE object on reload
+# gallery / matcher = the brain file, enrolled / enrolled_matcher = faces enrolled in the DB since
+class Brain(namedtuple('Brain', ['gallery', 'matcher', 'enrolled', 'enrolled_matcher', 'source', 'mtime', 'loaded_at'])):
+    __slots__ = ()
+
+    @property
+    def faces(self):
+        return len(self.gallery) + len(self.enrolled)
+
+    def identities(self):
+        return list(dict.fromkeys([*self.gallery.ids, *self.enrolled.ids]))
+
+    def search(self, probe):
+        """(student_id, name, score) of the best row of either gallery, or (None, None, 0.0) if both are empty"""
+        best = None, None, 0.0
+        for gallery, matcher in ((self.gallery, self.matcher), (self.enrolled, self.enrolled_matcher)):
+            if len(gallery):
+                row, score = matcher.search(probe)
+                if row >= 0 and (best[0] is None or score > best[2]):
+                    best = gallery.ids[row], gallery.names[row], score
+        return best
+
+    def match_faces(self, probes, threshold):
+        """[(face_index, student_id, name, score)], each student at most once across both galleries"""
+        return [(face, gallery.ids[row], gallery.names[row], score)
+                for face, gallery, row, score in match_faces_across([self.gallery, self.enrolled], probes, threshold)]
+
+class EngineNotReady(Exception):
+    """A scan arrived before the models finished loading. Callers should answer 503 / 'try again'."""
+
+def build_embedder(profile):
+    """Detection + recognition models for `profile` (imported lazily: the stub needs no InsightFace)"""
+    if ENGINE == 'stub':
+        from stub_embedder import StubEmbedder
+        return StubEmbedder.from_profile(profile)
+    from embedder import FaceEmbedder
+    return FaceEmbedder.from_profile(profile)
+
 class FaceEngine:
     def __init__(self):
-        print("⏳ FaceEngine: Loading AI Models...")
-        self.app = FaceAnalysis(name='buffalo_l', providers=['CPUExecutionProvider'])
-        self.app.prepare(ctx_id=0, det_size=(640, 640))
+        # Scans are detected + embedded by a pool of model replicas with micro-batching.
+        # It is created by _warm_start(); until `ready` is set, scans raise EngineNotReady.
+        self.scheduler = None
+        self.ready = threading.Event()
+        self.startup_error = None
         
-        self.known_faces = [] 
-        self.known_names = []
-        self.known_ids = []
+        # Connections are opened lazily and reused across requests
+        self.repo = build_repository(DB_BACKEND)
+        self.db_pool = ConnectionPool(self.get_db_connection, max_size=DB_POOL_SIZE,
+                                      on_acquire=self._observe_db_acquire)
+        self.schedule = ScheduleCache(self.repo, self.db, ttl_seconds=SCHEDULE_TTL_SECONDS)
+        self.journal = AttendanceJournal(self.repo, self.db, path=ATTENDANCE_JOURNAL)
+        self.enrolled = EnrolledFaces(self.repo, self.db)
         
-        self.load_brain_from_file()
+        self.scan_cache = ScanCache() if SCAN_CACHE else None
 
-    def get_db_connection(self):
-        conn_str = (
-            f"Driver={{SQL Server}};"
-            f"Server={SERVER_NAME};"
-            f"Database={DATABASE_NAME};"
-            f"Trusted_Connection=yes;"
-        )
-        return pyodbc.connect(conn_str)
+        empty = FaceGallery()
+        self.brain = Brain(empty, build_matcher(MATCH_MODE, empty), empty, build_matcher('exact', empty), None, None, None)
+        self._reload_lock = threading.Lock()
 
-    def load_brain_from_file(self):
-        print(f"🔄 FaceEngine: Loading Brain from {BRAIN_FILE}...")
-        
-        if not os.path.exists(BRAIN_FILE):
-            print(f"⚠️ WARNING: {BRAIN_FILE} not found! Run train.py first.")
-            return
+        # Loaded on the first /classroom_scan (most deployments only use kiosks)
+        self._classroom_embedder = None
+        self._classroom_lock = threading.Lock()
 
-        try:
-            with open(BRAIN_FILE, 'rb') as f:
-                data = pickle.load(f)
+        if LAZY_MODELS:
+            threading.Thread(target=self._warm_start, name="model-loader", daemon=True).start()
+        else:
+            self._warm_start()
 
-            self.known_faces = data['embeddings']
-            raw_labels = data['names']
-            
-            self.known_names = []
-            self.known_ids = []
+    def get_db_connection(self):
+        return self.repo.connect()
+
+    def db(self):
+        """Pooled connection: `with engine.db() as conn:` (always returned, even on errors)"""
+        return self.db_pool.connection()
 
-            for label in raw_labels:
+    def _observe_db_acquire(self, seconds):
+        # Also called from the journal flusher and schedule reloads, so sampled per checkout
+        if metrics.sampled(METRICS_SAMPLE_RATE):
+            DB_ACQUIRE_SECONDS.observe(seconds)
+
+    def _warm_start(self):
+        """Gallery, then the model replicas, then a warm-up scan on each; sets `ready` when scans can be served"""
+        try:
+            self.load_brain_from_file()
+            startup_phase('gallery')
+            if BRAIN_POLL_SECONDS:
+                threading.Thread(target=self._watch_brain_file, daemon=True).start()
+            if ENROLLED_SYNC_SECONDS:
+                threading.Thread(target=self._watch_enrolled, name="enrolled-sync", daemon=True).start()
+
+            print("⏳ FaceEngine: Loading AI Models...")
+            started = time.perf_counter()
+            scheduler = InferenceScheduler(
+                lambda: build_embedder(ENGINE_PROFILE),
+                replicas=INFERENCE_REPLICAS
+            )
+            MODEL_LOAD_SECONDS.set(round(time.perf_counter() - started, 3), ENGINE_PROFILE)
+            startup_phase('models')
+
+            if WARMUP_SCAN:
+                started = time.perf_counter()
                 try:
-                    if " - " in label:
-                        name, sid = label.rsplit(" - ", 1)
-                    else:
-                        name = label
-                        sid = "Unknown"
-
-                    self.known_names.append(name)
-                    self.known_ids.append(sid)
+                    scheduler.warm_up()
+                    print(f"🔥 FaceEngine: Warm-up scan on {len(scheduler.replicas)} replica(s) took "
+                          f"{time.perf_counter() - started:.2f}s")
                 except Exception as e:
-                    self.known_names.append(label)
-                    self.known_ids.append("Unknown")
-
-            print(f"✅ FaceEngine: Loaded {len(self.known_faces)} faces from file.")
+                    print(f"⚠️ Warm-up scan failed ({e}), the first scans will be slower")
 
+            self.scheduler = scheduler
+            self._check_model_name(self.brain.gallery)
         except Exception as e:
-            print(f"❌ Error loading brain file: {e}")
+            self.startup_error = f"Model loading failed: {e}"
+            print(f"❌ FaceEngine: {self.startup_error}")
+            return
+
+        self.ready.set()
+        print(f"✅ FaceEngine: Ready for scans {startup_phase('ready'):.1f}s after startup.")
+
+    def _check_model_name(self, gallery):
+        if self.scheduler and gallery.model_name and gallery.model_name != self.scheduler.model_name:
+            print(f"⚠️ WARNING: Brain was trained with {gallery.model_name}, server runs {self.scheduler.model_name}. Retrain!")
+
+    def brain_source(self):
+        if not os.path.exists(BRAIN_FILE) and os.path.exists(LEGACY_BRAIN_FILE):
+            return LEGACY_BRAIN_FILE
+        return BRAIN_FILE
+
+    def load_brain_from_file(self):
+        """
+        Loads the gallery + matcher into a new Brain and swaps it in with one assignment.
+        Scans already running keep the Brain they started with. Faces enrolled in the
+        database are re-read in full into the Brain's enrolled gallery. Returns True on success.
+        """
+        with self._reload_lock:
+            brain_file = self.brain_source()
+            if brain_file != BRAIN_FILE:
+                print(f"⚠️ {BRAIN_FILE} not found, falling back to {LEGACY_BRAIN_FILE}. Run convert_brain.py once to switch.")
 
-    def verify_face(self, image_path):
-        img = cv2.imread(image_path)
+            print(f"🔄 FaceEngine: Loading Brain from {brain_file}...")
+            
+            try:
+                started = time.perf_counter()
+                if os.path.exists(brain_file):
+                    mtime = os.path.getmtime(brain_file)
+                    base = load_gallery(brain_file)
+                    self._check_model_name(base)
+                else:
+                    print(f"⚠️ WARNING: {BRAIN_FILE} not found! Run train.py first.")
+                    brain_file, mtime, base = None, None, FaceGallery()
+
+                enrolled = self._load_enrolled(base)
+                if len(base) == 0 and len(enrolled) == 0 and brain_file is None:
+                    return False
+                matcher = build_matcher(MATCH_MODE, base, index_path=INDEX_FILE)
+
+                self.brain = Brain(base, matcher, enrolled, build_matcher('exact', enrolled),
+                                   brain_file, mtime, datetime.now())
+                GALLERY_LOAD_SECONDS.set(round(time.perf_counter() - started, 3))
+                if self.scan_cache:
+                    self.scan_cache.clear()   # Cached identities came from the old gallery
+                print(f"✅ FaceEngine: Loaded {len(base)} faces from file + {len(enrolled)} enrolled "
+                      f"({MATCH_MODE} matching).")
+                return True
+
+            except Exception as e:
+                print(f"❌ Error loading brain file: {e}")
+                return False
+
+    def _watch_brain_file(self):
+        """Background thread: reload when train.py (or convert_brain.py) writes a new brain file"""
+        while True:
+            time.sleep(BRAIN_POLL_SECONDS)
+            try:
+                brain_file = self.brain_source()
+                if not os.path.exists(brain_file):
+                    continue
+                if brain_file != self.brain.source or os.path.getmtime(brain_file) != self.brain.mtime:
+                    print(f"🔁 FaceEngine: {brain_file} changed on disk, hot-reloading...")
+                    self.load_brain_from_file()
+            except Exception as e:
+                print(f"❌ Brain watcher error: {e}")
+
+    def _load_enrolled(self, base):
+        """Gallery of every face enrolled in the database (empty if the read fails)"""
+        if ENROLLED_SYNC_SECONDS:
+            try:
+                self.enrolled.sync(full=True)
+            except Exception as e:
+                print(f"⚠️ Could not read enrolled faces from the database ({e}), serving the brain file only.")
+        return self.enrolled.gallery(model_name=base.model_name)
+
+    def sync_enrolled(self):
+        """
+        Pulls faces enrolled or changed since the last sync and, if there are any,
+        swaps in a Brain with a rebuilt enrolled gallery (exact matcher: it is small).
+        The brain file's gallery and matcher are shared, never copied or re-indexed.
+        A quiet database costs one indexed query. Returns how many students changed.
+        """
+        with self._reload_lock:
+            changed = self.enrolled.sync()
+            if not changed:
+                return 0
+            started = time.perf_counter()
+            brain = self.brain
+            enrolled = self.enrolled.gallery(model_name=brain.gallery.model_name)
+            self.brain = brain._replace(enrolled=enrolled, enrolled_matcher=build_matcher('exact', enrolled),
+                                        loaded_at=datetime.now())
+            if self.scan_cache:
+                self.scan_cache.clear()   # A re-enrolled face may now match differently
+            print(f"🆕 FaceEngine: {changed} enrolled student(s) changed, {len(enrolled)} enrolled faces live "
+                  f"({(time.perf_counter() - started):.2f}s)")
+            return changed
+
+    def _watch_enrolled(self):
+        """Background thread: new enrollments go live within ENROLLED_SYNC_SECONDS, no retrain"""
+        while True:
+            time.sleep(ENROLLED_SYNC_SECONDS)
+            try:
+                self.sync_enrolled()
+            except Exception as e:
+                print(f"❌ Enrolled faces sync error: {e}")
+
+    def _require_ready(self):
+        if not self.ready.is_set():
+            raise EngineNotReady(self.startup_error or "Face models are still loading")
+
+    def load_image(self, image):
+        """Accepts upload bytes (decoded in memory), an already-decoded BGR array or a file path"""
+        if isinstance(image, np.ndarray):
+            return image
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            return decode_image(image)
+        return cv2.imread(image)
+
+    def verify_face(self, image, timings=None, classroom_id=None):
+        """
+        Returns (student_id, name, score). If a `timings` dict is given it is filled
+        with decode_ms, the inference pool's queue_ms / compute_ms / detect_ms / embed_ms
+        and match_ms (or 'cache' on a cache hit).
+        Raises EngineNotReady while the models are still loading and SchedulerBusy
+        when too many scans are already waiting.
+
+        Upload bytes go through the scan cache: the same bytes again skip everything,
+        a near-identical face in the same `classroom_id` skips the gallery search.
+        """
+        self._require_ready()
+        cache = self.scan_cache if isinstance(image, (bytes, bytearray, memoryview)) else None
+        if cache:
+            digest = content_digest(image)
+            result = cache.lookup_upload(digest)
+            if result is not None:
+                if timings is not None:
+                    timings['cache'] = 'upload'
+                return result
+
+        result = self._verify_uncached(image, timings, cache, classroom_id)
+        if cache:
+            cache.put_upload(digest, result)
+        return result
+
+    def _verify_uncached(self, image, timings, cache, classroom_id):
+        started = time.perf_counter()
+        img = self.load_image(image)
+        if timings is not None:
+            timings['decode_ms'] = (time.perf_counter() - started) * 1000
         if img is None:
             return None, "Invalid Image", 0.0
 
-        faces = self.app.get(img)
-        if not faces:
+        # Only the biggest face is aligned and embedded (already unit-length)
+        bbox, target_embedding, timing = self.scheduler.embed_largest_face(img, timeout=SCAN_TIMEOUT_SECONDS)
+        if timings is not None:
+            timings.update(timing)
+        if target_embedding is None:
             return None, "No Face Detected", 0.0
-        
-        faces.sort(
-            key=lambda x: (x.bbox[2]-x.bbox[0]) * (x.bbox[3]-x.bbox[1]),
-            reverse=True
-        )
-        target_embedding = faces[0].embedding
-        target_embedding = target_embedding / np.linalg.norm(target_embedding)
-
-        if not self.known_faces:
+
+        # Same person rescanning in this room a moment ago?
+        if cache:
+            result = cache.lookup_probe(classroom_id, target_embedding)
+            if result is not None:
+                if timings is not None:
+                    timings['cache'] = 'probe'
+                return result
+
+        # One snapshot for the whole match, even if a reload swaps self.brain meanwhile
+        brain = self.brain
+        if brain.faces == 0:
             return None, "System not trained yet", 0.0
 
-        similarities = np.dot(self.known_faces, target_embedding)
-        best_idx = np.argmax(similarities)
-        max_score = float(similarities[best_idx])
+        started = time.perf_counter()
+        student_id, name, max_score = brain.search(target_embedding)
+        if timings is not None:
+            timings['match_ms'] = (time.perf_counter() - started) * 1000
 
-        if max_score > 0.5:
-            return self.known_ids[best_idx], self.known_names[best_idx], max_score
+        if max_score > MATCH_THRESHOLD:
+            result = student_id, name, max_score
+            if cache:
+                cache.put_probe(classroom_id, target_embedding, result)
+            return result
             
         return None, "Unknown Face", max_score
 
+    def _classroom_model(self):
+        """The classroom embedder, loaded by the first caller (concurrent first callers wait for it)"""
+        with self._classroom_lock:
+            if self._classroom_embedder is None:
+                started = time.perf_counter()
+                self._classroom_embedder = build_embedder(CLASSROOM_PROFILE)
+                MODEL_LOAD_SECONDS.set(round(time.perf_counter() - started, 3), CLASSROOM_PROFILE)
+            # Used outside the lock: ONNX Runtime sessions run concurrent calls safely
+            return self._classroom_embedder
+
+    def verify_classroom(self, photos):
+        """
+        Recognizes every face in one or more room photos (upload bytes).
+        Returns (faces_found, [(student_id, name, score)]); all faces of all photos
+        are matched together, so each student appears at most once.
+        """
+        self._require_ready()   # The gallery is loaded by then (the classroom models load on first use)
+        images = [decode_image(photo, max_side=CLASSROOM_MAX_SIDE) for photo in photos]
+        images = [img for img in images if img is not None]
+
+        embedder = self._classroom_model()
+        found = [embedder.embed_all_faces(img, min_face=CLASSROOM_MIN_FACE)[1] for img in images]
+
+        brain = self.brain
+        probes = np.vstack(found) if found else np.zeros((0, brain.gallery.dim), dtype=np.float32)
+        return len(probes), [(student_id, name, score) for _, student_id, name, score in brain.match_faces(probes, MATCH_THRESHOLD)]
+
 # ==========================================
 # SECTION 3: INITIALIZATION
 # ==========================================
 engine = FaceEngine()
+startup_phase('serving')
+
+metrics.REGISTRY.gauge('ams_gallery_faces', 'Face embeddings in the served gallery', function=lambda: engine.brain.faces)
+metrics.REGISTRY.gauge('ams_gallery_identities', 'Students in the served gallery',
+                       function=lambda: len(engine.brain.identities()))
+metrics.REGISTRY.gauge('ams_inference_queue_depth', 'Scans waiting for a model replica',
+                       function=lambda: engine.scheduler.stats()["queue_depth"])
+metrics.REGISTRY.gauge('ams_db_connections_in_use', 'DB connections checked out of the pool',
+                       function=lambda: engine.db_pool.stats()["in_use"])
+metrics.REGISTRY.gauge('ams_attendance_journal_pending', 'Journaled check-ins not yet written to the DB',
+                       function=lambda: engine.journal.stats()["pending"])
 
 # ==========================================
 # SECTION 4: API ROUTES 
 # ==========================================
+@app.before_request
+def start_request_timer():
+    # Sampling is decided once per request; unsampled requests record nothing
+    g.sampled = metrics.sampled(METRICS_SAMPLE_RATE)
+    if g.sampled:
+        g.request_started = time.perf_counter()
+
+@app.after_request
+def record_metrics(response):
+    if not g.get('sampled'):
+        return response
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    REQUEST_SECONDS.observe(time.perf_counter() - g.request_started, route, request.method, response.status_code)
+
+    timings = g.get('scan_timings')
+    if timings:
+        for key, stage in SCAN_STAGES:
+            if key in timings:
+                SCAN_STAGE_SECONDS.observe(timings[key] / 1000, stage)
+        if 'cache' in timings:
+            SCAN_CACHE_HITS.inc(timings['cache'])
+    return response
+
+@app.after_request
+def add_server_timing(response):
+    # Per-request queue-wait vs compute time, visible in browser dev tools / load tests
+    timings = g.get('scan_timings')
+    if timings:
+        parts = []
+        if 'queue_ms' in timings:
+            parts.append(f"queue;dur={timings['queue_ms']:.1f}, compute;dur={timings['compute_ms']:.1f}, "
+                         f"batch;desc=\"{timings['batch_size']} scans\"")
+        if 'cache' in timings:
+            parts.append(f"cache;desc=\"{timings['cache']} hit\"")
+        response.headers['Server-Timing'] = ", ".join(parts)
+    return response
+
 @app.route('/')
 def home():
     return "✅ AMS Server is Running (PRODUCTION MODE)!"
 
+@app.route('/ready', methods=['GET'])
+def readiness():
+    """Readiness probe: 200 once scans can be served (gallery + models loaded and warmed up), else 503"""
+    if engine.ready.is_set():
+        return jsonify({"ready": True, "faces": engine.brain.faces}), 200
+    return jsonify({"ready": False, "error": engine.startup_error}), 503
+
 # ------------------------------------------
 # A. UNIFIED LOGIN (Replaces the 3 old functions)
 # ------------------------------------------
@@ -132,49 +493,40 @@ def login():
         if not identifier or not password:
             return jsonify({"success": False, "message": "Missing Credentials"}), 400
 
-        conn = engine.get_db_connection()
-        cursor = conn.cursor()
+        with engine.db() as conn:
+            # 1. CHECK STUDENT TABLE (Only if identifier is numeric)
+            if identifier.isdigit():
+                student = engine.repo.find_student(conn, identifier, password)
+                if student:
+                    return jsonify({
+                        "success": True,
+                        "role": "Student",
+                        "id": student.id,
+                        "name": f"{student.first_name} {student.last_name}"
+                    }), 200
+
+            # 2. CHECK INSTRUCTOR TABLE
+            instr = engine.repo.find_instructor(conn, identifier, password)
+            if instr:
+                return jsonify({
+                    "success": True,
+                    "role": "Instructor",
+                    "id": instr.id,
+                    "name": f"{instr.role}. {instr.first_name} {instr.last_name}"
+                }), 200
 
-        # 1. CHECK STUDENT TABLE (Only if identifier is numeric)
-        if identifier.isdigit():
-            cursor.execute("SELECT id, first_name, last_name FROM student WHERE id = ? AND password = ?", (identifier, password))
-            student = cursor.fetchone()
-            if student:
-                conn.close()
+            # 3. CHECK ADMIN TABLE
+            admin = engine.repo.find_admin(conn, identifier, password)
+            if admin:
                 return jsonify({
                     "success": True,
-                    "role": "Student",
-                    "id": student.id,
-                    "name": f"{student.first_name} {student.last_name}"
+                    "role": "Admin", 
+                    "id": admin.id,
+                    "name": admin.full_name
                 }), 200
 
-        # 2. CHECK INSTRUCTOR TABLE
-        cursor.execute("SELECT id, first_name, last_name, role FROM instructor WHERE username = ? AND password = ?", (identifier, password))
-        instr = cursor.fetchone()
-        if instr:
-            conn.close()
-            return jsonify({
-                "success": True,
-                "role": "Instructor",
-                "id": instr.id,
-                "name": f"{instr.role}. {instr.first_name} {instr.last_name}"
-            }), 200
-
-        # 3. CHECK ADMIN TABLE
-        cursor.execute("SELECT id, full_name, role FROM admin WHERE username = ? AND password = ?", (identifier, password))
-        admin = cursor.fetchone()
-        if admin:
-            conn.close()
-            return jsonify({
-                "success": True,
-                "role": "Admin", 
-                "id": admin.id,
-                "name": admin.full_name
-            }), 200
-
-        # 4. IF NO MATCH
-        conn.close()
-        return jsonify({"success": False, "message": "Invalid Credentials"}), 401
+            # 4. IF NO MATCH
+            return jsonify({"success": False, "message": "Invalid Credentials"}), 401
 
     except Exception as e:
         print(f"❌ Login Error: {e}")
@@ -195,124 +547,167 @@ def kiosk_scan():
     except ValueError:
         return jsonify({"match": False, "message": "Invalid Classroom ID format"}), 400
     
-    # 2. AI Prediction
-    temp_path = "temp_scan.jpg"
+    # 2. AI Prediction (decoded straight from the upload, never written to disk)
     try:
-        file.save(temp_path)
-        student_id, student_name, confidence = engine.verify_face(temp_path)
+        g.scan_timings = {}
+        student_id, student_name, confidence = engine.verify_face(file.read(), timings=g.scan_timings,
+                                                                  classroom_id=current_room_id)
+    except EngineNotReady:
+        return jsonify({"match": False, "message": "Face recognition is starting up, please try again in a few seconds."}), 503
+    except SchedulerBusy:
+        return jsonify({"match": False, "message": "Too many scans right now, please try again."}), 503
     except Exception as e:
         print(f"❌ Face verification error: {e}")
         return jsonify({"match": False, "message": "Verification failed"}), 500
-    finally:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
 
     if not student_id or student_id == "Unknown":
         return jsonify({"match": False, "message": "Couldn't Find You!"}), 401
 
-    # 3. SMART SCHEDULE ANALYSIS
+    # 3. SMART SCHEDULE ANALYSIS (today's timetable is cached in memory, see checkin.py)
     try:
-        conn = engine.get_db_connection()
-        cursor = conn.cursor()
-
-        # QUERY: Get ALL classes for this student TODAY
-        query = """
-        SELECT 
-            s.session_id, 
-            c.name, 
-            s.classroom_id, 
-            s.session_start, 
-            s.session_end,
-            s.session_type
-        FROM class_session s
-        JOIN enrollment e ON s.course_id = e.course_id
-        JOIN course c ON s.course_id = c.id
-        WHERE 
-            e.student_id = ? 
-            AND s.session_status = 'Scheduled'
-            AND CAST(s.session_start AS DATE) = CAST(GETDATE() AS DATE)
-        """
-        
-        cursor.execute(query, (student_id,))
-        todays_sessions = cursor.fetchall()
-        
-        if not todays_sessions:
-            conn.close()
-            return jsonify({
-                "match": False, 
-                "message": f"Hello {student_name}, you have no classes scheduled for today!"
-            }), 403
+        payload, status = check_in(engine.schedule, engine.journal, student_id, student_name, current_room_id,
+                                   timings=g.scan_timings)
+        return jsonify(payload), status
 
-        now = datetime.now()
-        perfect_session = None
-        error_messages = []
+    except Exception as e:
+        print(f"❌ Server Error: {e}")
+        return jsonify({"match": False, "message": "Server Database Error"}), 500
 
-        for session in todays_sessions:
-            s_id, c_name, room_id, start, end, s_type = session
-            
-            # Helper text for PR/TH
-            type_str = "(Practical)" if s_type == 'PR' else "(Theory)"
-            full_c_name = f"{c_name} {type_str}"
+# ------------------------------------------
+# B2. ADMIN APIs (hot reload, schedule cache, attendance journal, inference stats, metrics)
+# ------------------------------------------
+def is_admin_request():
+    return not ADMIN_TOKEN or request.headers.get('X-Admin-Token') == ADMIN_TOKEN
+
+@app.route('/admin/reload_gallery', methods=['POST'])
+def reload_gallery():
+    if not is_admin_request():
+        return jsonify({"success": False, "message": "Forbidden"}), 403
+
+    if not engine.load_brain_from_file():
+        return jsonify({"success": False, "message": "Reload failed, still serving the previous gallery"}), 500
+
+    brain = engine.brain
+    return jsonify({
+        "success": True,
+        "faces": brain.faces,
+        "people": len(brain.identities()),
+        "source": brain.source,
+        "enrolled": engine.enrolled.stats(),
+        "loaded_at": brain.loaded_at.isoformat(timespec='seconds')
+    }), 200
+
+@app.route('/admin/reload_schedule', methods=['POST'])
+def reload_schedule():
+    """Call after editing today's sessions or enrollments so kiosks see it immediately"""
+    if not is_admin_request():
+        return jsonify({"success": False, "message": "Forbidden"}), 403
 
-            is_room_correct = (room_id == current_room_id)
-            is_time_correct = (start <= now <= end)
+    try:
+        engine.schedule.invalidate()
+    except Exception as e:
+        print(f"❌ Schedule reload error: {e}")
+        return jsonify({"success": False, "message": "Reload failed"}), 500
+    return jsonify({"success": True, "schedule": engine.schedule.stats()}), 200
 
-            if is_room_correct and is_time_correct:
-                perfect_session = session
-                break 
-            
-            # Error Generation
-            if is_time_correct and not is_room_correct:
-                error_messages.append(f"Wrong Place! Your {full_c_name} is in Room {room_id}.")
-            
-            elif is_room_correct and not is_time_correct:
-                start_str = start.strftime("%I:%M %p")
-                error_messages.append(f"Wrong Time! {full_c_name} starts at {start_str}.")
-            
-            elif not is_room_correct and not is_time_correct:
-                start_str = start.strftime("%I:%M %p")
-                error_messages.append(f"Mismatch: {full_c_name} is in Room {room_id} at {start_str}.")
-
-        # 4. HANDLE RESULTS
-        if perfect_session:
-            s_id, c_name, room_id, start, end, s_type = perfect_session
-            type_str = "(Practical)" if s_type == 'PR' else "(Theory)"
-            
-            # Check duplication
-            cursor.execute("SELECT id FROM attendance_record WHERE session_id = ? AND student_id = ?", (s_id, student_id))
-            if cursor.fetchone():
-                msg = f"Welcome, {student_name}!\nYou are already marked present."
-            else:
-                cursor.execute("""
-                    INSERT INTO attendance_record (session_id, student_id, status, marked_at, method)
-                    VALUES (?, ?, 'Present', GETDATE(), 'FaceID')
-                """, (s_id, student_id))
-                conn.commit()
-                msg = f"Welcome, {student_name}!\nAttendance marked for {c_name} {type_str}.\nFocus to get the best marks!"
-
-            conn.close()
-            return jsonify({
-                "match": True,
-                "student": student_name,
-                "student_id": student_id,   
-                "message": msg
-            }), 200
+@app.route('/admin/attendance_journal', methods=['GET', 'POST'])
+def attendance_journal():
+    """GET: pending/flushed counts. POST: write every pending check-in to the DB now."""
+    if not is_admin_request():
+        return jsonify({"success": False, "message": "Forbidden"}), 403
 
-        else:
-            conn.close()
-            if error_messages:
-                final_error = "\n".join(error_messages)
-            else:
-                final_error = "No active class found for you right now."
+    if request.method == 'POST':
+        try:
+            engine.journal.flush()
+        except Exception as e:
+            print(f"❌ Attendance flush error: {e}")
+            return jsonify({"success": False, "message": "Flush failed", "journal": engine.journal.stats()}), 500
+    return jsonify({"success": True, "journal": engine.journal.stats()}), 200
+
+@app.route('/admin/inference_stats', methods=['GET'])
+def inference_stats():
+    if not is_admin_request():
+        return jsonify({"success": False, "message": "Forbidden"}), 403
+    return jsonify({
+        "success": True,
+        "inference": engine.scheduler.stats() if engine.scheduler else None,
+        "scan_cache": engine.scan_cache.stats() if engine.scan_cache else None
+    }), 200
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus scrape target (timings, gallery size, model load time; no student data)"""
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4')
 
-            return jsonify({
-                "match": False, 
-                "message": final_error
-            }), 403
+# ------------------------------------------
+# B3. CLASSROOM SCAN (a whole room from one or a few photos)
+# ------------------------------------------
+@app.route('/classroom_scan', methods=['POST'])
+def classroom_scan():
+    # 1. Validation
+    photos = request.files.getlist('images') or request.files.getlist('image')
+    if not photos or 'classroom_id' not in request.form:
+        return jsonify({"success": False, "message": "Missing images or classroom ID"}), 400
+    if len(photos) > CLASSROOM_MAX_PHOTOS:
+        return jsonify({"success": False, "message": f"At most {CLASSROOM_MAX_PHOTOS} photos per scan"}), 400
 
+    try:
+        room_id = int(request.form['classroom_id'])
+    except ValueError:
+        return jsonify({"success": False, "message": "Invalid Classroom ID format"}), 400
+
+    # 2. The class running in this room right now (from the cached timetable)
+    now = datetime.now()
+    try:
+        active = [s for s in engine.schedule.sessions_in_classroom(room_id) if s.session_start <= now <= s.session_end]
     except Exception as e:
         print(f"❌ Server Error: {e}")
-        return jsonify({"match": False, "message": "Server Database Error"}), 500
+        return jsonify({"success": False, "message": "Server Database Error"}), 500
+
+    if not active:
+        return jsonify({"success": False, "message": f"No class is running in Room {room_id} right now."}), 403
+    session = active[0]
+
+    # 3. Every face in every photo, matched in one pass
+    try:
+        faces, matches = engine.verify_classroom([photo.read() for photo in photos])
+    except EngineNotReady:
+        return jsonify({"success": False, "message": "Face recognition is starting up, please try again in a few seconds."}), 503
+    except Exception as e:
+        print(f"❌ Classroom verification error: {e}")
+        return jsonify({"success": False, "message": "Verification failed"}), 500
+
+    marked, already_marked, not_enrolled = [], [], []
+    for student_id, name, score in matches:
+        entry = {"id": student_id, "name": name, "score": round(score, 3)}
+        if not any(s.session_id == session.session_id for s in engine.schedule.sessions_for_student(student_id)):
+            not_enrolled.append(entry)
+        elif engine.schedule.is_marked(session.session_id, student_id):
+            already_marked.append(entry)
+        else:
+            marked.append(entry)
+
+    # 4. Journal the marks like kiosk check-ins (written to the DB in the background)
+    try:
+        added = engine.journal.record_many([(session.session_id, entry["id"]) for entry in marked], marked_at=now)
+    except OSError as e:
+        print(f"❌ Attendance journal error: {e}")
+        return jsonify({"success": False, "message": "Could not record attendance"}), 500
+    already_marked += [entry for entry, new in zip(marked, added) if not new]   # Marked by a kiosk meanwhile
+    marked = [entry for entry, new in zip(marked, added) if new]
+    for entry in marked:
+        engine.schedule.mark(session.session_id, entry["id"])
+
+    return jsonify({
+        "success": True,
+        "session_id": session.session_id,
+        "course": session.name,
+        "faces": faces,
+        "unknown_faces": faces - len(matches),
+        "marked": marked,
+        "already_marked": already_marked,
+        "not_enrolled": not_enrolled
+    }), 200
 
 # ------------------------------------------
 # C. STUDENT DASHBOARD APIs
@@ -321,26 +716,18 @@ def kiosk_scan():
 def get_student_courses():
     try:
         student_id = request.form.get('student_id')
-        conn = engine.get_db_connection()
-        cursor = conn.cursor()
         
-        query = """
-        SELECT c.id, c.name, i.first_name + ' ' + i.last_name as instructor
-        FROM enrollment e
-        JOIN course c ON e.course_id = c.id
-        JOIN instructor i ON c.instructor_id = i.id
-        WHERE e.student_id = ?
-        """
-        cursor.execute(query, (student_id,))
+        with engine.db() as conn:
+            rows = engine.repo.student_courses(conn, student_id)
+
         courses = []
-        for row in cursor.fetchall():
+        for row in rows:
             courses.append({
                 "course_id": row.id,
                 "course_name": row.name,
-                "instructor": row.instructor
+                "instructor": f"{row.instructor_first} {row.instructor_last}"
             })
             
-        conn.close()
         return jsonify({"success": True, "courses": courses}), 200
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
@@ -350,31 +737,16 @@ def get_course_details():
     try:
         student_id = request.form.get('student_id')
         course_id = request.form.get('course_id')
-        
-        conn = engine.get_db_connection()
-        cursor = conn.cursor()
-
-        query = """
-        SELECT 
-            cs.session_id, cs.session_type, cs.classroom_id, 
-            cs.session_start, cs.session_end, 
-            i.first_name + ' ' + i.last_name as instructor_name,
-            ar.marked_at
-        FROM class_session cs
-        JOIN instructor i ON cs.instructor_id = i.id
-        LEFT JOIN attendance_record ar 
-            ON ar.session_id = cs.session_id AND ar.student_id = ?
-        WHERE cs.course_id = ?
-        ORDER BY cs.session_start ASC
-        """
-        cursor.execute(query, (student_id, course_id))
-        rows = cursor.fetchall()
+
+        with engine.db() as conn:
+            rows = engine.repo.course_schedule(conn, student_id, course_id)
         
         schedule = []
         now = datetime.now()
 
         for row in rows:
-            s_id, s_type, room, start, end, instr, marked_at = row
+            s_id, s_type, room, start, end, instr_first, instr_last, marked_at = row
+            instr = f"{instr_first} {instr_last}"
             type_str = "Practical (Lab)" if s_type == 'PR' else "Theoretical (Lecture)"
             
             status = ""
@@ -400,7 +772,6 @@ def get_course_details():
                 "ui_color": color
             })
 
-        conn.close()
         return jsonify({"success": True, "schedule": schedule}), 200
 
     except Exception as e:
@@ -414,20 +785,18 @@ def get_course_details():
 def get_my_courses():
     try:
         instructor_id = request.form.get('instructor_id')
-        conn = engine.get_db_connection()
-        cursor = conn.cursor()
         
-        query = "SELECT id, name, credit_hours FROM course WHERE instructor_id = ?"
-        cursor.execute(query, (instructor_id,))
+        with engine.db() as conn:
+            rows = engine.repo.instructor_courses(conn, instructor_id)
+
         courses = []
-        for row in cursor.fetchall():
+        for row in rows:
             courses.append({
                 "id": row.id,
                 "name": row.name,
                 "credits": row.credit_hours
             })
             
-        conn.close()
         return jsonify({"success": True, "courses": courses}), 200
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
@@ -437,38 +806,21 @@ def get_session_attendance():
     try:
         course_id = request.form.get('course_id')
         date_str = request.form.get('date', datetime.now().strftime('%Y-%m-%d'))
-        
-        conn = engine.get_db_connection()
-        cursor = conn.cursor()
-
-        query = """
-        SELECT 
-            st.first_name + ' ' + st.last_name AS student_name,
-            st.id AS student_id,
-            CASE WHEN ar.marked_at IS NOT NULL THEN 'Present' ELSE 'Absent' END AS status,
-            ISNULL(FORMAT(ar.marked_at, 'hh:mm tt'), '--') AS check_in_time,
-            cs.session_type
-        FROM enrollment e
-        JOIN student st ON e.student_id = st.id
-        JOIN class_session cs ON cs.course_id = e.course_id
-        LEFT JOIN attendance_record ar ON ar.student_id = st.id AND ar.session_id = cs.session_id
-        WHERE e.course_id = ? AND CAST(cs.session_start AS DATE) = ?
-        ORDER BY st.first_name
-        """
-        cursor.execute(query, (course_id, date_str))
-        rows = cursor.fetchall()
+        day = datetime.strptime(date_str, '%Y-%m-%d').date()
+
+        with engine.db() as conn:
+            rows = engine.repo.session_attendance(conn, course_id, day)
         
         attendance_list = []
         for row in rows:
             attendance_list.append({
-                "name": row.student_name,
+                "name": f"{row.first_name} {row.last_name}",
                 "id": row.student_id,
-                "status": row.status,
-                "time": row.check_in_time,
+                "status": "Present" if row.marked_at else "Absent",
+                "time": row.marked_at.strftime('%I:%M %p') if row.marked_at else "--",
                 "type": row.session_type
             })
 
-        conn.close()
         return jsonify({"success": True, "data": attendance_list}), 200
 
     except Exception as e:
@@ -0,0 +1,335 @@
+import os
+import glob
+import json
+import time
+import threading
+from datetime import datetime, date
+
+try:
+    import fcntl           # POSIX (Gunicorn workers)
+except ImportError:
+    fcntl = None
+    import msvcrt          # Windows
+
+# --- CONFIGURATION ---
+JOURNAL_FILE = 'attendance_journal.log'   # Base name: each process appends to its own attendance_journal.<pid>.log
+FLUSH_INTERVAL = 1.0       # Seconds between background writes to attendance_record
+BATCH_SIZE = 500           # Records per INSERT batch (a full batch wakes the flusher early)
+RETRY_SECONDS = 5          # Wait after a failed flush (DB down) before trying again
+MAX_ATTEMPTS = 5           # Failed flushes of one batch, with the DB reachable, before its bad rows are dead-lettered
+# ---------------------
+
+DEAD_LETTER = 'dead'       # attendance_journal.dead.log: rows the database kept rejecting
+
+
+def _journal_line(record, error=None):
+    session_id, student_id, marked_at = record
+    entry = {"session_id": session_id, "student_id": student_id, "marked_at": marked_at.isoformat(timespec='seconds')}
+    if error is not None:
+        entry["error"] = error
+    return json.dumps(entry) + "\n"
+
+
+def _read_journal(path):
+    """Records of a journal file, skipping a torn last line from a crash mid-write"""
+    records = []
+    try:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    records.append((entry["session_id"], str(entry["student_id"]),
+                                    datetime.fromisoformat(entry["marked_at"])))
+                except (ValueError, KeyError):
+                    continue
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def _try_lock(path):
+    """Opens `path` with an exclusive lock, without waiting. Returns the fd, or None if someone else holds it."""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _rollback(conn):
+    try:
+        conn.rollback()    # PostgreSQL refuses further statements in a failed transaction
+    except Exception:
+        pass
+
+
+class AttendanceJournal:
+    """
+    Write-behind log for kiosk check-ins.
+
+    record() appends the check-in to this process's journal file and fsyncs it,
+    so once it returns the attendance survives a crash or a database outage, and
+    the kiosk can answer "marked present" right away. A background thread inserts
+    pending records in batches with Repository.upsert_attendance (idempotent, so
+    replaying a record that already reached the database is harmless).
+
+    After a successful flush the journal is rewritten with only the records still
+    pending (usually: truncated). Each process (Gunicorn worker) owns one file,
+    <name>.<pid>.log, and holds an exclusive lock on <name>.<pid>.lock while it
+    runs. On startup a process adopts the journals whose lock it can take, i.e.
+    those of crashed or stopped processes, never those of live workers.
+
+    A batch that keeps failing while the database is reachable (a deleted
+    session, a foreign key violation) is retried row by row after MAX_ATTEMPTS;
+    the rows still rejected go to <name>.dead.log instead of blocking the queue.
+
+    The in-memory dedup set (session_id, student_id) makes a repeat scan a no-op;
+    it is cleared when the date changes, since session ids are per day.
+    """
+
+    def __init__(self, repo, connection, path=JOURNAL_FILE, flush_interval=FLUSH_INTERVAL,
+                 batch_size=BATCH_SIZE, retry_seconds=RETRY_SECONDS, max_attempts=MAX_ATTEMPTS, owner=None):
+        self.repo = repo
+        self._connection = connection      # Context manager factory, e.g. FaceEngine.db
+        self._stem, self._ext = os.path.splitext(path)
+        self.owner = str(owner if owner is not None else os.getpid())
+        self.path = f"{self._stem}.{self.owner}{self._ext}"
+        self.dead_letter_path = f"{self._stem}.{DEAD_LETTER}{self._ext}"
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.retry_seconds = retry_seconds
+        self.max_attempts = max_attempts
+        self._attempts = 0                 # Consecutive failed flushes (flusher thread only)
+
+        self._lock = threading.Lock()      # Guards the file, _pending and _seen
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending = []                 # (session_id, student_id, marked_at) not yet in the DB
+        self._seen = set()
+        self._day = date.today()
+        self.counters = {"recorded": 0, "duplicates": 0, "flushed": 0, "batches": 0, "failures": 0,
+                         "replayed": 0, "dead_lettered": 0}
+        self.last_error = None
+
+        self._owner_lock = _try_lock(f"{self._stem}.{self.owner}.lock")   # Held until the process exits
+        if self._owner_lock is None:
+            raise RuntimeError(f"{self.path} is in use by another journal")
+
+        self._replay(self.path)            # Same pid as a crashed run (or a restart with an explicit owner)
+        adopted = self._adopt_orphans()
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        with self._lock:
+            self._compact()                # Adopted records are durable in our file before theirs are deleted
+        for orphan_path, lock_path, lock_fd in adopted:
+            for stale in (orphan_path, lock_path):
+                try:
+                    os.remove(stale)
+                except FileNotFoundError:
+                    pass
+            os.close(lock_fd)
+        if self._pending:
+            print(f"🔁 Replaying {len(self._pending)} journaled check-ins ({len(adopted)} journal(s) adopted)")
+        threading.Thread(target=self._run, name="attendance-flusher", daemon=True).start()
+
+    # ------------------------------------------
+    # Kiosk side
+    # ------------------------------------------
+    def record(self, session_id, student_id, marked_at=None):
+        """
+        Durably journals a check-in. Returns False (and writes nothing) if this
+        student was already recorded for this session.
+        """
+        return self.record_many([(session_id, student_id)], marked_at)[0]
+
+    def record_many(self, checkins, marked_at=None):
+        """
+        Journals several (session_id, student_id) check-ins with one write and
+        one fsync (a classroom photo). Returns one bool per check-in, False for
+        those already recorded.
+        """
+        marked_at = marked_at or datetime.now()
+        added, records = [], []
+
+        with self._lock:
+            self._roll_day()
+            for session_id, student_id in checkins:
+                key = (session_id, str(student_id))
+                if key in self._seen:
+                    self.counters["duplicates"] += 1
+                    added.append(False)
+                    continue
+                self._seen.add(key)
+                records.append((session_id, str(student_id), marked_at))
+                added.append(True)
+            if records:
+                try:
+                    os.write(self._fd, "".join(_journal_line(record) for record in records).encode('utf-8'))
+                    os.fsync(self._fd)
+                except OSError:
+                    self._seen.difference_update(record[:2] for record in records)
+                    raise
+                self._pending.extend(records)
+                self.counters["recorded"] += len(records)
+            wake = len(self._pending) >= self.batch_size
+
+        if wake:
+            self._wake.set()
+        return added
+
+    def _roll_day(self):
+        today = date.today()
+        if today != self._day:
+            self._day = today
+            self._seen = {(session_id, student_id) for session_id, student_id, _ in self._pending}
+
+    # ------------------------------------------
+    # Flusher side
+    # ------------------------------------------
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                with self._lock:
+                    self.counters["failures"] += 1
+                    self.last_error = f"{datetime.now().isoformat(timespec='seconds')} {e}"
+                    pending = len(self._pending)
+                self._attempts += 1
+                print(f"⚠️ Attendance flush failed ({pending} pending, kept in {self.path}): {e}")
+                if self._attempts >= self.max_attempts and self._database_up():
+                    self.quarantine()
+                    continue
+                time.sleep(self.retry_seconds)
+
+    def flush(self):
+        """Writes every pending record to the database. Returns how many were written."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = self._pending[:self.batch_size]
+                if not batch:
+                    break
+
+                with self._connection() as conn:
+                    try:
+                        self.repo.upsert_attendance(conn, batch)
+                        conn.commit()
+                    except Exception:
+                        _rollback(conn)
+                        raise
+
+                with self._lock:
+                    del self._pending[:len(batch)]
+                    self._compact()
+                    self.counters["flushed"] += len(batch)
+                    self.counters["batches"] += 1
+                self._attempts = 0
+                written += len(batch)
+        return written
+
+    def _database_up(self):
+        try:
+            with self._connection() as conn:
+                self.repo.ping(conn)
+            return True
+        except Exception:
+            return False
+
+    def quarantine(self):
+        """
+        Writes the first pending batch row by row and moves the rows the database
+        still rejects to the dead-letter file. Gives up (keeping everything
+        pending) if the database stops answering meanwhile. Returns the rows dead-lettered.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch = self._pending[:self.batch_size]
+            dead = []
+            with self._connection() as conn:
+                for record in batch:
+                    try:
+                        self.repo.upsert_attendance(conn, [record])
+                        conn.commit()
+                    except Exception as e:
+                        _rollback(conn)
+                        if not self._database_up():
+                            return 0
+                        dead.append((record, str(e)))
+
+            with self._lock:
+                if dead:
+                    fd = os.open(self.dead_letter_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+                    try:
+                        os.write(fd, "".join(_journal_line(record, error) for record, error in dead).encode('utf-8'))
+                        os.fsync(fd)
+                    finally:
+                        os.close(fd)
+                del self._pending[:len(batch)]
+                self._compact()
+                self.counters["flushed"] += len(batch) - len(dead)
+                self.counters["dead_lettered"] += len(dead)
+            self._attempts = 0
+
+        for record, error in dead:
+            print(f"☠️ Check-in {record[1]} for session {record[0]} rejected by the database, "
+                  f"moved to {self.dead_letter_path}: {error}")
+        return len(dead)
+
+    def _compact(self):
+        """Rewrites the journal with just the pending records (caller holds _lock)"""
+        if not self._pending:
+            os.ftruncate(self._fd, 0)
+            os.fsync(self._fd)
+            return
+
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.writelines(_journal_line(record) for record in self._pending)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        os.close(self._fd)
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+    def _replay(self, path):
+        """Loads records a previous run journaled in `path` but may not have written to the DB"""
+        for record in _read_journal(path):
+            if record[:2] not in self._seen:
+                self._seen.add(record[:2])
+                self._pending.append(record)
+                self.counters["replayed"] += 1
+
+    def _adopt_orphans(self):
+        """
+        Replays the journals of processes that are gone (their lock is free),
+        including a pre-per-process <name>.log. Returns [(path, lock_path, lock_fd)]
+        to delete once the records are safely in our own journal.
+        """
+        candidates = [(f"{self._stem}{self._ext}", f"{self._stem}.lock")]
+        for journal_path in sorted(glob.glob(f"{glob.escape(self._stem)}.*{self._ext}")):
+            owner = journal_path[len(self._stem) + 1:len(journal_path) - len(self._ext)]
+            if owner not in (self.owner, DEAD_LETTER) and '.' not in owner:
+                candidates.append((journal_path, f"{self._stem}.{owner}.lock"))
+
+        adopted = []
+        for journal_path, lock_path in candidates:
+            if not os.path.exists(journal_path):
+                continue
+            lock_fd = _try_lock(lock_path)
+            if lock_fd is None:
+                continue   # A live worker's journal
+            self._replay(journal_path)
+            adopted.append((journal_path, lock_path, lock_fd))
+        return adopted
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, pending=len(self._pending), last_error=self.last_error)
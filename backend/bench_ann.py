@@ -0,0 +1,84 @@
+import os
+import time
+import tempfile
+import numpy as np
+from gallery import FaceGallery, EMBEDDING_DIM
+from matchers import ExactMatcher, IVFMatcher, CentroidMatcher, build_matcher
+
+# --- CONFIGURATION ---
+PEOPLE = [1_000, 5_000]        # Synthetic students (x IMAGES_PER_PERSON rows each)
+IMAGES_PER_PERSON = 20
+NOISE = 0.9                    # Spread of one person's photos around their identity vector
+QUERIES = 500
+NPROBE_VALUES = [2, 4, 8, 16]   # recall@1 = share of queries where the matcher finds the exact best row
+SEED = 7
+# ---------------------
+
+def synthetic_people(people, rng):
+    """Clustered gallery: every person is a random direction plus per-photo noise"""
+    centres = rng.standard_normal((people, EMBEDDING_DIM)).astype(np.float32)
+    centres /= np.linalg.norm(centres, axis=1, keepdims=True)
+
+    def photos(person_ids):
+        noise = rng.standard_normal((len(person_ids), EMBEDDING_DIM)).astype(np.float32)
+        noise *= NOISE / np.sqrt(EMBEDDING_DIM)
+        vectors = centres[person_ids] + noise
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    person_ids = np.repeat(np.arange(people), IMAGES_PER_PERSON)
+    labels = [f"Student {p} - {p}" for p in person_ids]
+    return photos(person_ids), labels, photos
+
+def measure(matcher, probes):
+    rows, latencies = [], []
+    for probe in probes:
+        start = time.perf_counter()
+        row, _ = matcher.search(probe)
+        latencies.append((time.perf_counter() - start) * 1000)
+        rows.append(row)
+    return np.array(rows), np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+def report(name, rows, exact_rows, gallery, truth, p50, p99):
+    recall = np.mean(rows == exact_rows)
+    accuracy = np.mean(gallery.ids[rows] == truth)
+    print(f"{name:<20} | {recall:>9.2%} | {accuracy:>9.2%} | {p50:>8.3f} | {p99:>8.3f}")
+
+def run():
+    rng = np.random.default_rng(SEED)
+
+    for people in PEOPLE:
+        vectors, labels, photos = synthetic_people(people, rng)
+        gallery = FaceGallery.from_arrays(vectors, labels)
+
+        query_people = rng.integers(0, people, QUERIES)
+        probes = photos(query_people)
+        truth = query_people.astype(str)
+
+        print(f"\n=== {people} people / {len(gallery)} rows ===")
+
+        # Build once, then time a startup that reuses the saved index
+        with tempfile.TemporaryDirectory() as tmp:
+            index_path = os.path.join(tmp, 'face_encodings.ivf.npz')
+            start = time.perf_counter()
+            build_matcher('ivf', gallery, index_path=index_path)
+            build_s = time.perf_counter() - start
+            start = time.perf_counter()
+            ivf = build_matcher('ivf', gallery, index_path=index_path)
+            load_s = time.perf_counter() - start
+        print(f"IVF index: nlist={ivf.nlist} | build {build_s:.2f}s | load from disk {load_s:.2f}s\n")
+
+        print(f"{'matcher':<20} | {'recall@1':>9} | {'accuracy':>9} | {'p50 ms':>8} | {'p99 ms':>8}")
+        print("-" * 66)
+        exact_rows, p50, p99 = measure(ExactMatcher(gallery), probes)
+        report("exact", exact_rows, exact_rows, gallery, truth, p50, p99)
+
+        rows, p50, p99 = measure(CentroidMatcher(gallery), probes)
+        report("centroid top-5", rows, exact_rows, gallery, truth, p50, p99)
+
+        for nprobe in NPROBE_VALUES:
+            ivf.nprobe = nprobe
+            rows, p50, p99 = measure(ivf, probes)
+            report(f"ivf nprobe={nprobe}", rows, exact_rows, gallery, truth, p50, p99)
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,81 @@
+import os
+import time
+import sqlite3
+import tempfile
+import threading
+from db_pool import ConnectionPool
+
+# --- CONFIGURATION ---
+CONNECT_LATENCY_MS = 15     # Simulated login handshake (SQL Server over the network is ~10-50 ms). 0 = raw SQLite.
+THREADS = 8                 # Concurrent "requests" (like Flask worker threads)
+REQUESTS_PER_THREAD = 200
+POOL_SIZE = 8
+# ---------------------
+
+def create_db(path):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE course (id INTEGER PRIMARY KEY, name TEXT, credit_hours INTEGER, instructor_id INTEGER)")
+    conn.executemany(
+        "INSERT INTO course (name, credit_hours, instructor_id) VALUES (?, ?, ?)",
+        [(f"Course {i}", 3, i % 50) for i in range(2000)]
+    )
+    conn.commit()
+    conn.close()
+
+def make_connect(path):
+    def connect():
+        if CONNECT_LATENCY_MS:
+            time.sleep(CONNECT_LATENCY_MS / 1000)
+        return sqlite3.connect(path, check_same_thread=False)
+    return connect
+
+def get_my_courses(conn, instructor_id):
+    """Same shape of work as the /get_my_courses route"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, name, credit_hours FROM course WHERE instructor_id = ?", (instructor_id,))
+    return cursor.fetchall()
+
+def run_load(handle_request):
+    def worker(n):
+        for i in range(REQUESTS_PER_THREAD):
+            handle_request((n * REQUESTS_PER_THREAD + i) % 50)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(THREADS)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return THREADS * REQUESTS_PER_THREAD / elapsed
+
+def run():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        create_db(path)
+        connect = make_connect(path)
+
+        # OLD: a brand-new connection per request
+        def unpooled(instructor_id):
+            conn = connect()
+            try:
+                get_my_courses(conn, instructor_id)
+            finally:
+                conn.close()
+
+        # NEW: pooled checkout
+        pool = ConnectionPool(connect, max_size=POOL_SIZE)
+        def pooled(instructor_id):
+            with pool.connection() as conn:
+                get_my_courses(conn, instructor_id)
+
+        print(f"{THREADS} threads x {REQUESTS_PER_THREAD} requests, connect latency {CONNECT_LATENCY_MS} ms\n")
+        unpooled_rps = run_load(unpooled)
+        pooled_rps = run_load(pooled)
+        print(f"connect per request : {unpooled_rps:9.1f} req/s")
+        print(f"connection pool     : {pooled_rps:9.1f} req/s  ({pooled_rps / unpooled_rps:.1f}x)")
+        print(f"pool stats          : {pool.stats()}")
+        pool.close_all()
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,47 @@
+import time
+import numpy as np
+from gallery import FaceGallery, EMBEDDING_DIM
+
+# --- CONFIGURATION ---
+GALLERY_SIZES = [1_000, 10_000, 100_000]   # Rows (images) in the synthetic gallery
+IMAGES_PER_PERSON = 20                     # Same density as dataset/train
+SCANS = 200                                # Probes timed per size
+SEED = 42
+# ---------------------
+
+def synthetic_gallery(rows, rng):
+    vectors = rng.standard_normal((rows, EMBEDDING_DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    labels = [f"Student {i // IMAGES_PER_PERSON} - {i // IMAGES_PER_PERSON}" for i in range(rows)]
+    return vectors, labels
+
+def time_per_scan(fn, probes):
+    fn(probes[0])  # warm-up
+    start = time.perf_counter()
+    for probe in probes:
+        fn(probe)
+    return (time.perf_counter() - start) / len(probes) * 1000
+
+def run():
+    rng = np.random.default_rng(SEED)
+    print(f"{'rows':>8} | {'list + np.dot (ms)':>18} | {'FaceGallery (ms)':>16} | speed-up")
+    print("-" * 62)
+
+    for rows in GALLERY_SIZES:
+        vectors, labels = synthetic_gallery(rows, rng)
+        probes = list(vectors[rng.integers(0, rows, SCANS)])
+
+        # OLD PATH: Python list of rows, converted to an array on every scan
+        known_faces = list(vectors)
+        def old_match(probe):
+            similarities = np.dot(known_faces, probe)
+            return np.argmax(similarities)
+
+        gallery = FaceGallery.from_arrays(vectors, labels)
+
+        old_ms = time_per_scan(old_match, probes)
+        new_ms = time_per_scan(gallery.match, probes)
+        print(f"{rows:>8} | {old_ms:>18.3f} | {new_ms:>16.3f} | {old_ms / new_ms:>6.1f}x")
+
+if __name__ == "__main__":
+    run()
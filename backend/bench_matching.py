@@ -0,0 +1,67 @@
+import time
+import pickle
+import numpy as np
+from gallery import FaceGallery
+from matchers import ExactMatcher, CentroidMatcher
+
+# --- CONFIGURATION ---
+BRAIN_FILE = 'face_encodings.pkl'
+HOLDOUT_EVERY = 5                 # Every 5th image of each person becomes a probe
+TOP_K_VALUES = [1, 3, 5, 10]
+SUB_CENTROID_VALUES = [1, 3]
+# ---------------------
+
+def split_holdout(embeddings, labels):
+    """Per person: every HOLDOUT_EVERY-th image is a probe, the rest is the gallery"""
+    seen = {}
+    gallery_rows, probe_rows = [], []
+    for i, label in enumerate(labels):
+        n = seen.get(label, 0)
+        seen[label] = n + 1
+        (probe_rows if n % HOLDOUT_EVERY == HOLDOUT_EVERY - 1 else gallery_rows).append(i)
+    return gallery_rows, probe_rows
+
+def evaluate(matcher, gallery, probes, truth):
+    hits, rows = 0, []
+    start = time.perf_counter()
+    for probe in probes:
+        row, _ = matcher.search(probe)
+        rows.append(row)
+    latency_ms = (time.perf_counter() - start) / len(probes) * 1000
+    for row, label in zip(rows, truth):
+        hits += gallery.labels[row] == label
+    return rows, hits / len(probes), latency_ms
+
+def run():
+    with open(BRAIN_FILE, 'rb') as f:
+        data = pickle.load(f)
+
+    embeddings = np.array(data['embeddings'], dtype=np.float32)
+    labels = list(data['names'])
+    gallery_rows, probe_rows = split_holdout(embeddings, labels)
+
+    gallery = FaceGallery.from_arrays(embeddings[gallery_rows], [labels[i] for i in gallery_rows])
+    probes = embeddings[probe_rows]
+    probes /= np.linalg.norm(probes, axis=1, keepdims=True)
+    truth = [labels[i] for i in probe_rows]
+
+    people = len(set(labels))
+    print(f"Gallery: {len(gallery)} images / {people} people | Probes: {len(probes)}\n")
+
+    exact_rows, exact_acc, exact_ms = evaluate(ExactMatcher(gallery), gallery, probes, truth)
+    print(f"{'mode':<22} | {'rows/scan':>9} | {'top-1 acc':>9} | {'agree w/ exact':>14} | {'ms/scan':>7}")
+    print("-" * 75)
+    print(f"{'exact':<22} | {len(gallery):>9} | {exact_acc:>9.2%} | {'100.00%':>14} | {exact_ms:>7.3f}")
+
+    avg_rows_per_person = len(gallery) / people
+    for sub in SUB_CENTROID_VALUES:
+        for k in TOP_K_VALUES:
+            matcher = CentroidMatcher(gallery, top_k=k, sub_centroids=sub)
+            rows, acc, ms = evaluate(matcher, gallery, probes, truth)
+            agree = np.mean([gallery.labels[a] == gallery.labels[b] for a, b in zip(rows, exact_rows)])
+            work = matcher.num_centroids + k * avg_rows_per_person
+            mode = f"centroid x{sub}, top-{k}"
+            print(f"{mode:<22} | {work:>9.0f} | {acc:>9.2%} | {agree:>14.2%} | {ms:>7.3f}")
+
+if __name__ == "__main__":
+    run()
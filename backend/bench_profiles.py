@@ -0,0 +1,64 @@
+import os
+import sys
+import time
+import cv2
+import numpy as np
+from embedder import FaceEmbedder, PROFILES, EngineProfile, MODEL_NAME
+
+# --- CONFIGURATION ---
+SAMPLE_DIR = 'dataset/samples'     # Folder of sample photos, each showing (at least) one face
+MAX_IMAGES = 200
+EXTRA_PROFILES = [
+    # Lighter detector pack for the kiosk; the recognizer must stay the gallery's pack
+    EngineProfile('kiosk-buffalo_s-det', MODEL_NAME, 'buffalo_s', (320, 320), 2, 1, 1),
+    EngineProfile('kiosk-256', MODEL_NAME, MODEL_NAME, (256, 256), 2, 1, 1),
+]
+# ---------------------
+
+def load_samples(folder):
+    images = []
+    for root, _, files in os.walk(folder):
+        for name in sorted(files):
+            if name.lower().endswith(('.jpg', '.jpeg', '.png')):
+                img = cv2.imread(os.path.join(root, name))
+                if img is not None:
+                    images.append(img)
+    return images[:MAX_IMAGES]
+
+def bench(profile, images):
+    embedder = FaceEmbedder.from_profile(profile)
+    embedder.embed_largest_face(images[0])  # warm-up
+
+    detected = 0
+    detect_ms, scan_ms = [], []
+    for img in images:
+        start = time.perf_counter()
+        bboxes, _ = embedder.detect(img)
+        detect_ms.append((time.perf_counter() - start) * 1000)
+        detected += bboxes.shape[0] > 0
+
+        start = time.perf_counter()
+        embedder.embed_largest_face(img)
+        scan_ms.append((time.perf_counter() - start) * 1000)
+
+    return detected / len(images), np.percentile(detect_ms, 50), np.percentile(detect_ms, 99), np.percentile(scan_ms, 50)
+
+def run(folder):
+    images = load_samples(folder)
+    if not images:
+        print(f"❌ Error: No images found in '{folder}'.")
+        return
+
+    print(f"Benchmarking {len(images)} images from '{folder}'\n")
+    results = []
+    for profile in list(PROFILES.values()) + EXTRA_PROFILES:
+        results.append((profile, bench(profile, images)))
+
+    print(f"\n{'profile':<22} | {'detector':<16} | {'recall':>7} | {'det p50':>8} | {'det p99':>8} | {'scan p50':>8}")
+    print("-" * 84)
+    for profile, (recall, det_p50, det_p99, scan_p50) in results:
+        detector = f"{profile.detector_pack}@{profile.det_size[0]}"
+        print(f"{profile.name:<22} | {detector:<16} | {recall:>7.1%} | {det_p50:>6.1f}ms | {det_p99:>6.1f}ms | {scan_p50:>6.1f}ms")
+
+if __name__ == "__main__":
+    run(sys.argv[1] if len(sys.argv) > 1 else SAMPLE_DIR)
@@ -0,0 +1,82 @@
+import time
+import pickle
+import numpy as np
+from gallery import FaceGallery
+from matchers import ExactMatcher, Int8Matcher
+from bench_matching import split_holdout
+from bench_gallery import synthetic_gallery
+
+# --- CONFIGURATION ---
+BRAIN_FILE = 'face_encodings.pkl'
+MATCH_THRESHOLD = 0.5             # Same acceptance threshold as the API
+RESCORE_VALUES = [1, 8, 32]       # Rows re-scored in float32 (1 = trust the compressed first pass)
+SYNTHETIC_ROWS = 100_000          # Gallery size for the memory / latency part
+SYNTHETIC_SCANS = 100
+PROBE_NOISE = 0.03                # Synthetic probes are gallery rows plus this much noise
+SEED = 42
+# ---------------------
+
+def search_all(matcher, probes):
+    rows, scores = [], []
+    start = time.perf_counter()
+    for probe in probes:
+        row, score = matcher.search(probe)
+        rows.append(row)
+        scores.append(score)
+    latency_ms = (time.perf_counter() - start) / len(probes) * 1000
+    return np.array(rows), np.array(scores), latency_ms
+
+def agreement(gallery, rows, scores, exact_rows, exact_scores):
+    """(same identity, same identity AND same accept/reject at MATCH_THRESHOLD, max score difference)"""
+    same_id = gallery.labels[rows] == gallery.labels[exact_rows]
+    same_decision = same_id & ((scores >= MATCH_THRESHOLD) == (exact_scores >= MATCH_THRESHOLD))
+    return same_id.mean(), same_decision.mean(), np.abs(scores - exact_scores).max()
+
+def run_agreement():
+    with open(BRAIN_FILE, 'rb') as f:
+        data = pickle.load(f)
+
+    embeddings = np.array(data['embeddings'], dtype=np.float32)
+    labels = list(data['names'])
+    gallery_rows, probe_rows = split_holdout(embeddings, labels)
+
+    gallery = FaceGallery.from_arrays(embeddings[gallery_rows], [labels[i] for i in gallery_rows])
+    probes = embeddings[probe_rows]
+    probes /= np.linalg.norm(probes, axis=1, keepdims=True)
+    # The gallery's own rows too: a re-scan of an enrolled photo must still be exact
+    probes = np.vstack([probes, gallery.embeddings])
+
+    print(f"=== Agreement with exact on {BRAIN_FILE}: {len(gallery)} rows, {len(probes)} probes ===\n")
+    exact_rows, exact_scores, _ = search_all(ExactMatcher(gallery), probes)
+    print(f"{'matcher':<18} | {'same id':>8} | {'same decision':>13} | {'max |dscore|':>12}")
+    print("-" * 62)
+    for rescore in RESCORE_VALUES:
+        rows, scores, _ = search_all(Int8Matcher(gallery, rescore=rescore), probes)
+        same_id, same_decision, score_diff = agreement(gallery, rows, scores, exact_rows, exact_scores)
+        print(f"{f'int8 rescore={rescore}':<18} | {same_id:>8.2%} | {same_decision:>13.2%} | {score_diff:>12.2e}")
+
+def run_size():
+    rng = np.random.default_rng(SEED)
+    vectors, labels = synthetic_gallery(SYNTHETIC_ROWS, rng)
+    gallery = FaceGallery.from_arrays(vectors, labels)
+    targets = rng.integers(0, len(gallery), SYNTHETIC_SCANS)
+    probes = gallery.embeddings[targets] + rng.standard_normal((SYNTHETIC_SCANS, gallery.dim)).astype(np.float32) * PROBE_NOISE
+    probes /= np.linalg.norm(probes, axis=1, keepdims=True)
+
+    print(f"\n=== {len(gallery)} synthetic rows, {SYNTHETIC_SCANS} scans ===\n")
+    print(f"{'matcher':<10} | {'scanned MB':>10} | {'build s':>7} | {'ms/scan':>7} | {'same row':>8}")
+    print("-" * 55)
+    exact_rows, _, exact_ms = search_all(ExactMatcher(gallery), probes)
+    print(f"{'exact':<10} | {gallery.embeddings.nbytes / 1e6:>10.1f} | {0:>7.2f} | {exact_ms:>7.2f} | {'100.00%':>8}")
+    start = time.perf_counter()
+    matcher = Int8Matcher(gallery)
+    build_s = time.perf_counter() - start
+    rows, _, ms = search_all(matcher, probes)
+    print(f"{matcher.name:<10} | {matcher.nbytes / 1e6:>10.1f} | {build_s:>7.2f} | {ms:>7.2f} | {np.mean(rows == exact_rows):>8.2%}")
+
+def run():
+    run_agreement()
+    run_size()
+
+if __name__ == "__main__":
+    run()
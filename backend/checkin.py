@@ -0,0 +1,92 @@
+import time
+from datetime import datetime
+
+
+def check_in(schedule, journal, student_id, student_name, current_room_id, now=None, timings=None):
+    """
+    The kiosk's smart schedule logic for a recognized student standing in
+    `current_room_id`: finds the class they should be in right now, explains
+    wrong room / wrong time, and journals the attendance.
+
+    Shared by /kiosk_scan and stream_recognizer.py. Returns (payload, http_status).
+    If a `timings` dict is given it gets schedule_ms and (when a check-in is
+    journaled) write_ms.
+    """
+    # Get ALL classes for this student TODAY
+    started = time.perf_counter()
+    todays_sessions = schedule.sessions_for_student(student_id)
+    if timings is not None:
+        timings['schedule_ms'] = (time.perf_counter() - started) * 1000
+
+    if not todays_sessions:
+        return {
+            "match": False, 
+            "message": f"Hello {student_name}, you have no classes scheduled for today!"
+        }, 403
+
+    now = now or datetime.now()
+    perfect_session = None
+    error_messages = []
+
+    for session in todays_sessions:
+        s_id, c_name, room_id, start, end, s_type = session
+    
+        # Helper text for PR/TH
+        type_str = "(Practical)" if s_type == 'PR' else "(Theory)"
+        full_c_name = f"{c_name} {type_str}"
+
+        is_room_correct = (room_id == current_room_id)
+        is_time_correct = (start <= now <= end)
+
+        if is_room_correct and is_time_correct:
+            perfect_session = session
+            break 
+    
+        # Error Generation
+        if is_time_correct and not is_room_correct:
+            error_messages.append(f"Wrong Place! Your {full_c_name} is in Room {room_id}.")
+    
+        elif is_room_correct and not is_time_correct:
+            start_str = start.strftime("%I:%M %p")
+            error_messages.append(f"Wrong Time! {full_c_name} starts at {start_str}.")
+    
+        elif not is_room_correct and not is_time_correct:
+            start_str = start.strftime("%I:%M %p")
+            error_messages.append(f"Mismatch: {full_c_name} is in Room {room_id} at {start_str}.")
+
+    # 4. HANDLE RESULTS
+    if perfect_session:
+        s_id, c_name, room_id, start, end, s_type = perfect_session
+        type_str = "(Practical)" if s_type == 'PR' else "(Theory)"
+    
+        # Check duplication in memory, then journal the check-in (written to the DB in the background)
+        already_marked = schedule.is_marked(s_id, student_id)
+        if not already_marked:
+            started = time.perf_counter()
+            already_marked = not journal.record(s_id, student_id)
+            schedule.mark(s_id, student_id)
+            if timings is not None:
+                timings['write_ms'] = (time.perf_counter() - started) * 1000
+
+        if already_marked:
+            msg = f"Welcome, {student_name}!\nYou are already marked present."
+        else:
+            msg = f"Welcome, {student_name}!\nAttendance marked for {c_name} {type_str}.\nFocus to get the best marks!"
+
+        return {
+            "match": True,
+            "student": student_name,
+            "student_id": student_id,   
+            "message": msg
+        }, 200
+
+    else:
+        if error_messages:
+            final_error = "\n".join(error_messages)
+        else:
+            final_error = "No active class found for you right now."
+
+        return {
+            "match": False, 
+            "message": final_error
+        }, 403
@@ -0,0 +1,166 @@
+import cv2
+import numpy as np
+
+# --- CONFIGURATION ---
+BUDGET = 8                   # Faces kept per person (0 = keep every good sample)
+MIN_DET_SCORE = 0.6          # Detector confidence below this = partial / occluded / not really a face
+MIN_FACE_PX = 48             # Shorter bbox side in the original photo; smaller faces embed poorly
+MIN_SHARPNESS = 20.0         # Variance of the Laplacian on the aligned 112x112 crop (lower = blurrier)
+DUPLICATE_SIMILARITY = 0.97  # A sample this close to one already kept adds nothing (burst frames, copies)
+HOLDOUT_SHARE = 0.2          # Share of each person's samples kept out of the gallery to measure accuracy
+MATCH_THRESHOLD = 0.5        # Same acceptance threshold as the API
+SEED = 0
+# ---------------------
+
+QUALITY_FIELDS = ('det_score', 'face_px', 'sharpness')   # NaN = not measured (e.g. --aligned datasets, old caches)
+
+
+def face_quality(crop, det_score=np.nan, face_px=np.nan):
+    """(det_score, face_px, sharpness) of one aligned crop, in QUALITY_FIELDS order"""
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    sharpness = cv2.Laplacian(gray, cv2.CV_64F).var()
+    return float(det_score), float(face_px), float(sharpness)
+
+
+def quality_rejects(quality, min_det_score=MIN_DET_SCORE, min_face_px=MIN_FACE_PX, min_sharpness=MIN_SHARPNESS):
+    """
+    Per-sample reject reason ('det_score' / 'face_px' / 'sharpness') or None.
+    Unmeasured values (NaN) never reject.
+    """
+    quality = np.asarray(quality, dtype=np.float64).reshape(-1, len(QUALITY_FIELDS))
+    reasons = np.full(len(quality), None, dtype=object)
+    # Last assignment wins, so the most basic failure is reported
+    for field, minimum in (('sharpness', min_sharpness), ('face_px', min_face_px), ('det_score', min_det_score)):
+        column = quality[:, QUALITY_FIELDS.index(field)]
+        with np.errstate(invalid='ignore'):
+            reasons[column < minimum] = field
+    return reasons
+
+
+def quality_rank(quality):
+    """Sort key (higher = better) used when a person has no sample that passes the filters"""
+    quality = np.nan_to_num(np.asarray(quality, dtype=np.float64).reshape(-1, len(QUALITY_FIELDS)), nan=1.0)
+    return quality[:, 0] * np.log1p(quality[:, 1]) * np.log1p(quality[:, 2])
+
+
+def rows_by_label(labels):
+    """{label: row indices}, in first-seen order"""
+    groups = {}
+    for row, label in enumerate(labels):
+        groups.setdefault(label, []).append(row)
+    return {label: np.array(rows, dtype=np.int64) for label, rows in groups.items()}
+
+
+def representatives(embeddings, budget=BUDGET, duplicate_similarity=DUPLICATE_SIMILARITY):
+    """
+    Indices of up to `budget` diverse rows of one person's (normalized) embeddings.
+
+    Greedy k-center clustering: start from the medoid (the most typical photo),
+    then repeatedly add the sample farthest from everything kept so far, so the
+    picks cover the person's poses / lighting instead of piling up on the most
+    common one. Stops early once every remaining sample is a near-duplicate of
+    a kept one.
+    """
+    count = len(embeddings)
+    if count == 0:
+        return []
+    mean = embeddings.mean(axis=0)
+    first = int(np.argmax(embeddings @ mean))
+    kept = [first]
+    closest = embeddings @ embeddings[first]        # Similarity of each sample to its nearest kept one
+    limit = count if not budget else min(budget, count)
+    while len(kept) < limit:
+        candidate = int(np.argmin(closest))
+        if closest[candidate] >= duplicate_similarity:
+            break
+        kept.append(candidate)
+        closest = np.maximum(closest, embeddings @ embeddings[candidate])
+    return sorted(kept)
+
+
+def compact(embeddings, labels, quality, budget=BUDGET, duplicate_similarity=DUPLICATE_SIMILARITY, **thresholds):
+    """
+    Picks the gallery rows to keep: drops poor samples (quality_rejects), then
+    keeps representatives() per person. A person whose samples all fail the
+    filters keeps their single best one rather than disappearing.
+
+    Returns (sorted row indices, counters).
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    labels = np.asarray(labels, dtype=object)
+    quality = np.asarray(quality, dtype=np.float64).reshape(-1, len(QUALITY_FIELDS))
+    reasons = quality_rejects(quality, **thresholds)
+    counters = {"samples": len(labels), "kept": 0, "duplicates": 0, "over_budget": 0, "rescued": 0}
+    counters.update({f"low_{field}": 0 for field in QUALITY_FIELDS})
+
+    keep = []
+    for rows in rows_by_label(labels).values():
+        good = rows[[reasons[row] is None for row in rows]]
+        for reason in reasons[rows]:
+            if reason is not None:
+                counters[f"low_{reason}"] += 1
+        if len(good) == 0:
+            good = rows[[int(np.argmax(quality_rank(quality[rows])))]]
+            counters["rescued"] += 1
+
+        picked = good[representatives(embeddings[good], budget, duplicate_similarity)]
+        if not budget or len(picked) < min(budget, len(good)):
+            counters["duplicates"] += len(good) - len(picked)
+        else:
+            counters["over_budget"] += len(good) - len(picked)
+        keep.extend(picked.tolist())
+
+    keep.sort()
+    counters["kept"] = len(keep)
+    return np.array(keep, dtype=np.int64), counters
+
+
+def holdout_split(labels, share=HOLDOUT_SHARE, seed=SEED):
+    """Boolean mask of held-out rows: `share` of each person's samples, always leaving one in the gallery"""
+    rng = np.random.default_rng(seed)
+    held = np.zeros(len(labels), dtype=bool)
+    for rows in rows_by_label(labels).values():
+        take = min(len(rows) - 1, int(round(len(rows) * share)))
+        if take > 0:
+            held[rng.choice(rows, take, replace=False)] = True
+    return held
+
+
+def top1_accuracy(gallery_embeddings, gallery_labels, probes, probe_labels, threshold=MATCH_THRESHOLD, chunk=1024):
+    """Share of probes whose best gallery row is the right person with a score >= threshold"""
+    if len(probes) == 0:
+        return float('nan')
+    gallery_labels = np.asarray(gallery_labels, dtype=object)
+    correct = 0
+    for start in range(0, len(probes), chunk):
+        scores = probes[start:start + chunk] @ gallery_embeddings.T
+        best = scores.argmax(axis=1)
+        hits = (gallery_labels[best] == np.asarray(probe_labels[start:start + chunk], dtype=object))
+        correct += int(np.sum(hits & (scores[np.arange(len(best)), best] >= threshold)))
+    return correct / len(probes)
+
+
+def evaluate(embeddings, labels, quality, budget=BUDGET, share=HOLDOUT_SHARE, seed=SEED, **options):
+    """
+    Gallery size and held-out top-1 accuracy with and without compaction.
+    Both galleries are built from the same training split; the held-out
+    photos (any quality, like real scans) are the probes.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    labels = np.asarray(labels, dtype=object)
+    quality = np.asarray(quality, dtype=np.float64).reshape(-1, len(QUALITY_FIELDS))
+    held = holdout_split(labels, share, seed)
+    train_rows = np.flatnonzero(~held)
+    keep, _ = compact(embeddings[train_rows], labels[train_rows], quality[train_rows], budget, **options)
+    kept_rows = train_rows[keep]
+
+    probes, probe_labels = embeddings[held], labels[held]
+    full = top1_accuracy(embeddings[train_rows], labels[train_rows], probes, probe_labels)
+    compacted = top1_accuracy(embeddings[kept_rows], labels[kept_rows], probes, probe_labels)
+    return {
+        "probes": int(held.sum()),
+        "full_faces": len(train_rows),
+        "compact_faces": len(kept_rows),
+        "full_accuracy": full,
+        "compact_accuracy": compacted,
+    }
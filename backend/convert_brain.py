@@ -0,0 +1,28 @@
+import os
+import time
+from gallery import FaceGallery
+
+# --- CONFIGURATION ---
+SOURCE_FILE = 'face_encodings.pkl'   # Old pickle "Brain" from train.py
+TARGET_FILE = 'face_gallery.json'    # New binary gallery header (+ .npy data files)
+MODEL_NAME = 'buffalo_l'             # The model the pickle was trained with
+# ---------------------
+
+def convert():
+    if not os.path.exists(SOURCE_FILE):
+        print(f"❌ Error: '{SOURCE_FILE}' not found.")
+        return
+
+    print(f"🔄 Converting {SOURCE_FILE} -> {TARGET_FILE}...")
+    gallery = FaceGallery.from_pickle(SOURCE_FILE)
+    gallery.save_store(TARGET_FILE, model_name=MODEL_NAME)
+
+    start = time.perf_counter()
+    reopened = FaceGallery.from_store(TARGET_FILE)
+    open_ms = (time.perf_counter() - start) * 1000
+
+    print(f"✅ Wrote {len(reopened)} faces of {len(reopened.identities())} people ({reopened.dim}-d, {MODEL_NAME}).")
+    print(f"   Opening the new gallery took {open_ms:.1f} ms.")
+
+if __name__ == "__main__":
+    convert()
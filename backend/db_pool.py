@@ -0,0 +1,160 @@
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+# --- CONFIGURATION ---
+POOL_SIZE = 10                 # Max open connections (in use + idle)
+MAX_IDLE_SECONDS = 300         # Idle connections older than this are closed
+HEALTH_CHECK_AFTER = 30        # Ping a connection before reuse if it sat idle this long
+CHECKOUT_TIMEOUT = 10          # Seconds to wait for a free connection before giving up
+PING_SQL = "SELECT 1"
+# ---------------------
+
+
+class PoolExhausted(Exception):
+    """Every connection stayed checked out for CHECKOUT_TIMEOUT seconds"""
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of DB-API connections (pyodbc, sqlite3, ...).
+
+        with pool.connection() as conn:
+            cursor = conn.cursor()
+            ...
+
+    The connection ALWAYS goes back to the pool when the block exits, even if the
+    route raised. On the way back it is rolled back (so no half-finished
+    transaction leaks into the next request); if that fails it is considered
+    broken and closed instead of being reused.
+
+    `on_acquire(seconds)`, if given, is called with how long each checkout took
+    (waiting for a slot + health check or connect), e.g. to feed a histogram.
+    """
+
+    def __init__(self, connect, max_size=POOL_SIZE, max_idle_seconds=MAX_IDLE_SECONDS,
+                 health_check_after=HEALTH_CHECK_AFTER, checkout_timeout=CHECKOUT_TIMEOUT, ping_sql=PING_SQL,
+                 on_acquire=None):
+        self._connect = connect
+        self.max_size = max_size
+        self.max_idle_seconds = max_idle_seconds
+        self.health_check_after = health_check_after
+        self.checkout_timeout = checkout_timeout
+        self.ping_sql = ping_sql
+        self.on_acquire = on_acquire
+
+        self._idle = deque()       # (conn, returned_at), newest on the right
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self.counters = {"created": 0, "reused": 0, "evicted": 0, "broken": 0, "in_use": 0}
+
+    # ------------------------------------------
+    # Checkout / return
+    # ------------------------------------------
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def acquire(self):
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            raise PoolExhausted(f"No free DB connection after {self.checkout_timeout}s ({self.max_size} in use)")
+
+        try:
+            conn = self._take_idle()
+            if conn is None:
+                conn = self._connect()
+                self._count("created")
+            else:
+                self._count("reused")
+        except Exception:
+            self._slots.release()
+            raise
+
+        self._count("in_use")
+        if self.on_acquire is not None:
+            self.on_acquire(time.perf_counter() - started)
+        return conn
+
+    def release(self, conn):
+        try:
+            try:
+                conn.rollback()
+            except Exception:
+                self._count("broken")
+                self._close(conn)
+                return
+
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+            self._evict_idle()
+        finally:
+            self._count("in_use", -1)
+            self._slots.release()
+
+    def _take_idle(self):
+        """Newest idle connection that is still alive, or None"""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                conn, returned_at = self._idle.pop()
+
+            idle_for = time.monotonic() - returned_at
+            if idle_for > self.max_idle_seconds:
+                self._count("evicted")
+                self._close(conn)
+                continue
+            if idle_for > self.health_check_after and not self._is_healthy(conn):
+                self._count("broken")
+                self._close(conn)
+                continue
+            return conn
+
+    # ------------------------------------------
+    # Maintenance
+    # ------------------------------------------
+    def _is_healthy(self, conn):
+        try:
+            cursor = conn.cursor()
+            cursor.execute(self.ping_sql)
+            cursor.fetchall()
+            return True
+        except Exception:
+            return False
+
+    def _evict_idle(self):
+        """Closes connections that have been idle too long (oldest are on the left)"""
+        cutoff = time.monotonic() - self.max_idle_seconds
+        expired = []
+        with self._lock:
+            while self._idle and self._idle[0][1] < cutoff:
+                expired.append(self._idle.popleft()[0])
+        for conn in expired:
+            self._count("evicted")
+            self._close(conn)
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, idle=len(self._idle), max_size=self.max_size)
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for conn, _ in idle:
+            self._close(conn)
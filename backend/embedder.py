@@ -0,0 +1,188 @@
+import os
+import glob
+import numpy as np
+import onnxruntime
+from collections import namedtuple
+from insightface import model_zoo
+from insightface.app import FaceAnalysis
+from insightface.utils import face_align
+from insightface.utils.storage import ensure_available
+from gallery import EMBEDDING_DIM
+
+# --- CONFIGURATION ---
+MODEL_NAME = 'buffalo_l'
+MODEL_ROOT = '~/.insightface'
+BATCH_SIZE = 32            # Aligned crops per ArcFace inference call
+# Recognition model file of each pack (the others are detector / landmarks / gender-age)
+RECOGNIZER_FILES = {
+    'buffalo_l': 'w600k_r50.onnx',
+    'buffalo_m': 'w600k_r50.onnx',
+    'buffalo_s': 'w600k_mbf.onnx',
+    'buffalo_sc': 'w600k_mbf.onnx',
+    'antelopev2': 'glintr100.onnx',
+}
+RECOGNIZER_HINTS = ('w600k', 'glint', 'arcface', 'r50', 'r100', 'mbf')   # Filename parts of other packs' recognizers
+# ---------------------
+
+# ==========================================
+# ENGINE PROFILES (one per use case)
+# ==========================================
+# detector_pack may be lighter (e.g. 'buffalo_s') but model_name (the recognizer)
+# MUST be the pack the gallery was trained with, or the embeddings won't match.
+# Threads: 0 = let ONNX Runtime decide (all cores).
+EngineProfile = namedtuple('EngineProfile', [
+    'name', 'model_name', 'detector_pack', 'det_size', 'intra_op_threads', 'inter_op_threads', 'batch_size'
+])
+
+PROFILES = {
+    # Close-range single-face selfies: small detector input, few threads per request.
+    # batch_size must cover the InferenceScheduler's MAX_BATCH, or its batches are split up again.
+    'kiosk':      EngineProfile('kiosk', MODEL_NAME, MODEL_NAME, (320, 320), 2, 1, BATCH_SIZE),
+    # Offline, throughput-bound: full resolution, all cores, big batches
+    'training':   EngineProfile('training', MODEL_NAME, MODEL_NAME, (640, 640), 0, 0, BATCH_SIZE),
+    'enrollment': EngineProfile('enrollment', MODEL_NAME, MODEL_NAME, (640, 640), 0, 0, BATCH_SIZE),
+    # Video / RTSP frames (stream_recognizer.py): detection runs a few times per second
+    'stream':     EngineProfile('stream', MODEL_NAME, MODEL_NAME, (640, 640), 0, 0, BATCH_SIZE),
+    # Wide-angle room photos: many small faces, so a large detector input
+    'classroom':  EngineProfile('classroom', MODEL_NAME, MODEL_NAME, (1024, 1024), 0, 0, BATCH_SIZE),
+}
+
+
+def _session_options(intra_op_threads, inter_op_threads):
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = intra_op_threads
+    options.inter_op_num_threads = inter_op_threads
+    return options
+
+
+def _reload_session(model, providers, intra_op_threads, inter_op_threads):
+    """insightface doesn't forward SessionOptions, so rebuild the session with our thread settings"""
+    if not (intra_op_threads or inter_op_threads):
+        return
+    model.session = onnxruntime.InferenceSession(
+        model.model_file,
+        sess_options=_session_options(intra_op_threads, inter_op_threads),
+        providers=list(providers),
+    )
+
+
+def _recognizer_file(model_name, model_dir):
+    """Path of the pack's recognition .onnx, picked by file name (no ONNX session is opened)"""
+    files = sorted(os.path.basename(path) for path in glob.glob(os.path.join(model_dir, '*.onnx')))
+    known = RECOGNIZER_FILES.get(model_name)
+    if known in files:
+        return os.path.join(model_dir, known)
+    matches = [name for name in files if any(hint in name.lower() for hint in RECOGNIZER_HINTS)]
+    if len(matches) == 1:
+        return os.path.join(model_dir, matches[0])
+    raise RuntimeError(f"Cannot tell which of {files} is the recognition model of pack '{model_name}'. "
+                       f"Add it to RECOGNIZER_FILES in embedder.py.")
+
+
+def _load_recognizer(model_name, providers):
+    """The ArcFace model of a pack, without loading (or even opening) the pack's other models"""
+    model_dir = ensure_available('models', model_name, root=MODEL_ROOT)
+    onnx_file = _recognizer_file(model_name, model_dir)
+    model = model_zoo.get_model(onnx_file, providers=list(providers))
+    if model is None or model.taskname != 'recognition':
+        raise RuntimeError(f"{onnx_file} is not a recognition model")
+    return model
+
+
+class FaceEmbedder:
+    """
+    Detection + recognition only.
+
+    FaceAnalysis.get() also runs the landmark and gender/age models of the pack on
+    every face, but we only ever use `.embedding`. This loads just the detector and
+    the ArcFace model, and embeds aligned 112x112 crops in batches of BATCH_SIZE
+    with one ONNX call per batch.
+    """
+
+    def __init__(self, model_name=MODEL_NAME, det_size=(640, 640),
+                 providers=('CPUExecutionProvider',), batch_size=BATCH_SIZE,
+                 detector_pack=None, intra_op_threads=0, inter_op_threads=0):
+        self.model_name = model_name
+        self.detector_pack = detector_pack or model_name
+        self.det_size = tuple(det_size)
+        self.batch_size = batch_size
+
+        self.app = FaceAnalysis(name=self.detector_pack, root=MODEL_ROOT, allowed_modules=['detection'], providers=list(providers))
+        self.app.prepare(ctx_id=0, det_size=self.det_size)
+        self.detector = self.app.det_model
+        self.recognizer = _load_recognizer(model_name, providers)
+        self.recognizer.prepare(ctx_id=0)
+
+        for model in (self.detector, self.recognizer):
+            _reload_session(model, providers, intra_op_threads, inter_op_threads)
+
+    @classmethod
+    def from_profile(cls, profile, providers=('CPUExecutionProvider',)):
+        """Builds the embedder for a use case: 'kiosk', 'classroom', 'stream', ... (or an EngineProfile)"""
+        if isinstance(profile, str):
+            profile = PROFILES[profile]
+        print(f"⚙️  Engine profile '{profile.name}': {profile.detector_pack} detector @ {profile.det_size}, "
+              f"{profile.model_name} recognizer, threads {profile.intra_op_threads or 'auto'}")
+        return cls(
+            model_name=profile.model_name,
+            det_size=profile.det_size,
+            providers=providers,
+            batch_size=profile.batch_size,
+            detector_pack=profile.detector_pack,
+            intra_op_threads=profile.intra_op_threads,
+            inter_op_threads=profile.inter_op_threads,
+        )
+
+    @property
+    def crop_size(self):
+        return self.recognizer.input_size[0]
+
+    # ------------------------------------------
+    # Stages
+    # ------------------------------------------
+    def detect(self, img, max_num=0):
+        """(bboxes, kpss): bboxes are [x1, y1, x2, y2, score] rows, kpss the 5 landmarks per face"""
+        return self.detector.detect(img, max_num=max_num, metric='default')
+
+    def align(self, img, kps):
+        """Warps one detected face to the aligned crop ArcFace expects"""
+        return face_align.norm_crop(img, landmark=kps, image_size=self.crop_size)
+
+    def embed_crops(self, crops):
+        """Unit-length (N x 512) float32 embeddings of already-aligned crops, batched"""
+        if len(crops) == 0:
+            return np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+
+        feats = []
+        for start in range(0, len(crops), self.batch_size):
+            feats.append(self.recognizer.get_feat(list(crops[start:start + self.batch_size])))
+        feats = np.concatenate(feats).astype(np.float32)
+        return feats / np.linalg.norm(feats, axis=1, keepdims=True)
+
+    # ------------------------------------------
+    # Convenience
+    # ------------------------------------------
+    def embed_largest_face(self, img):
+        """(bbox, embedding) of the biggest face in the image, or (None, None)"""
+        bboxes, kpss = self.detect(img)
+        if bboxes.shape[0] == 0:
+            return None, None
+
+        areas = (bboxes[:, 2] - bboxes[:, 0]) * (bboxes[:, 3] - bboxes[:, 1])
+        best = int(np.argmax(areas))
+        embedding = self.embed_crops([self.align(img, kpss[best])])[0]
+        return bboxes[best], embedding
+
+    def sample_image(self):
+        """A photo with faces bundled with insightface ('t1'), used to warm the models up"""
+        from insightface.data import get_image
+        return get_image('t1')
+
+    def embed_all_faces(self, img, min_face=0):
+        """(bboxes, embeddings) of every face at least `min_face` px wide, embedded in one batched call"""
+        bboxes, kpss = self.detect(img)
+        if min_face and bboxes.shape[0]:
+            keep = (bboxes[:, 2] - bboxes[:, 0]) >= min_face
+            bboxes, kpss = bboxes[keep], kpss[keep]
+        embeddings = self.embed_crops([self.align(img, kps) for kps in kpss])
+        return bboxes, embeddings
@@ -0,0 +1,111 @@
+import os
+import hashlib
+import numpy as np
+
+# --- CONFIGURATION ---
+CACHE_VERSION = 1
+QUALITY_SIZE = 3      # Floats of face quality per image (compaction.QUALITY_FIELDS), NaN = unknown
+# ---------------------
+
+
+def file_digest(data):
+    """Content hash used to recognise an image that was touched, copied or renamed"""
+    return hashlib.sha1(data).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Per-image embedding cache for train.py, keyed by path + size + mtime + content hash.
+
+    Lookups go from cheap to expensive:
+      1. path, size and mtime unchanged  -> reuse without reading the file
+      2. same content hash (any path)    -> reuse, file was only touched / moved
+      3. otherwise                       -> caller recomputes and put()s the result
+
+    Images that did not give exactly one face are cached as None so they are not
+    re-detected every run either. Each face also keeps its quality measures
+    (detection score, size, sharpness) for compaction.py; caches written before
+    these existed load with NaN quality. save() keeps only entries seen in this run, which
+    drops images and folders that were deleted from the dataset.
+    """
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self.entries = {}      # path -> (size, mtime_ns, digest, embedding or None, quality or None)
+        self._by_hash = {}     # digest -> (embedding or None, quality or None)
+        self._seen = set()
+
+    @classmethod
+    def load(cls, path, model_name):
+        cache = cls(model_name)
+        if not os.path.exists(path):
+            return cache
+
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if int(data['version']) != CACHE_VERSION or str(data['model']) != model_name:
+                    print(f"⚠️ {path} was built for another model/version, starting fresh.")
+                    return cache
+
+                count = len(data['paths'])
+                qualities = data['quality'] if 'quality' in data.files else np.full((count, QUALITY_SIZE), np.nan)
+                rows = zip(data['paths'], data['sizes'], data['mtimes'], data['digests'], data['valid'],
+                           data['embeddings'], qualities)
+                for img_path, size, mtime_ns, digest, valid, embedding, quality in rows:
+                    cache._store(str(img_path), int(size), int(mtime_ns), str(digest),
+                                 embedding if valid else None, quality if valid else None)
+        except Exception as e:
+            print(f"⚠️ Could not read cache {path}: {e}. Starting fresh.")
+            return cls(model_name)
+
+        return cache
+
+    def _store(self, img_path, size, mtime_ns, digest, embedding, quality=None):
+        self.entries[img_path] = (size, mtime_ns, digest, embedding, quality)
+        self._by_hash[digest] = (embedding, quality)
+
+    def lookup(self, img_path, stat):
+        """(True, embedding-or-None, quality-or-None) if path, size and mtime match the cache"""
+        entry = self.entries.get(img_path)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            self._seen.add(img_path)
+            return True, entry[3], entry[4]
+        return False, None, None
+
+    def lookup_digest(self, digest):
+        """(True, embedding-or-None, quality-or-None) if any cached image had exactly this content"""
+        if digest in self._by_hash:
+            return (True,) + self._by_hash[digest]
+        return False, None, None
+
+    def put(self, img_path, stat, digest, embedding, quality=None):
+        self._store(img_path, stat.st_size, stat.st_mtime_ns, digest, embedding, quality)
+        self._seen.add(img_path)
+
+    def save(self, path, dim):
+        paths = sorted(self._seen)
+        entries = [self.entries[p] for p in paths]
+        embeddings = np.zeros((len(paths), dim), dtype=np.float32)
+        qualities = np.full((len(paths), QUALITY_SIZE), np.nan, dtype=np.float32)
+        for i, entry in enumerate(entries):
+            if entry[3] is not None:
+                embeddings[i] = entry[3]
+            if entry[4] is not None:
+                qualities[i] = entry[4]
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                version=CACHE_VERSION,
+                model=self.model_name,
+                paths=np.array(paths, dtype=str),
+                sizes=np.array([e[0] for e in entries], dtype=np.int64),
+                mtimes=np.array([e[1] for e in entries], dtype=np.int64),
+                digests=np.array([e[2] for e in entries], dtype=str),
+                valid=np.array([e[3] is not None for e in entries], dtype=bool),
+                embeddings=embeddings,
+                quality=qualities,
+            )
+        os.replace(tmp_path, path)
+        return len(self.entries) - len(paths)
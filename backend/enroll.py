@@ -1,13 +1,21 @@
 import cv2
-import pyodbc
 import os
+import sys
+import csv
+import time
 import random
 import string
 import smtplib
 import json
+import argparse
+import threading
 import numpy as np
-import insightface
-from insightface.app import FaceAnalysis
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from embedder import FaceEmbedder, PROFILES
+from gallery import embedding_to_blob
+from repository import build_repository   # Backend chosen by AMS_DB_BACKEND
+from mail_sender import MailSender
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
@@ -38,38 +46,53 @@ load_env_manual()
 # ==========================================
 # 2. CONFIGURATION
 # ==========================================
-SERVER_NAME = r'ABDULRHMANSEYAM'
-DATABASE_NAME = 'Attendsystem'
+repo = build_repository()
 
 SENDER_EMAIL = os.environ.get("EMAIL_USER")
 SENDER_PASS = os.environ.get("EMAIL_PASS")
+SMTP_HOST = os.environ.get("EMAIL_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.environ.get("EMAIL_PORT", "587"))
+PHOTO_EXTENSIONS = ('.jpg', '.png', '.jpeg')
 
-# Initialize InsightFace (The "Brain")
+# Batch mode (--roster)
+BATCH_CHUNK = 200           # Students per INSERT transaction
+BATCH_WORKERS = 1           # Processes computing embeddings (each loads its own model)
+
+# InsightFace (The "Brain") is loaded on first use: batch workers load their own copy.
 # This will download a model (~300MB) on the very first run only.
-print("⏳ Loading InsightFace AI... (This might take a moment)")
-model = FaceAnalysis(name='buffalo_l', providers=['CPUExecutionProvider'])
-model.prepare(ctx_id=0, det_size=(640, 640))
+model = None
+
+def load_model():
+    global model
+    if model is None:
+        print("⏳ Loading InsightFace AI... (This might take a moment)")
+        model = FaceEmbedder.from_profile('enrollment')
+    return model
 
 def get_db_connection():
-    return pyodbc.connect(f"Driver={{SQL Server}};Server={SERVER_NAME};Database={DATABASE_NAME};Trusted_Connection=yes;")
+    return repo.connect()
 
 def generate_password(length=6):
     chars = string.ascii_letters + string.digits
     return ''.join(random.choice(chars) for _ in range(length))
 
+def welcome_message(personal_email, school_email, password, name, from_address=None):
+    msg = MIMEMultipart()
+    msg['From'] = from_address or SENDER_EMAIL
+    msg['To'] = personal_email
+    msg['Subject'] = "Welcome to FUE Attendance System"
+    body = f"Hello {name},\n\nYour account is ready.\n\nLogin: {school_email}\nPass: {password}"
+    msg.attach(MIMEText(body, 'plain'))
+    return msg
+
 def send_email(personal_email, school_email, password, name):
     if not SENDER_EMAIL: 
         print("⚠️ Email skipped (Credentials missing).")
         return
     try:
-        msg = MIMEMultipart()
-        msg['From'] = SENDER_EMAIL
-        msg['To'] = personal_email
-        msg['Subject'] = "Welcome to FUE Attendance System"
-        body = f"Hello {name},\n\nYour account is ready.\n\nLogin: {school_email}\nPass: {password}"
-        msg.attach(MIMEText(body, 'plain'))
+        msg = welcome_message(personal_email, school_email, password, name)
         
-        server = smtplib.SMTP('smtp.gmail.com', 587)
+        server = smtplib.SMTP(SMTP_HOST, SMTP_PORT)
         server.starttls()
         server.login(SENDER_EMAIL, SENDER_PASS)
         server.send_message(msg)
@@ -84,19 +107,25 @@ def get_insightface_embedding(folder_path):
         print(f"❌ Error: Folder '{folder_path}' not found.")
         return None
 
-    files = [f for f in os.listdir(folder_path) if f.lower().endswith(('.jpg', '.png', '.jpeg'))]
+    files = photo_paths(folder_path)
     print(f"📂 Found {len(files)} images. Analyzing...")
 
-    for file in files:
-        img_path = os.path.join(folder_path, file)
+    for img_path in files:
         img = cv2.imread(img_path)
         if img is None: continue
 
-        faces = model.get(img)
-        if len(faces) > 0:
-            embeddings.append(faces[0].embedding)
+        _, embedding = load_model().embed_largest_face(img)
+        if embedding is not None:
+            embeddings.append(embedding)
 
-    if not embeddings: return None
+    return average_embedding(embeddings)
+
+def photo_paths(folder_path):
+    return [os.path.join(folder_path, f) for f in sorted(os.listdir(folder_path)) if f.lower().endswith(PHOTO_EXTENSIONS)]
+
+def average_embedding(embeddings):
+    """One unit-length vector (as a list) for all of a student's photos, or None"""
+    if len(embeddings) == 0: return None
     
     # Average and Normalize
     avg_embedding = np.mean(embeddings, axis=0)
@@ -112,11 +141,9 @@ def main():
     id_num = input("Enter Student ID: ").strip()
     
     conn = get_db_connection()
-    cursor = conn.cursor()
     
     # Check if exists
-    cursor.execute("SELECT id FROM student WHERE id = ?", (id_num,))
-    if cursor.fetchone():
+    if repo.student_exists(conn, id_num):
         print(f"❌ Student ID {id_num} already exists.")
         conn.close()
         return
@@ -134,15 +161,12 @@ def main():
         conn.close()
         return
 
-    face_json = json.dumps(face_data)
+    face_blob = embedding_to_blob(face_data)
     school_email = f"{id_num}@fue.edu.eg"
     password = generate_password()
 
     try:
-        cursor.execute("""
-            INSERT INTO student (id, first_name, last_name, email, password, facial_encoding) 
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (id_num, first_name, last_name, school_email, password, face_json))
+        repo.insert_student(conn, id_num, first_name, last_name, school_email, password, face_blob)
         
         conn.commit()
         print("✅ Student Saved Successfully!")
@@ -155,5 +179,235 @@ def main():
     finally:
         conn.close()
 
+# ==========================================
+# 4. BATCH MODE (CSV roster of a whole intake)
+# ==========================================
+# Roster columns: student_id, first_name, last_name, personal_email, photos
+# ('photos' is a folder of that student's pictures, relative to the roster file)
+ROSTER_COLUMNS = ('student_id', 'first_name', 'last_name', 'personal_email', 'photos')
+DONE = {'inserted', 'emailed', 'email_failed', 'exists'}   # Statuses a resumed run doesn't redo
+
+class ProgressLog:
+    """
+    Append-only JSON lines next to the roster, one per step of one student
+    (no_photos / no_face / error / exists / inserted / emailed / email_failed).
+    A rerun reads it back and skips every student that already reached the DB,
+    only re-queuing welcome emails that were never sent.
+
+    'inserted' lines hold the initial password until the email goes out:
+    keep the file as private as the student table itself.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.last = {}       # student_id -> last record
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue   # Torn last line from a crash
+                    self.last[entry['student_id']] = dict(self.last.get(entry['student_id'], {}), **entry)
+        self._lock = threading.Lock()   # The mail thread records too
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def record(self, student_id, status, **extra):
+        entry = dict(student_id=student_id, status=status, at=datetime.now().isoformat(timespec='seconds'), **extra)
+        with self._lock:
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+            self.last[student_id] = dict(self.last.get(student_id, {}), **entry)
+
+    def status(self, student_id):
+        return self.last.get(student_id, {}).get('status')
+
+    def counts(self):
+        with self._lock:
+            totals = {}
+            for entry in self.last.values():
+                totals[entry['status']] = totals.get(entry['status'], 0) + 1
+            return totals
+
+    def close(self):
+        self._file.close()
+
+def read_roster(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        missing = [c for c in ROSTER_COLUMNS if c not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"Roster is missing column(s): {', '.join(missing)}")
+        roster_dir = os.path.dirname(os.path.abspath(path))
+        students = []
+        for row in reader:
+            student = {c: (row[c] or '').strip() for c in ROSTER_COLUMNS}
+            if not student['student_id'].isdigit():
+                print(f"⚠️ Skipping roster row with invalid student_id '{student['student_id']}'")
+                continue
+            student['photos'] = os.path.join(roster_dir, student['photos'])
+            students.append(student)
+        return students
+
+# --- Workers: one model per process (like train.py) ---
+_worker_model = None
+
+def init_worker(intra_op_threads=None):
+    global _worker_model
+    profile = PROFILES['enrollment']
+    if intra_op_threads:
+        profile = profile._replace(intra_op_threads=intra_op_threads)
+    _worker_model = FaceEmbedder.from_profile(profile)
+
+def embed_student(task):
+    """Runs in a worker: (student_id, averaged embedding or None, photos found, faces used)"""
+    student_id, folder = task
+    paths = photo_paths(folder) if os.path.isdir(folder) else []
+    crops = []
+    for path in paths:
+        img = cv2.imread(path)
+        if img is None:
+            continue
+        bboxes, kpss = _worker_model.detect(img)
+        if bboxes.shape[0] == 0:
+            continue
+        areas = (bboxes[:, 2] - bboxes[:, 0]) * (bboxes[:, 3] - bboxes[:, 1])
+        crops.append(_worker_model.align(img, kpss[int(np.argmax(areas))]))
+    # All of the student's faces in one batched ArcFace call
+    return student_id, average_embedding(_worker_model.embed_crops(crops)), len(paths), len(crops)
+
+def embed_all(tasks, workers):
+    """Yields embed_student() results in roster order while the workers keep going"""
+    if workers <= 1:
+        init_worker()
+        yield from map(embed_student, tasks)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(max(1, (os.cpu_count() or 1) // workers),)) as pool:
+        yield from pool.map(embed_student, tasks, chunksize=4)
+
+def insert_chunk(conn, rows, progress):
+    """One transaction for the chunk; if it fails, row by row so one bad row doesn't sink the rest"""
+    try:
+        repo.insert_students(conn, rows)
+        conn.commit()
+        return rows
+    except Exception as e:
+        conn.rollback()
+        print(f"⚠️ Chunk insert failed ({e}), retrying {len(rows)} students one by one")
+
+    inserted = []
+    for row in rows:
+        try:
+            repo.insert_student(conn, *row)
+            conn.commit()
+            inserted.append(row)
+        except Exception as e:
+            conn.rollback()
+            progress.record(str(row[0]), 'error', error=str(e))
+    return inserted
+
+def batch_enroll(roster_path, workers=BATCH_WORKERS, chunk_size=BATCH_CHUNK, smtp_host=None, smtp_port=None,
+                 starttls=True, send_emails=True):
+    students = read_roster(roster_path)
+    progress = ProgressLog(roster_path + '.progress.jsonl')
+    start = time.perf_counter()
+    print(f"\n--- BATCH REGISTRATION: {len(students)} students from {roster_path} ---")
+
+    # 1. Welcome emails go through ONE background SMTP connection
+    sender = None
+    if send_emails and (SENDER_EMAIL or smtp_host):
+        def on_result(student_id, error):
+            if error:
+                progress.record(student_id, 'email_failed', error=error)
+            else:
+                progress.record(student_id, 'emailed')
+        sender = MailSender(smtp_host or SMTP_HOST, smtp_port or SMTP_PORT,
+                            SENDER_EMAIL if starttls else None, SENDER_PASS if starttls else None,
+                            starttls=starttls, on_result=on_result)
+    elif send_emails:
+        print("⚠️ Emails skipped (Credentials missing).")
+    from_address = SENDER_EMAIL or "attendance@fue.edu.eg"
+
+    def queue_email(student, password):
+        if sender and student['personal_email']:
+            msg = welcome_message(student['personal_email'], f"{student['student_id']}@fue.edu.eg", password,
+                                  student['first_name'], from_address=from_address)
+            sender.send(msg, key=student['student_id'])
+
+    conn = get_db_connection()
+    try:
+        # 2. Resume: skip what a previous run (or anyone else) already put in the DB
+        by_id = {s['student_id']: s for s in students}
+        for sid, entry in list(progress.last.items()):
+            if entry['status'] in ('inserted', 'email_failed') and sid in by_id and entry.get('password'):
+                queue_email(by_id[sid], entry['password'])
+        in_db = repo.existing_students(conn, [s['student_id'] for s in students])
+        todo = []
+        for s in students:
+            if progress.status(s['student_id']) in DONE:
+                continue
+            if s['student_id'] in in_db:
+                progress.record(s['student_id'], 'exists')
+                continue
+            todo.append(s)
+        print(f"🔁 {len(students) - len(todo)} already done, {len(todo)} to enroll with {workers} worker(s)")
+
+        # 3. Embeddings in parallel, inserted in chunked transactions as they arrive
+        rows, passwords, done = [], {}, 0
+        def flush():
+            for row in insert_chunk(conn, rows, progress):
+                sid = str(row[0])
+                progress.record(sid, 'inserted', password=passwords[sid])
+                queue_email(by_id[sid], passwords[sid])
+            rows.clear()
+            passwords.clear()
+
+        for sid, embedding, photos, faces in embed_all([(s['student_id'], s['photos']) for s in todo], workers):
+            done += 1
+            s = by_id[sid]
+            if embedding is None:
+                progress.record(sid, 'no_photos' if photos == 0 else 'no_face', photos=photos)
+            else:
+                passwords[sid] = generate_password()
+                rows.append((int(sid), s['first_name'], s['last_name'], f"{sid}@fue.edu.eg",
+                             passwords[sid], embedding_to_blob(embedding)))
+                if len(rows) >= chunk_size:
+                    flush()
+            if done % 100 == 0:
+                rate = done / (time.perf_counter() - start)
+                print(f"   {done}/{len(todo)} embedded ({rate:.1f} students/s) {progress.counts()}")
+        if rows:
+            flush()
+    finally:
+        conn.close()
+        if sender:
+            print(f"📧 Sending {sender.stats()['pending']} queued emails...")
+            sender.close()
+        totals = progress.counts()
+        progress.close()
+
+    print(f"✅ Batch done in {time.perf_counter() - start:.1f}s: {totals}")
+    print(f"📝 Progress report: {progress.path} (rerun the same command to resume)")
+    return totals
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Register students: one interactively, or a whole intake from a CSV roster")
+    parser.add_argument('--roster', help=f"CSV with columns: {', '.join(ROSTER_COLUMNS)}")
+    parser.add_argument('--workers', type=int, default=BATCH_WORKERS, help="Processes computing embeddings (each loads its own model)")
+    parser.add_argument('--chunk', type=int, default=BATCH_CHUNK, help="Students per INSERT transaction")
+    parser.add_argument('--smtp-host', help=f"Mail server (default {SMTP_HOST}); e.g. localhost with mail_sender.py's stand-in")
+    parser.add_argument('--smtp-port', type=int)
+    parser.add_argument('--no-tls', action='store_true', help="Plain SMTP without STARTTLS/login (local stand-in server)")
+    parser.add_argument('--no-email', action='store_true')
+    args = parser.parse_args()
+
+    if args.roster:
+        try:
+            batch_enroll(args.roster, args.workers, args.chunk, args.smtp_host, args.smtp_port,
+                         starttls=not args.no_tls, send_emails=not args.no_email)
+        except (OSError, ValueError) as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+    else:
+        main()
\ No newline at end of file
@@ -0,0 +1,132 @@
+import argparse
+import json
+import threading
+import numpy as np
+from datetime import timedelta
+from gallery import FaceGallery, EMBEDDING_DIM, blob_to_embedding, embedding_to_blob
+
+# --- CONFIGURATION ---
+SYNC_OVERLAP_SECONDS = 300   # Re-read this far behind the newest timestamp seen (late commits, clock steps)
+# ---------------------
+
+
+class EnrolledFaces:
+    """
+    Students enrolled straight into the database (enroll.py), kept in memory
+    as a small gallery of their own that is searched next to the train.py
+    gallery, so they are recognized without a retrain and without copying or
+    re-indexing the (memory-mapped) brain file.
+
+    student.face_embedding holds one float32 blob per student and
+    student.face_updated_at is set by the database (CURRENT_TIMESTAMP) on
+    every write. sync() asks only for rows stamped at or after the newest
+    stamp it has already seen (minus SYNC_OVERLAP_SECONDS), and counts a row
+    as changed only if its stamp or embedding differs from the one held, so a
+    quiet database costs one small indexed query.
+
+    A NULL face_embedding with a fresh stamp removes the student. Rows deleted
+    outright are only noticed by a full sync (gallery reload).
+    """
+
+    def __init__(self, repo, connection, overlap_seconds=SYNC_OVERLAP_SECONDS, dim=EMBEDDING_DIM):
+        self.repo = repo
+        self._connection = connection      # Context manager factory, e.g. FaceEngine.db
+        self.overlap = timedelta(seconds=overlap_seconds)
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._faces = {}                   # student_id -> (label, embedding, face_updated_at)
+        self._newest = None
+        self.counters = {"syncs": 0, "full_syncs": 0, "changed": 0, "removed": 0, "skipped": 0}
+
+    def __len__(self):
+        return len(self._faces)
+
+    def sync(self, full=False):
+        """Pulls changed rows from the database. Returns how many students changed."""
+        with self._lock:
+            since = None if full or self._newest is None else self._newest - self.overlap
+            with self._connection() as conn:
+                rows = self.repo.face_embeddings_since(conn, since)
+
+            faces = {} if since is None else self._faces
+            previous = self._faces
+            changed = 0
+            for row in rows:
+                sid = str(row.id)
+                if since is not None and self._unchanged(previous.get(sid), row):
+                    continue   # Seen already (inside the overlap window)
+                self._newest = row.face_updated_at if self._newest is None else max(self._newest, row.face_updated_at)
+
+                if row.face_embedding is None:
+                    if faces.pop(sid, None) is not None:
+                        self.counters["removed"] += 1
+                        changed += 1
+                    continue
+                embedding = blob_to_embedding(row.face_embedding)
+                if embedding.size != self.dim:
+                    self.counters["skipped"] += 1
+                    print(f"⚠️ Student {sid}: stored embedding is {embedding.size}-d, expected {self.dim}-d. Re-enroll.")
+                    continue
+                faces[sid] = (f"{row.first_name} {row.last_name} - {sid}", embedding, row.face_updated_at)
+                changed += 1
+
+            if since is None:
+                changed = len(faces) if not previous else changed + len(previous.keys() - faces.keys())
+                self.counters["full_syncs"] += 1
+            self._faces = faces
+            self.counters["syncs"] += 1
+            self.counters["changed"] += changed
+            return changed
+
+    @staticmethod
+    def _unchanged(held, row):
+        # Stamps can repeat (SQLite's CURRENT_TIMESTAMP has 1 s resolution), so compare the bytes too
+        return (held is not None and held[2] == row.face_updated_at and row.face_embedding is not None
+                and held[1].tobytes() == bytes(row.face_embedding))
+
+    def gallery(self, model_name=None):
+        """A new gallery with one row per enrolled student"""
+        with self._lock:
+            faces = list(self._faces.values())
+        if not faces:
+            return FaceGallery(dim=self.dim, model_name=model_name)
+        return FaceGallery.from_arrays(np.stack([embedding for _, embedding, _ in faces]),
+                                       [label for label, _, _ in faces], model_name=model_name)
+
+    def stats(self):
+        with self._lock:
+            newest = self._newest.isoformat(sep=' ', timespec='seconds') if self._newest else None
+            return dict(self.counters, students=len(self._faces), newest=newest)
+
+
+def migrate_json_encodings(repo):
+    """One-off: copies legacy JSON-text facial_encoding values into face_embedding blobs"""
+    conn = repo.connect()
+    try:
+        rows = repo.legacy_face_encodings(conn)
+        for row in rows:
+            repo.set_face_embedding(conn, row.id, embedding_to_blob(json.loads(row.facial_encoding)))
+        conn.commit()
+        return len(rows)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    from repository import build_repository, DB_BACKEND
+
+    parser = argparse.ArgumentParser(description="Enrolled (database) face embeddings")
+    parser.add_argument('--migrate', action='store_true', help="Convert legacy JSON facial_encoding rows to float32 blobs")
+    parser.add_argument('--backend', default=DB_BACKEND)
+    args = parser.parse_args()
+
+    repo = build_repository(args.backend)
+    if args.migrate:
+        print(f"✅ Converted {migrate_json_encodings(repo)} JSON encodings to face_embedding blobs")
+
+    conn = repo.connect()
+    try:
+        rows = repo.face_embeddings_since(conn)
+    finally:
+        conn.close()
+    print(f"📊 {sum(row.face_embedding is not None for row in rows)} students have a face_embedding")
@@ -0,0 +1,388 @@
+import os
+import json
+import mmap
+import time
+import pickle
+import hashlib
+import numpy as np
+from datetime import datetime
+
+# --- CONFIGURATION ---
+EMBEDDING_DIM = 512        # buffalo_l (ArcFace) embedding size
+MIN_CAPACITY = 1024        # Rows reserved up-front so small enrollments never re-allocate
+STORE_FORMAT = 'ams-face-gallery'
+STORE_VERSION = 1          # Bump when the on-disk layout changes
+STORE_READ_ATTEMPTS = 5    # A store re-written while it is being opened is read again
+# ---------------------
+
+
+def split_label(label):
+    """Splits a training folder label ("Name - ID") into (name, id)"""
+    if " - " in label:
+        name, sid = label.rsplit(" - ", 1)
+        return name, sid
+    return label, "Unknown"
+
+
+def embedding_to_blob(vector):
+    """Compact DB form of one embedding: little-endian float32 bytes (2 KB at 512-d, vs ~10 KB of JSON)"""
+    return np.asarray(vector, dtype='<f4').tobytes()
+
+
+def blob_to_embedding(blob):
+    return np.frombuffer(blob, dtype='<f4')
+
+
+def normalize_rows(vectors):
+    """Returns a float32 (N x D) copy of `vectors` with every row scaled to unit length"""
+    matrix = np.array(vectors, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class FaceGallery:
+    """
+    The known faces, stored ONCE as a contiguous float32 matrix (one row per image)
+    plus parallel label / name / student-id arrays.
+
+    Rows live in a pre-allocated buffer that grows geometrically, so adding a student
+    appends in place instead of rebuilding the whole matrix. `embeddings` is a
+    read-only view over the filled part of that buffer.
+
+    A gallery opened with from_store() keeps its matrix memory-mapped (shared by
+    every worker through the OS page cache) until the first add/remove copies it.
+    """
+
+    def __init__(self, dim=EMBEDDING_DIM, capacity=MIN_CAPACITY, model_name=None):
+        self.dim = dim
+        self.model_name = model_name
+        self._size = 0
+        self._groups = None       # Rows grouped per identity, built on first match_faces()
+        self._fingerprint = None  # gallery_fingerprint(), kept until the rows change
+        self._allocate(capacity)
+
+    # ------------------------------------------
+    # Storage
+    # ------------------------------------------
+    def _allocate(self, capacity):
+        self._matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        self._labels = np.empty(capacity, dtype=object)
+        self._names = np.empty(capacity, dtype=object)
+        self._ids = np.empty(capacity, dtype=object)
+
+    def _reserve(self, extra):
+        needed = self._size + extra
+        capacity = len(self._matrix)
+        if needed <= capacity:
+            return
+
+        new_capacity = max(needed, capacity * 2, MIN_CAPACITY)
+        old = (self._matrix, self._labels, self._names, self._ids)
+        self._allocate(new_capacity)
+        for dst, src in zip((self._matrix, self._labels, self._names, self._ids), old):
+            dst[:self._size] = src[:self._size]
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def embeddings(self):
+        view = self._matrix[:self._size]
+        view.flags.writeable = False
+        return view
+
+    @property
+    def labels(self):
+        return self._labels[:self._size]
+
+    @property
+    def names(self):
+        return self._names[:self._size]
+
+    @property
+    def ids(self):
+        return self._ids[:self._size]
+
+    # ------------------------------------------
+    # Identity management
+    # ------------------------------------------
+    def add_identity(self, label, embeddings):
+        """Appends one or more embeddings for `label` ("Name - ID"). Returns rows added."""
+        rows = normalize_rows(embeddings)
+        if rows.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-d embeddings, got {rows.shape[1]}-d")
+
+        name, sid = split_label(label)
+        count = len(rows)
+        self._reserve(count)
+
+        start, end = self._size, self._size + count
+        self._matrix[start:end] = rows
+        self._labels[start:end] = label
+        self._names[start:end] = name
+        self._ids[start:end] = sid
+        self._size = end
+        self._groups = None
+        self._fingerprint = None
+        return count
+
+    def remove_identity(self, student_id):
+        """Drops every row belonging to `student_id`. Returns rows removed."""
+        keep = self.ids != str(student_id)
+        removed = self._size - int(keep.sum())
+        if removed == 0:
+            return 0
+
+        # Compact into a fresh buffer so views handed out earlier stay valid
+        kept = (self.embeddings[keep], self.labels[keep], self.names[keep], self.ids[keep])
+        self._size = len(kept[0])
+        self._allocate(max(self._size, MIN_CAPACITY))
+        for dst, src in zip((self._matrix, self._labels, self._names, self._ids), kept):
+            dst[:self._size] = src
+        self._groups = None
+        self._fingerprint = None
+        return removed
+
+    def identities(self):
+        """Unique student ids in first-seen order"""
+        seen = dict.fromkeys(self.ids)
+        return list(seen)
+
+    def release_pages(self):
+        """
+        Drops this process's mapping of the memory-mapped rows (after a matcher
+        has streamed them once to build a compressed copy). The file stays in the
+        OS page cache; rows read later are faulted back in on demand.
+        No-op for in-memory galleries and platforms without madvise.
+        """
+        mapped = getattr(self._matrix, '_mmap', None)
+        if mapped is not None and hasattr(mmap, 'MADV_DONTNEED'):
+            mapped.madvise(mmap.MADV_DONTNEED)
+
+    # ------------------------------------------
+    # Matching
+    # ------------------------------------------
+    def match(self, probe):
+        """
+        Cosine match of a unit-length probe against every row.
+        Returns (best_row, score), or (-1, 0.0) if the gallery is empty.
+        """
+        if self._size == 0:
+            return -1, 0.0
+
+        probe = np.asarray(probe, dtype=np.float32)
+        similarities = self.embeddings @ probe
+        best_idx = int(np.argmax(similarities))
+        return best_idx, float(similarities[best_idx])
+
+    def identity_groups(self):
+        """(order, starts, ends): row order that makes each identity one contiguous block, and the block bounds"""
+        if self._groups is None:
+            _, inverse = np.unique(self.labels.astype(str), return_inverse=True)
+            order = np.argsort(inverse, kind='stable')
+            _, starts = np.unique(inverse[order], return_index=True)
+            self._groups = (order, starts, np.r_[starts[1:], len(order)])
+        return self._groups
+
+    def match_faces(self, probes, threshold):
+        """
+        Matches many unit-length probes (e.g. every face in a classroom photo) at once.
+        Returns [(face_index, gallery_row, score)] for the faces scoring above
+        `threshold`; see match_faces_across().
+        """
+        return [(face, row, score) for face, _, row, score in match_faces_across([self], probes, threshold)]
+
+    # ------------------------------------------
+    # Loading
+    # ------------------------------------------
+    @classmethod
+    def from_pickle(cls, path):
+        """Builds a gallery from the {'embeddings': [...], 'names': [...]} file written by train.py"""
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+        return cls.from_arrays(data['embeddings'], data['names'])
+
+    @classmethod
+    def from_arrays(cls, embeddings, labels, model_name=None):
+        labels = list(labels)
+        if not labels:
+            return cls(model_name=model_name)
+
+        rows = normalize_rows(embeddings)
+        count = len(labels)
+        gallery = cls(dim=rows.shape[1], capacity=max(count, MIN_CAPACITY), model_name=model_name)
+
+        parsed = [split_label(label) for label in labels]
+        gallery._matrix[:count] = rows
+        gallery._labels[:count] = labels
+        gallery._names[:count] = [name for name, _ in parsed]
+        gallery._ids[:count] = [sid for _, sid in parsed]
+        gallery._size = count
+        return gallery
+
+    @classmethod
+    def from_store(cls, header_path, attempts=STORE_READ_ATTEMPTS):
+        """
+        Opens a gallery written by save_store(). The matrix is memory-mapped, and
+        read once to check it against the header's fingerprint: a store re-written
+        between reading the header and mapping the data (same row count, other
+        rows) is opened again instead of being served mismatched.
+        """
+        for attempt in range(1, attempts + 1):
+            try:
+                return cls._open_store(header_path)
+            except StoreChanged:
+                if attempt == attempts:
+                    raise
+                time.sleep(0.05 * attempt)   # The writer replaces the header last: give it time to land
+
+    @classmethod
+    def _open_store(cls, header_path):
+        with open(header_path, 'r') as f:
+            header = json.load(f)
+
+        if header.get('format') != STORE_FORMAT:
+            raise ValueError(f"{header_path} is not a face gallery header")
+        if header.get('version', 0) > STORE_VERSION:
+            raise ValueError(f"{header_path} is version {header['version']}, this code reads up to {STORE_VERSION}")
+
+        dim, count = header['dim'], header['rows']
+        if count == 0:
+            return cls(dim=dim, model_name=header['model'])
+
+        matrix_path, codes_path = store_paths(header_path)
+        matrix = np.load(matrix_path, mmap_mode='r')
+        codes = np.load(codes_path, mmap_mode='r')
+        if matrix.shape != (count, dim) or matrix.dtype != np.float32 or len(codes) != count:
+            raise StoreChanged(f"{header_path} does not match its data files (was it re-written mid-read?)")
+
+        table = header['labels']
+        parsed = [split_label(label) for label in table]
+        codes = np.asarray(codes, dtype=np.intp)
+
+        gallery = cls(dim=dim, capacity=0, model_name=header['model'])
+        gallery._matrix = matrix
+        gallery._labels = np.array(table, dtype=object)[codes]
+        gallery._names = np.array([name for name, _ in parsed], dtype=object)[codes]
+        gallery._ids = np.array([sid for _, sid in parsed], dtype=object)[codes]
+        gallery._size = count
+        if 'fingerprint' in header and gallery_fingerprint(gallery) != header['fingerprint']:   # Older stores have none
+            raise StoreChanged(f"{header_path} fingerprint does not match its data files (was it re-written mid-read?)")
+        return gallery
+
+    # ------------------------------------------
+    # Saving
+    # ------------------------------------------
+    def save_store(self, header_path, model_name=None):
+        """
+        Writes the binary gallery:
+          <name>.npy         float32 (rows x dim) matrix, opened later with np.memmap
+          <name>.labels.npy  uint32 code per row into the header's label table
+          <name>.json        header: format, version, model, dim, rows, fingerprint, label table
+        The header is replaced last, so readers never see it ahead of its data.
+        """
+        model_name = model_name or self.model_name
+        labels = list(self.labels)
+        table = list(dict.fromkeys(labels))
+        lookup = {label: code for code, label in enumerate(table)}
+        codes = np.array([lookup[label] for label in labels], dtype=np.uint32)
+
+        matrix_path, codes_path = store_paths(header_path)
+        _atomic_write(matrix_path, lambda f: np.save(f, np.ascontiguousarray(self.embeddings)))
+        _atomic_write(codes_path, lambda f: np.save(f, codes))
+
+        header = {
+            "format": STORE_FORMAT,
+            "version": STORE_VERSION,
+            "model": model_name,
+            "dim": self.dim,
+            "rows": len(self),
+            "fingerprint": gallery_fingerprint(self),
+            "identities": len(table),
+            "created_at": datetime.now().isoformat(timespec='seconds'),
+            "labels": table,
+        }
+        _atomic_write(header_path, lambda f: f.write(json.dumps(header, indent=1).encode('utf-8')))
+
+
+def match_faces_across(galleries, probes, threshold):
+    """
+    Matches many unit-length probes against one or more galleries (the brain
+    file and the faces enrolled since) without merging them.
+
+    One (faces x rows) matrix product per gallery scores every face against
+    every image; each identity keeps its best image. Faces are then assigned
+    greedily, highest score first, so no student is given to two faces, even
+    one who appears in both galleries, and no face gets two identities.
+    Returns [(face_index, gallery, row, score)] for the faces scoring above `threshold`.
+    """
+    galleries = [gallery for gallery in galleries if len(gallery)]
+    if not galleries:
+        return []
+    probes = np.asarray(probes, dtype=np.float32).reshape(-1, galleries[0].dim)
+    if len(probes) == 0:
+        return []
+
+    parts, blocks, keys, offsets = [], [], [], [0]
+    for gallery in galleries:
+        order, starts, ends = gallery.identity_groups()
+        similarities = (probes @ gallery.embeddings.T)[:, order]
+        blocks.append(np.maximum.reduceat(similarities, starts, axis=1))   # faces x identities
+        keys.extend(gallery.ids[order[starts]])
+        offsets.append(offsets[-1] + len(starts))
+        parts.append((gallery, similarities, order, starts, ends))
+    scores = np.hstack(blocks)
+
+    faces, columns = np.nonzero(scores > threshold)
+    ranked = np.argsort(-scores[faces, columns], kind='stable')
+
+    matches, used_faces, used_keys = [], set(), set()
+    for k in ranked:
+        face, column = int(faces[k]), int(columns[k])
+        if face in used_faces or keys[column] in used_keys:
+            continue
+        used_faces.add(face)
+        used_keys.add(keys[column])
+
+        part = int(np.searchsorted(offsets, column, side='right')) - 1
+        gallery, similarities, order, starts, ends = parts[part]
+        identity = column - offsets[part]
+        lo, hi = starts[identity], ends[identity]
+        row = int(order[lo + np.argmax(similarities[face, lo:hi])])
+        matches.append((face, gallery, row, float(scores[face, column])))
+    return sorted(matches, key=lambda match: match[0])
+
+
+class StoreChanged(ValueError):
+    """The gallery files on disk changed while from_store() was reading them"""
+
+
+def gallery_fingerprint(gallery):
+    """Hash of the gallery contents, stored in its header and in persisted indexes so stale data is never used"""
+    if gallery._fingerprint is None:
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(memoryview(np.ascontiguousarray(gallery.embeddings)).cast('B'))   # No bytes copy of the matrix
+        digest.update("\n".join(gallery.labels).encode('utf-8'))
+        gallery._fingerprint = digest.hexdigest()
+    return gallery._fingerprint
+
+
+def store_paths(header_path):
+    """(matrix_path, codes_path) that belong to a gallery header"""
+    base = os.path.splitext(header_path)[0]
+    return base + '.npy', base + '.labels.npy'
+
+
+def _atomic_write(path, write):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def load_gallery(path):
+    """Opens either a binary gallery header (.json) or a legacy train.py pickle (.pkl)"""
+    if path.endswith('.pkl'):
+        return FaceGallery.from_pickle(path)
+    return FaceGallery.from_store(path)
@@ -0,0 +1,61 @@
+import cv2
+import numpy as np
+
+# --- CONFIGURATION ---
+MAX_SCAN_SIDE = 1280       # Longest side worth decoding for a scan (the detector runs at <= 640)
+# ---------------------
+
+# Smallest-first: IMREAD_REDUCED_* decodes straight to 1/N size inside libjpeg (much cheaper)
+_REDUCED_MODES = [
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+]
+
+# JPEG "Start Of Frame" markers (baseline, progressive, ...) carry the image size
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def jpeg_dimensions(data):
+    """(width, height) read from the JPEG header without decoding, or None if not a JPEG"""
+    view = memoryview(data)
+    if len(view) < 4 or view[0] != 0xFF or view[1] != 0xD8:
+        return None
+
+    pos = 2
+    while pos + 9 < len(view):
+        if view[pos] != 0xFF:
+            return None
+        marker = view[pos + 1]
+        if marker == 0xFF:          # Fill byte
+            pos += 1
+            continue
+        length = (view[pos + 2] << 8) | view[pos + 3]
+        if marker in _SOF_MARKERS:
+            height = (view[pos + 5] << 8) | view[pos + 6]
+            width = (view[pos + 7] << 8) | view[pos + 8]
+            return width, height
+        pos += 2 + length
+    return None
+
+
+def decode_image(data, max_side=MAX_SCAN_SIDE):
+    """
+    Decodes uploaded image bytes in memory (no temp file).
+    Oversized JPEGs (e.g. 4000px phone photos) are decoded at 1/2, 1/4 or 1/8 size
+    so the longest side stays >= max_side. Returns None if the bytes aren't an image.
+    """
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    if buffer.size == 0:
+        return None
+
+    flags = cv2.IMREAD_COLOR
+    size = jpeg_dimensions(data) if max_side else None
+    if size:
+        longest = max(size)
+        for factor, mode in _REDUCED_MODES:
+            if longest // factor >= max_side:
+                flags = mode
+                break
+
+    return cv2.imdecode(buffer, flags)
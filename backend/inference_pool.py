@@ -0,0 +1,191 @@
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+# --- CONFIGURATION ---
+REPLICAS = 2               # Model copies, each served by its own thread
+MAX_BATCH = 8              # Scans embedded together in one ArcFace call
+BATCH_WINDOW_MS = 5        # How long a replica waits for more scans to join a batch
+MAX_QUEUE_DEPTH = 64       # Beyond this, new scans are rejected instead of queued
+STATS_WINDOW = 1000        # Recent requests kept for the latency percentiles
+# ---------------------
+
+
+class SchedulerBusy(Exception):
+    """Raised by submit() when the queue is full. Callers should answer 503 / 'try again'."""
+
+
+class _Job:
+    __slots__ = ('img', 'future', 'queued_at')
+
+    def __init__(self, img):
+        self.img = img
+        self.future = Future()
+        self.queued_at = time.perf_counter()
+
+
+class InferenceScheduler:
+    """
+    Runs face detection + embedding off the Flask request threads.
+
+    Scans go into one bounded queue. Each replica thread takes the first waiting
+    scan, keeps collecting for up to BATCH_WINDOW_MS (or MAX_BATCH scans), detects
+    every image, then embeds all the crops in ONE batched recognition call.
+    ONNX Runtime releases the GIL while it runs, so replicas really run in parallel.
+
+    Every result carries its own timing: queue_ms (waiting for a replica) vs
+    compute_ms (detect + embed of its batch), split into detect_ms and embed_ms.
+    """
+
+    def __init__(self, embedder_factory, replicas=REPLICAS, max_batch=MAX_BATCH,
+                 batch_window_ms=BATCH_WINDOW_MS, max_queue=MAX_QUEUE_DEPTH):
+        self.max_batch = max_batch
+        self.batch_window = batch_window_ms / 1000
+        self._queue = queue.Queue(maxsize=max_queue)
+
+        self._stats_lock = threading.Lock()
+        self._recent = deque(maxlen=STATS_WINDOW)   # (queue_ms, compute_ms, batch_size)
+        self._completed = 0
+        self._rejected = 0
+        self._failed = 0
+
+        self.replicas = [embedder_factory() for _ in range(max(1, replicas))]
+        for i, embedder in enumerate(self.replicas):
+            threading.Thread(target=self._run_replica, args=(embedder,), name=f"inference-{i}", daemon=True).start()
+
+    @property
+    def model_name(self):
+        return self.replicas[0].model_name
+
+    # ------------------------------------------
+    # Client side
+    # ------------------------------------------
+    def submit(self, img):
+        """Queues a decoded image. Returns a Future of (bbox, embedding, timing)."""
+        job = _Job(img)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._stats_lock:
+                self._rejected += 1
+            raise SchedulerBusy(f"Inference queue is full ({self._queue.maxsize} scans waiting)")
+        return job.future
+
+    def embed_largest_face(self, img, timeout=None):
+        """Blocking helper: (bbox, embedding, timing) of the biggest face, like FaceEmbedder's"""
+        return self.submit(img).result(timeout=timeout)
+
+    def warm_up(self, img=None):
+        """
+        Runs one scan through every replica, directly (call it before the first
+        submit()), so the first real scan doesn't meet cold ONNX sessions.
+        Uses each embedder's sample_image() unless `img` is given.
+        """
+        for embedder in self.replicas:
+            results, _, _ = self._process(embedder, [_Job(img if img is not None else embedder.sample_image())])
+            if isinstance(results[0], Exception):
+                raise results[0]
+
+    # ------------------------------------------
+    # Replica side
+    # ------------------------------------------
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.batch_window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_replica(self, embedder):
+        while True:
+            batch = self._next_batch()
+            started = time.perf_counter()
+            try:
+                results, detect_ms, embed_ms = self._process(embedder, batch)
+            except Exception as e:
+                for job in batch:
+                    job.future.set_exception(e)
+                continue
+
+            compute_ms = (time.perf_counter() - started) * 1000
+            with self._stats_lock:
+                for job, result in zip(batch, results):
+                    if isinstance(result, Exception):
+                        self._failed += 1
+                        job.future.set_exception(result)
+                        continue
+                    bbox, embedding = result
+                    timing = {
+                        "queue_ms": (started - job.queued_at) * 1000,
+                        "compute_ms": compute_ms,
+                        "detect_ms": detect_ms,
+                        "embed_ms": embed_ms,
+                        "batch_size": len(batch),
+                    }
+                    self._recent.append((timing["queue_ms"], compute_ms, len(batch)))
+                    self._completed += 1
+                    job.future.set_result((bbox, embedding, timing))
+
+    def _process(self, embedder, batch):
+        """
+        Detect each image, then one batched embed over all the largest-face crops.
+        Returns ([(bbox, embedding) or the exception of a scan that failed], detect_ms, embed_ms).
+        An error in the batched embed itself is raised (it concerns every scan).
+        """
+        started = time.perf_counter()
+        bboxes, crops, owners, failed = [None] * len(batch), [], [], {}
+        for i, job in enumerate(batch):
+            try:
+                dets, kpss = embedder.detect(job.img)
+                if dets.shape[0] == 0:
+                    continue
+                areas = (dets[:, 2] - dets[:, 0]) * (dets[:, 3] - dets[:, 1])
+                best = int(np.argmax(areas))
+                crop = embedder.align(job.img, kpss[best])
+            except Exception as e:
+                failed[i] = e      # One bad upload fails its own scan, not the rest of the batch
+                continue
+            bboxes[i] = dets[best]
+            crops.append(crop)
+            owners.append(i)
+
+        detected = time.perf_counter()
+        embeddings = [None] * len(batch)
+        for i, embedding in zip(owners, embedder.embed_crops(crops)):
+            embeddings[i] = embedding
+        embedded = time.perf_counter()
+        results = [failed.get(i, result) for i, result in enumerate(zip(bboxes, embeddings))]
+        return results, (detected - started) * 1000, (embedded - detected) * 1000
+
+    # ------------------------------------------
+    # Stats
+    # ------------------------------------------
+    def stats(self):
+        with self._stats_lock:
+            recent = np.array(self._recent) if self._recent else np.zeros((0, 3))
+            completed, rejected, failed = self._completed, self._rejected, self._failed
+
+        def pct(column, q):
+            return round(float(np.percentile(recent[:, column], q)), 2) if len(recent) else 0.0
+
+        return {
+            "replicas": len(self.replicas),
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": self._queue.maxsize,
+            "completed": completed,
+            "rejected": rejected,
+            "failed": failed,
+            "queue_ms": {"p50": pct(0, 50), "p95": pct(0, 95), "p99": pct(0, 99)},
+            "compute_ms": {"p50": pct(1, 50), "p95": pct(1, 95), "p99": pct(1, 99)},
+            "avg_batch_size": round(float(recent[:, 2].mean()), 2) if len(recent) else 0.0,
+        }
@@ -0,0 +1,422 @@
+import os
+import sys
+import json
+import time
+import uuid
+import pickle
+import random
+import argparse
+import threading
+import subprocess
+import http.client
+import glob
+from datetime import date, datetime, time as clock, timedelta
+from urllib.parse import urlencode, urlsplit
+
+import cv2
+import numpy as np
+from repository import build_repository
+from seed_db import seed, student_ids, INSTRUCTORS, CLASSROOMS
+from stub_embedder import identity_embedding, scan_image, UNKNOWN
+
+# --- CONFIGURATION ---
+WORK_DIR = 'loadtest_run'   # Synthetic gallery, seeded database, journal and server log of a run
+STUDENTS = 2000
+COURSES = 120
+IMAGES_PER_PERSON = 5       # Gallery rows per student (face_encodings.pkl format, like train.py)
+GALLERY_NOISE = 0.5         # Spread of a student's rows around their identity (cosine to it ~0.9)
+CONCURRENCY = 16            # Client threads, each with its own keep-alive connection
+DURATION_SECONDS = 30
+WARMUP_SECONDS = 3          # Requests started in the first seconds are not counted
+PORT = 5099
+STARTUP_TIMEOUT = 120
+UNKNOWN_SHARE = 0.05        # Kiosk scans of a face that is not in the gallery
+LIVE_SESSION_MINUTES = 120  # Every course gets a class running this long from now, so kiosk scans can check in
+RESULTS_FILE = 'loadtest_results.json'
+SEED = 42
+# Relative weight of each route in the request mix
+MIX = {
+    'kiosk_scan': 50,
+    'login': 15,
+    'student_courses': 10,
+    'course_details': 10,
+    'my_courses': 5,
+    'session_attendance': 10,
+}
+# ---------------------
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+# ==========================================
+# 1. FIXTURES (gallery + database)
+# ==========================================
+def synthetic_pickle(path, ids, images_per_person=IMAGES_PER_PERSON, seed_value=SEED):
+    """A train.py-style brain: a few noisy rows around each student's stub identity embedding"""
+    rng = np.random.default_rng(seed_value)
+    embeddings, names = [], []
+    for sid in ids:
+        center = identity_embedding(sid)
+        noise = rng.standard_normal((images_per_person, center.size)).astype(np.float32)
+        rows = center + noise * (GALLERY_NOISE / np.sqrt(center.size))
+        embeddings.extend(rows / np.linalg.norm(rows, axis=1, keepdims=True))
+        names.extend([f"Student {sid} - {sid}"] * images_per_person)
+    with open(path, 'wb') as f:
+        pickle.dump({'embeddings': embeddings, 'names': names}, f)
+    return len(names)
+
+
+def prepare(work_dir, students, courses, images_per_person, seed_value):
+    os.makedirs(work_dir, exist_ok=True)
+    db_path = os.path.join(work_dir, 'attendsystem.db')
+    stale = [os.path.join(work_dir, name) for name in ('attendsystem.db', 'attendsystem.db-wal', 'attendsystem.db-shm')]
+    for path in stale + glob.glob(os.path.join(work_dir, 'attendance_journal.*')):
+        if os.path.exists(path):
+            os.remove(path)
+
+    start = time.perf_counter()
+    seed(build_repository('sqlite', path=db_path), students, courses, seed_value)
+    rows = synthetic_pickle(os.path.join(work_dir, 'face_encodings.pkl'), student_ids(students),
+                            images_per_person, seed_value)
+    print(f"🌱 Fixtures: {students} students, {courses} courses, {rows} gallery rows "
+          f"({time.perf_counter() - start:.1f}s)")
+
+
+def seed_live_sessions(db_path, minutes=LIVE_SESSION_MINUTES):
+    """
+    Adds a class running right now for every course that has none, so kiosk
+    scans hit a session in progress whatever time the test starts (the seeded
+    timetable only has fixed slots). Returns how many sessions were added.
+    """
+    repo = build_repository('sqlite', path=db_path)
+    conn = repo.connect()
+    try:
+        now = datetime.now().replace(microsecond=0)
+        running = {s.course_id for s in repo.day_sessions(conn, now.date()) if s.session_start <= now < s.session_end}
+        # Starts today (the kiosk only loads today's timetable) and a little before now
+        start = max(now - timedelta(minutes=5), datetime.combine(now.date(), clock.min))
+        end = now + timedelta(minutes=minutes)
+        courses = conn.execute("SELECT id, instructor_id FROM course ORDER BY id").fetchall()
+        sessions = [(course_id, instructor_id, course_id % CLASSROOMS + 1, "TH", start, end, "Scheduled", start, end)
+                    for course_id, instructor_id in courses if course_id not in running]
+        repo.bulk_insert(conn, 'class_session', ("course_id", "instructor_id", "classroom_id", "session_type",
+                                                 "session_start", "session_end", "session_status",
+                                                 "attendance_start", "attendance_end"), sessions)
+        conn.commit()
+        return len(sessions)
+    finally:
+        conn.close()
+
+
+class Fixture:
+    """What the request generators pick from: the classes running now and who is enrolled in them"""
+
+    def __init__(self, db_path, students):
+        repo = build_repository('sqlite', path=db_path)
+        conn = repo.connect()
+        try:
+            now = datetime.now()
+            sessions = repo.day_sessions(conn, now.date())
+            enrollment = repo.day_enrollment(conn, now.date())
+        finally:
+            conn.close()
+
+        self.students = student_ids(students)
+        rooms = {}
+        for s in sessions:
+            if s.session_start <= now < s.session_end:
+                rooms.setdefault(s.course_id, s.classroom_id)
+        self.today_courses = sorted(rooms)
+        # (student_id, course_id, classroom_id) of a class each student is in right now
+        self.scans = [(row.student_id, row.course_id, rooms[row.course_id]) for row in enrollment
+                      if row.course_id in rooms]
+        if not self.scans:
+            raise RuntimeError(f"No class is running now in {db_path}: every kiosk scan would be refused")
+
+
+# ==========================================
+# 2. REQUESTS
+# ==========================================
+def multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, data, content_type) in files.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                     f'Content-Type: {content_type}\r\n\r\n'.encode() + data + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+def form(fields):
+    return urlencode(fields).encode(), 'application/x-www-form-urlencoded'
+
+
+def build_request(route, fixture, rng, noise_rng):
+    """(path, body, content_type) of one request of kind `route`"""
+    student_id, course_id, room_id = rng.choice(fixture.scans)
+
+    if route == 'kiosk_scan':
+        face = UNKNOWN if rng.random() < UNKNOWN_SHARE else student_id
+        _, jpeg = cv2.imencode('.jpg', scan_image(face, noise_rng), [cv2.IMWRITE_JPEG_QUALITY, 90])
+        body, content_type = multipart({'classroom_id': room_id}, {'image': ('scan.jpg', jpeg.tobytes(), 'image/jpeg')})
+        return '/kiosk_scan', body, content_type
+    if route == 'login':
+        if rng.random() < 0.7:
+            credentials = {'username': str(student_id), 'password': '123456'}
+        else:
+            credentials = {'username': f"instr{rng.randint(1, INSTRUCTORS)}", 'password': 'admin123'}
+        return '/login', json.dumps(credentials).encode(), 'application/json'
+    if route == 'student_courses':
+        return ('/get_student_courses',) + form({'student_id': student_id})
+    if route == 'course_details':
+        return ('/get_course_details',) + form({'student_id': student_id, 'course_id': course_id})
+    if route == 'my_courses':
+        return ('/get_my_courses',) + form({'instructor_id': rng.randint(1, INSTRUCTORS)})
+    if route == 'session_attendance':
+        return ('/get_session_attendance',) + form({'course_id': rng.choice(fixture.today_courses),
+                                                     'date': date.today().isoformat()})
+    raise ValueError(f"Unknown route '{route}'")
+
+
+def client(n, base_url, fixture, deadline, warmup_until, samples):
+    """One client thread: sends the weighted mix back to back until `deadline`"""
+    rng = random.Random(SEED * 1000 + n)
+    noise_rng = np.random.default_rng((SEED, n))
+    routes, weights = list(MIX), list(MIX.values())
+    url = urlsplit(base_url)
+    conn = http.client.HTTPConnection(url.hostname, url.port, timeout=60)
+
+    while True:
+        started = time.perf_counter()
+        if started >= deadline:
+            break
+        route = rng.choices(routes, weights)[0]
+        path, body, content_type = build_request(route, fixture, rng, noise_rng)
+        sent = time.perf_counter()
+        try:
+            conn.request('POST', path, body=body, headers={'Content-Type': content_type})
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            status = 'error'
+            conn.close()
+        if sent >= warmup_until:
+            samples.append((route, status, sent, time.perf_counter() - sent))
+    conn.close()
+
+
+# ==========================================
+# 3. SERVER (stub model, seeded SQLite)
+# ==========================================
+def start_server(work_dir, port):
+    env = dict(os.environ, AMS_ENGINE='stub', AMS_DB_BACKEND='sqlite',
+               AMS_SQLITE_PATH=os.path.abspath(os.path.join(work_dir, 'attendsystem.db')),
+               PYTHONPATH=BACKEND_DIR + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    log = open(os.path.join(work_dir, 'server.log'), 'w')
+    command = [sys.executable, '-c', f"from app import app; app.run(host='127.0.0.1', port={port}, threaded=True)"]
+    server = subprocess.Popen(command, cwd=work_dir, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}, see {log.name}")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/ready')   # Models loaded and warmed up, not just Flask listening
+            if conn.getresponse().status == 200:
+                return server
+        except OSError:
+            pass
+        time.sleep(0.5)
+    server.kill()
+    raise RuntimeError(f"Server not ready after {STARTUP_TIMEOUT}s, see {log.name}")
+
+
+def process_tree(pid):
+    """pid and all its descendants (Linux /proc; empty list elsewhere)"""
+    if not os.path.isdir(f'/proc/{pid}'):
+        return []
+    pids, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        pids.append(current)
+        try:
+            for task in os.listdir(f'/proc/{current}/task'):
+                with open(f'/proc/{current}/task/{task}/children') as f:
+                    stack.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass   # Exited meanwhile
+    return pids
+
+
+def rss_mb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+class MemorySampler(threading.Thread):
+    """Peak resident memory of every server worker process while the load runs"""
+
+    def __init__(self, pid, interval=0.5):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak = {}
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            for pid in process_tree(self.pid):
+                rss = rss_mb(pid)
+                if rss is not None:
+                    self.peak[pid] = max(self.peak.get(pid, 0.0), rss)
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        return {str(pid): round(rss, 1) for pid, rss in sorted(self.peak.items())}
+
+
+# ==========================================
+# 4. REPORT
+# ==========================================
+def summarize(samples, seconds):
+    latencies = np.array([latency for _, _, _, latency in samples]) * 1000
+    statuses = {}
+    for _, status, _, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    def pct(q):
+        return round(float(np.percentile(latencies, q)), 2) if len(latencies) else 0.0
+
+    return {
+        "requests": len(samples),
+        "throughput_rps": round(len(samples) / seconds, 1),
+        "ok": sum(count for status, count in statuses.items() if status.startswith('2')),
+        "errors": sum(count for status, count in statuses.items() if status == 'error' or status.startswith('5')),
+        "status": statuses,
+        "p50_ms": pct(50),
+        "p95_ms": pct(95),
+        "p99_ms": pct(99),
+        "max_ms": round(float(latencies.max()), 2) if len(latencies) else 0.0,
+    }
+
+
+def fetch_json(base_url, path):
+    url = urlsplit(base_url)
+    try:
+        conn = http.client.HTTPConnection(url.hostname, url.port, timeout=10)
+        conn.request('GET', path)
+        return json.loads(conn.getresponse().read())
+    except (OSError, ValueError, http.client.HTTPException):
+        return None
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    work_dir = os.path.abspath(args.work_dir)
+    db_path = os.path.join(work_dir, 'attendsystem.db')
+    if not (args.reuse and os.path.exists(db_path)):
+        prepare(work_dir, args.students, args.courses, args.images_per_person, args.seed)
+    added = seed_live_sessions(db_path)
+    if added:
+        print(f"🕘 Added {added} classes running now")
+    fixture = Fixture(db_path, args.students)
+
+    server = None
+    base_url = args.url
+    if not base_url:
+        print(f"🚀 Starting the API with the stub model on port {args.port}...")
+        started = time.perf_counter()
+        server = start_server(work_dir, args.port)
+        print(f"✅ Ready in {time.perf_counter() - started:.1f}s")
+        base_url = f"http://127.0.0.1:{args.port}"
+    sampler = MemorySampler(server.pid) if server else None
+
+    try:
+        if sampler:
+            sampler.start()
+        print(f"🔥 {args.concurrency} clients for {args.duration}s (+{WARMUP_SECONDS}s warm-up) against {base_url}")
+        start = time.perf_counter()
+        warmup_until = start + WARMUP_SECONDS
+        deadline = warmup_until + args.duration
+        per_client = [[] for _ in range(args.concurrency)]
+        threads = [threading.Thread(target=client, args=(n, base_url, fixture, deadline, warmup_until, per_client[n]))
+                   for n in range(args.concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        measured = time.perf_counter() - warmup_until
+        memory = sampler.stop() if sampler else None
+        inference = fetch_json(base_url, '/admin/inference_stats')
+    finally:
+        if server:
+            server.terminate()
+            server.wait(timeout=30)
+
+    samples = [sample for samples in per_client for sample in samples]
+    routes = {route: summarize([s for s in samples if s[0] == route], measured) for route in MIX}
+    results = {
+        "started_at": datetime.now().isoformat(timespec='seconds'),
+        "revision": git_revision(),
+        "config": {
+            "students": args.students, "courses": args.courses, "images_per_person": args.images_per_person,
+            "concurrency": args.concurrency, "duration_seconds": args.duration, "mix": MIX,
+            "model": "stub" if server else "external",
+        },
+        "total": summarize(samples, measured),
+        "routes": routes,
+        "server_rss_mb": memory,
+        "server_inference": inference.get("inference") if inference else None,
+    }
+
+    print(f"\n{'route':<20} | {'req/s':>7} | {'p50 ms':>7} | {'p95 ms':>7} | {'p99 ms':>7} | {'errors':>6}")
+    print("-" * 70)
+    for name, row in list(routes.items()) + [('TOTAL', results['total'])]:
+        print(f"{name:<20} | {row['throughput_rps']:>7.1f} | {row['p50_ms']:>7.1f} | {row['p95_ms']:>7.1f} | "
+              f"{row['p99_ms']:>7.1f} | {row['errors']:>6}")
+    if memory:
+        print(f"\nPeak RSS per server process (MB): {memory}")
+
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results written to {args.out}")
+
+    # Without successful check-ins the numbers only measure the refusal path
+    scans = routes.get('kiosk_scan')
+    if scans and scans['requests'] and scans['ok'] == 0:
+        raise SystemExit(f"❌ No kiosk_scan succeeded ({scans['status']}): the run did not exercise check-ins")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-tests the API with a synthetic gallery, a seeded DB and a stub model")
+    parser.add_argument('--students', type=int, default=STUDENTS)
+    parser.add_argument('--courses', type=int, default=COURSES)
+    parser.add_argument('--images-per-person', type=int, default=IMAGES_PER_PERSON)
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY)
+    parser.add_argument('--duration', type=int, default=DURATION_SECONDS, help="Measured seconds (after warm-up)")
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--work-dir', default=WORK_DIR)
+    parser.add_argument('--reuse', action='store_true', help="Keep the gallery and database of the last run")
+    parser.add_argument('--url', help="Load an already-running server (started on --work-dir's database) instead")
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--out', default=RESULTS_FILE, help="JSON results file")
+    run(parser.parse_args())
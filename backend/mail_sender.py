@@ -0,0 +1,191 @@
+import time
+import queue
+import smtplib
+import argparse
+import threading
+import socketserver
+
+# --- CONFIGURATION ---
+MESSAGES_PER_CONNECTION = 90   # Reconnect after this many (Gmail drops long sessions around 100)
+IDLE_SECONDS = 30              # Close the connection when nothing was queued for this long
+MAX_ATTEMPTS = 3               # Tries per message (reconnecting in between) before reporting it failed
+RETRY_SECONDS = 5
+# ---------------------
+
+
+class MailSender:
+    """
+    Sends queued emails from ONE background thread over ONE reused SMTP
+    connection, instead of connect + STARTTLS + login + quit per message.
+
+        sender = MailSender('smtp.gmail.com', 587, user, password, on_result=callback)
+        sender.send(message, key=student_id)     # returns at once
+        sender.close()                           # waits until the queue is empty
+
+    on_result(key, error) is called from the sender thread after each message:
+    error is None when it was accepted by the server. A dropped connection is
+    reopened and the message retried; a refused recipient is not retried.
+    """
+
+    def __init__(self, host, port, user=None, password=None, starttls=True, on_result=None,
+                 messages_per_connection=MESSAGES_PER_CONNECTION, idle_seconds=IDLE_SECONDS,
+                 max_attempts=MAX_ATTEMPTS, retry_seconds=RETRY_SECONDS):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.on_result = on_result
+        self.messages_per_connection = messages_per_connection
+        self.idle_seconds = idle_seconds
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+
+        self._queue = queue.Queue()
+        self._smtp = None
+        self._sent_on_connection = 0
+        self.counters = {"queued": 0, "sent": 0, "failed": 0, "retries": 0, "connections": 0}
+        self._thread = threading.Thread(target=self._run, name="mail-sender", daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------
+    # Caller side
+    # ------------------------------------------
+    def send(self, message, key=None):
+        self.counters["queued"] += 1
+        self._queue.put((key, message))
+
+    def close(self):
+        """Sends everything still queued, then closes the connection"""
+        self._queue.put(None)
+        self._thread.join()
+
+    # ------------------------------------------
+    # Sender thread
+    # ------------------------------------------
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.idle_seconds)
+            except queue.Empty:
+                self._disconnect()
+                continue
+            if item is None:
+                break
+            key, message = item
+            error = self._deliver(message)
+            self.counters["failed" if error else "sent"] += 1
+            if self.on_result:
+                self.on_result(key, error)
+        self._disconnect()
+
+    def _deliver(self, message):
+        """Sends one message, reconnecting between attempts. Returns None or the last error text."""
+        error = None
+        for attempt in range(self.max_attempts):
+            if attempt:
+                self.counters["retries"] += 1
+                time.sleep(self.retry_seconds)
+            try:
+                if self._smtp is None or self._sent_on_connection >= self.messages_per_connection:
+                    self._connect()
+                self._smtp.send_message(message)
+                self._sent_on_connection += 1
+                return None
+            except smtplib.SMTPRecipientsRefused as e:
+                return f"Recipient refused: {', '.join(e.recipients)}"
+            except (smtplib.SMTPException, OSError) as e:
+                error = str(e) or type(e).__name__
+                self._disconnect()
+        return error
+
+    def _connect(self):
+        self._disconnect()
+        smtp = smtplib.SMTP(self.host, self.port, timeout=30)
+        if self.starttls:
+            smtp.starttls()
+        if self.user and self.password:
+            smtp.login(self.user, self.password)
+        self._smtp = smtp
+        self._sent_on_connection = 0
+        self.counters["connections"] += 1
+
+    def _disconnect(self):
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self._smtp = None
+
+    def stats(self):
+        return dict(self.counters, pending=self._queue.qsize())
+
+
+# ==========================================
+# STAND-IN SMTP SERVER (local testing only)
+# ==========================================
+class _StandInHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP (no TLS, no auth) to accept and count messages"""
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.reply("220 stand-in ESMTP ready")
+        recipients = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip()
+            verb = command[:4].upper()
+            if verb == 'EHLO':
+                self.reply("250-stand-in")
+                self.reply("250 8BITMIME")
+            elif verb == 'HELO':
+                self.reply("250 stand-in")
+            elif verb == 'MAIL':
+                recipients = []
+                self.reply("250 OK")
+            elif verb == 'RCPT':
+                recipients.append(command.split(':', 1)[-1].strip(' <>'))
+                self.reply("250 OK")
+            elif verb == 'DATA':
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                subject = ""
+                for data_line in iter(self.rfile.readline, b''):
+                    if data_line in (b'.\r\n', b'.\n'):
+                        break
+                    if data_line.lower().startswith(b'subject:'):
+                        subject = data_line.decode(errors='replace')[8:].strip()
+                self.server.received += 1
+                print(f"📨 #{self.server.received} to {', '.join(recipients)}: {subject}")
+                self.reply("250 OK queued")
+            elif verb == 'QUIT':
+                self.reply("221 Bye")
+                return
+            elif verb in ('RSET', 'NOOP'):
+                self.reply("250 OK")
+            else:
+                self.reply("502 Command not implemented")
+
+
+def serve(host='127.0.0.1', port=1025):
+    socketserver.ThreadingTCPServer.allow_reuse_address = True
+    with socketserver.ThreadingTCPServer((host, port), _StandInHandler) as server:
+        server.received = 0
+        print(f"📭 Stand-in SMTP server on {host}:{port} (Ctrl+C to stop)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in SMTP server for testing enrollment emails")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=1025)
+    args = parser.parse_args()
+    serve(args.host, args.port)
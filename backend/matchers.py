@@ -0,0 +1,343 @@
+import os
+import numpy as np
+from gallery import gallery_fingerprint
+
+# --- CONFIGURATION ---
+TOP_K = 5                 # Identities re-ranked against their full image embeddings
+SUB_CENTROIDS = 1         # Centroids per identity (>1 helps people with very different photos)
+KMEANS_ITERS = 10
+IVF_NPROBE = 8            # Inverted lists scanned per query: higher = closer to exact, slower (see bench_ann.py)
+IVF_TRAIN_PER_LIST = 64   # k-means for the IVF quantizer trains on at most nlist * this many rows
+QUANT_RESCORE = 32        # Rows re-scored in float32 after the int8 first pass
+QUANT_BLOCK_ROWS = 256    # Compressed rows widened to float32 at a time (stays in cache, never a full copy)
+# ---------------------
+
+
+def spherical_kmeans(rows, k, iters=KMEANS_ITERS):
+    """
+    Clusters unit-length `rows` into `k` unit-length centres (cosine k-means).
+    Deterministic: starts from evenly spaced rows so rebuilding gives the same index.
+    """
+    k = max(1, min(k, len(rows)))
+    seeds = np.linspace(0, len(rows) - 1, k).astype(int)
+    centres = rows[seeds].copy()
+
+    for _ in range(iters):
+        assign = np.argmax(rows @ centres.T, axis=1)
+        sums = np.zeros_like(centres)
+        np.add.at(sums, assign, rows)
+        filled = np.bincount(assign, minlength=k) > 0   # Empty clusters keep their old centre
+        centres[filled] = sums[filled]
+        centres /= np.maximum(np.linalg.norm(centres, axis=1, keepdims=True), 1e-12)
+
+    return centres
+
+
+class Matcher:
+    """
+    Interface every FaceEngine matching backend implements.
+
+    search(probe) takes a unit-length embedding and returns (gallery_row, score),
+    or (-1, 0.0) for an empty gallery. Backends with an expensive build set
+    `persistent = True` and implement save()/load() so the index can live next to
+    BRAIN_FILE instead of being rebuilt on every startup.
+    """
+
+    name = None
+    persistent = False
+
+    def __init__(self, gallery):
+        self.gallery = gallery
+
+    def search(self, probe):
+        raise NotImplementedError
+
+    def save(self, path):
+        raise NotImplementedError(f"'{self.name}' matcher has no on-disk index")
+
+    @classmethod
+    def load(cls, path, gallery):
+        raise NotImplementedError(f"'{cls.name}' matcher has no on-disk index")
+
+
+class ExactMatcher(Matcher):
+    """Flat argmax over every gallery row. The exact reference for all other matchers."""
+
+    name = 'exact'
+
+    def search(self, probe):
+        return self.gallery.match(probe)
+
+
+class CentroidMatcher(Matcher):
+    """
+    Two-stage matching:
+      1. COARSE - score the probe against a few normalized centroids per identity.
+      2. EXACT  - re-rank only the top-K identities against their image embeddings.
+
+    Returns the same (gallery_row, score) as ExactMatcher, so callers look up
+    names/ids on the gallery exactly as before.
+    """
+
+    name = 'centroid'
+
+    def __init__(self, gallery, top_k=TOP_K, sub_centroids=SUB_CENTROIDS):
+        super().__init__(gallery)
+        self.top_k = top_k
+        self.sub_centroids = sub_centroids
+        self._build()
+
+    def _build(self):
+        embeddings = self.gallery.embeddings
+
+        # Gallery row numbers grouped per identity (training folder label); the rows stay in the gallery
+        self._row_index, self._starts, self._ends = self.gallery.identity_groups()
+
+        centroids = []
+        centroid_starts = []
+        for start, end in zip(self._starts, self._ends):
+            centroid_starts.append(len(centroids))
+            centroids.extend(spherical_kmeans(embeddings[self._row_index[start:end]], self.sub_centroids))
+
+        self._centroids = np.array(centroids, dtype=np.float32).reshape(-1, embeddings.shape[1])
+        self._centroid_starts = np.array(centroid_starts, dtype=int)
+
+    @property
+    def num_centroids(self):
+        return len(self._centroids)
+
+    def search(self, probe):
+        if len(self._starts) == 0:
+            return -1, 0.0
+
+        probe = np.asarray(probe, dtype=np.float32)
+
+        # 1. COARSE: best centroid score per identity
+        centroid_scores = self._centroids @ probe
+        identity_scores = np.maximum.reduceat(centroid_scores, self._centroid_starts)
+
+        k = min(self.top_k, len(identity_scores))
+        top = np.argpartition(-identity_scores, k - 1)[:k]
+
+        # 2. EXACT: re-rank every image of the shortlisted identities, gathered from the gallery
+        candidates = self._row_index[np.concatenate([np.arange(self._starts[i], self._ends[i]) for i in top])]
+        scores = self.gallery.embeddings[candidates] @ probe
+        best = int(np.argmax(scores))
+        return int(candidates[best]), float(scores[best])
+
+
+class IVFMatcher(Matcher):
+    """
+    Approximate search with an inverted-file (IVF-flat) index.
+
+    A k-means quantizer splits the identities into `nlist` cells. Every row of a
+    person is listed in the cell nearest to that person's mean embedding, so all
+    their photos sit in one list. Lists hold row numbers only: the rows are
+    read from the gallery (its memory-mapped store) when a cell is scanned.
+    A query only scans the rows of the `nprobe` cells closest to the probe, so
+    per-scan work is roughly nlist + N * nprobe / nlist instead of N.
+
+    nprobe trades speed for recall (how often the exact best row is found).
+    Assigning rows one by one scattered a person's photos over several cells
+    and found the exact row for only ~80% of queries at nprobe=8 on 100k rows;
+    per identity it is 99.4% at nprobe=8 (98.8% at 4, 99.6% at 16), still ~20x
+    faster than exact. A miss returns another photo with a slightly lower
+    score, or (rarely) another person.
+    """
+
+    name = 'ivf'
+    persistent = True
+    index_version = 2          # Saved indexes of another version are rebuilt (1 = per-row cells)
+
+    def __init__(self, gallery, nlist=None, nprobe=IVF_NPROBE, _state=None):
+        super().__init__(gallery)
+        self.nprobe = nprobe
+        if _state is not None:
+            self._centroids, self._row_index, self._offsets = _state
+        else:
+            self._build(nlist or max(1, int(np.sqrt(len(gallery)))))
+
+    def _build(self, nlist):
+        embeddings = self.gallery.embeddings
+        if len(embeddings) == 0:
+            self._centroids = np.zeros((0, self.gallery.dim), dtype=np.float32)
+            self._row_index = np.zeros(0, dtype=np.int64)
+            self._offsets = np.zeros(1, dtype=np.int64)
+            return
+
+        # One unit-length mean per identity
+        order, starts, ends = self.gallery.identity_groups()
+        means = np.add.reduceat(embeddings[order], starts, axis=0)
+        means /= np.maximum(np.linalg.norm(means, axis=1, keepdims=True), 1e-12)
+
+        # Train the quantizer on a fixed random sample of identities, then give each identity's rows its cell
+        rng = np.random.default_rng(0)
+        sample_size = min(len(means), nlist * IVF_TRAIN_PER_LIST)
+        sample = means[np.sort(rng.choice(len(means), sample_size, replace=False))]
+        self._centroids = spherical_kmeans(sample, nlist).astype(np.float32)
+
+        assign = np.empty(len(embeddings), dtype=np.int64)
+        assign[order] = np.repeat(np.argmax(means @ self._centroids.T, axis=1), ends - starts)
+        self._row_index = np.argsort(assign, kind='stable')
+        counts = np.bincount(assign, minlength=len(self._centroids))
+        self._offsets = np.r_[0, np.cumsum(counts)]
+
+    @property
+    def nlist(self):
+        return len(self._centroids)
+
+    def search(self, probe):
+        if len(self._row_index) == 0:
+            return -1, 0.0
+
+        probe = np.asarray(probe, dtype=np.float32)
+
+        # 1. Pick the nprobe closest cells
+        nprobe = min(self.nprobe, self.nlist)
+        cells = np.argpartition(-(self._centroids @ probe), nprobe - 1)[:nprobe]
+
+        # 2. Exact scan of the rows listed in those cells, gathered from the gallery
+        candidates = self._row_index[np.concatenate([np.arange(self._offsets[c], self._offsets[c + 1]) for c in cells])]
+        if len(candidates) == 0:
+            return self.gallery.match(probe)
+        scores = self.gallery.embeddings[candidates] @ probe
+        best = int(np.argmax(scores))
+        return int(candidates[best]), float(scores[best])
+
+    def save(self, path):
+        # Write-then-rename so another worker never reads a half-written index
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                fingerprint=gallery_fingerprint(self.gallery),
+                version=self.index_version,
+                centroids=self._centroids,
+                row_index=self._row_index,
+                offsets=self._offsets,
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, gallery, nprobe=IVF_NPROBE, **_):
+        """Returns the saved index, or None if it was built for a different gallery"""
+        with np.load(path) as data:
+            if 'version' not in data or int(data['version']) != cls.index_version:
+                return None
+            if str(data['fingerprint']) != gallery_fingerprint(gallery):
+                return None
+            state = (data['centroids'], data['row_index'], data['offsets'])
+        return cls(gallery, nprobe=nprobe, _state=state)
+
+
+class QuantizedMatcher(Matcher):
+    """
+    Two-pass search over a compressed copy of the gallery:
+      1. APPROXIMATE - score every row of the compressed matrix, QUANT_BLOCK_ROWS
+                       at a time (each block is widened to float32 while in cache).
+      2. EXACT       - re-score the `rescore` best rows, read from the gallery.
+
+    The matcher holds only the compressed matrix. The float32 rows are read
+    once to encode them, then the memory-mapped gallery store releases them
+    (release_pages); a scan faults back in just the rows it re-scores. A
+    gallery loaded into RAM (legacy pickle) keeps its float32 matrix anyway.
+    """
+
+    def __init__(self, gallery, rescore=QUANT_RESCORE, block_rows=QUANT_BLOCK_ROWS):
+        super().__init__(gallery)
+        self.rescore = rescore
+        self.block_rows = block_rows
+        embeddings = gallery.embeddings
+        parts = [self._encode(np.asarray(embeddings[start:start + block_rows], dtype=np.float32))
+                 for start in range(0, len(embeddings), block_rows)]
+        if parts:
+            self._codes = np.concatenate([codes for codes, _ in parts])
+            self._scales = None if parts[0][1] is None else np.concatenate([scales for _, scales in parts])
+        else:
+            self._codes, self._scales = self._encode(np.zeros((0, gallery.dim), dtype=np.float32))
+        gallery.release_pages()
+
+    def _encode(self, block):
+        """(codes, per-row scales or None) for a float32 block"""
+        raise NotImplementedError
+
+    @property
+    def nbytes(self):
+        """Size of what the first pass scans"""
+        return self._codes.nbytes + (self._scales.nbytes if self._scales is not None else 0)
+
+    def approximate_scores(self, probe):
+        scores = np.empty(len(self._codes), dtype=np.float32)
+        # One scratch block per call (scans run concurrently on request threads)
+        buffer = np.empty((min(self.block_rows, len(self._codes)), self._codes.shape[1]), dtype=np.float32)
+        for start in range(0, len(self._codes), self.block_rows):
+            block = self._codes[start:start + self.block_rows]
+            widened = buffer[:len(block)]
+            np.copyto(widened, block, casting='unsafe')
+            np.dot(widened, probe, out=scores[start:start + len(block)])
+        if self._scales is not None:
+            scores *= self._scales
+        return scores
+
+    def search(self, probe):
+        if len(self._codes) == 0:
+            return -1, 0.0
+
+        probe = np.asarray(probe, dtype=np.float32)
+        scores = self.approximate_scores(probe)
+        k = min(self.rescore, len(scores))
+        candidates = np.sort(np.argpartition(-scores, k - 1)[:k])   # Row order: ties resolve like ExactMatcher
+
+        exact = self.gallery.embeddings[candidates] @ probe
+        best = int(np.argmax(exact))
+        return int(candidates[best]), float(exact[best])
+
+
+class Int8Matcher(QuantizedMatcher):
+    """
+    Scalar-quantized first pass: each row is stored as int8 codes times one
+    float32 scale (max |value| / 127), 4x less to keep and scan than float32.
+    (A float16 first pass was dropped: NumPy widens float16 in software, so it
+    scanned ~5x slower than 'exact'.)
+    """
+
+    name = 'int8'
+
+    def _encode(self, block):
+        scales = np.abs(block).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.rint(block / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+
+MATCHERS = {
+    ExactMatcher.name: ExactMatcher,
+    CentroidMatcher.name: CentroidMatcher,
+    IVFMatcher.name: IVFMatcher,
+    Int8Matcher.name: Int8Matcher,
+}
+
+
+def build_matcher(mode, gallery, index_path=None, **options):
+    """
+    Creates the matcher for `mode`. Persistent backends reuse the index at
+    `index_path` when it matches the gallery, otherwise build it and save it there.
+    """
+    if mode not in MATCHERS:
+        raise ValueError(f"Unknown match mode '{mode}'. Choose from: {', '.join(MATCHERS)}")
+
+    cls = MATCHERS[mode]
+    if not (cls.persistent and index_path):
+        return cls(gallery, **options)
+
+    if os.path.exists(index_path):
+        try:
+            matcher = cls.load(index_path, gallery, **options)
+            if matcher is not None:
+                return matcher
+        except Exception as e:
+            print(f"⚠️ Could not read index {index_path}: {e}. Rebuilding...")
+
+    matcher = cls(gallery, **options)
+    matcher.save(index_path)
+    return matcher
@@ -0,0 +1,141 @@
+import random
+import threading
+from bisect import bisect_left
+
+# --- CONFIGURATION ---
+ENABLED = True             # False = every observe()/inc() returns immediately
+SAMPLE_RATE = 1.0          # Share of requests whose stage timings are recorded (0.1 = one in ten)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)   # seconds
+# ---------------------
+
+
+def sampled(rate=SAMPLE_RATE):
+    """Decide once per request whether to time it (keeps the cost near zero at a low rate)"""
+    return ENABLED and rate > 0 and (rate >= 1.0 or random.random() < rate)
+
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{str(value).replace(chr(34), chr(39))}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._series = {}          # label values tuple -> value(s)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            series = {key: (list(value) if isinstance(value, list) else value) for key, value in self._series.items()}
+        for key, value in sorted(series.items()):
+            lines.extend(self._render_series(key, value))
+        return lines
+
+    def _render_series(self, key, value):
+        return [f"{self.name}{_label_text(self.labels, key)} {value}"]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *label_values, amount=1):
+        if not ENABLED:
+            return
+        with self._lock:
+            self._series[label_values] = self._series.get(label_values, 0) + amount
+
+
+class Gauge(Metric):
+    """Set explicitly, or computed at scrape time by `function` (e.g. gallery size)"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, labels=(), function=None):
+        super().__init__(name, help_text, labels)
+        self.function = function
+
+    def set(self, value, *label_values):
+        with self._lock:
+            self._series[label_values] = value
+
+    def render(self):
+        if self.function is not None:
+            try:
+                self.set(self.function())
+            except Exception:
+                pass   # Not available yet (e.g. still loading): keep the last value
+        return super().render()
+
+
+class Histogram(Metric):
+    """Cumulative-bucket histogram; one observe() is a bisect and a few adds under a lock"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *label_values):
+        if not ENABLED:
+            return
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1     # Last bucket slot is +Inf
+            series[-1] += value
+
+    def _render_series(self, key, series):
+        counts, total = series[:-1], series[-1]
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            le = "+Inf" if bound == float('inf') else repr(bound)
+            lines.append(f"{self.name}_bucket{_label_text(self.labels + ('le',), key + (le,))} {cumulative}")
+        lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {total}")
+        lines.append(f"{self.name}_count{_label_text(self.labels, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """
+    Minimal Prometheus-style metrics, rendered in the text exposition format
+    that GET /metrics serves. No prometheus_client dependency: observing a
+    histogram is a bisect and two adds under that metric's lock.
+    """
+
+    def __init__(self):
+        self._metrics = []
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._add(Counter(name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=(), function=None):
+        return self._add(Gauge(name, help_text, labels, function))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help_text, labels, buckets))
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
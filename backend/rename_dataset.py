@@ -2,7 +2,7 @@ import os
 
 # --- CONFIGURATION ---
 TARGET_DIR = "dataset/train"   # Where your folders are
-MAX_IMAGES = 20                # Keep only this many images
+MAX_IMAGES = 20                # Keep only this many images (disk space only: train.py picks the best ones itself)
 # ---------------------
 
 def reduce_dataset():
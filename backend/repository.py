@@ -0,0 +1,397 @@
+import os
+import sqlite3
+from collections import namedtuple
+from datetime import datetime, date, time, timedelta
+
+# --- CONFIGURATION ---
+DB_BACKEND = os.environ.get("AMS_DB_BACKEND", "sqlserver")   # 'sqlserver' | 'sqlite' | 'postgres'
+SQLSERVER_NAME = r'ABDULRHMANSEYAM'
+SQLSERVER_DATABASE = 'Attendsystem'
+SQLITE_PATH = os.environ.get("AMS_SQLITE_PATH", "attendsystem.db")
+POSTGRES_DSN = os.environ.get("AMS_POSTGRES_DSN", "dbname=attendsystem")
+SCHEMA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'database_scripts')
+# ---------------------
+
+# SQLite has no DATETIME type: store ISO text (sorts correctly) and parse it back by declared column type
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' ', timespec='seconds'))
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_converter("DATETIME", lambda raw: datetime.fromisoformat(raw.decode()))
+sqlite3.register_converter("DATE", lambda raw: date.fromisoformat(raw.decode()[:10]))
+
+
+def day_bounds(day):
+    """[start, end) datetimes of a calendar day, so date filters stay index-friendly on every backend"""
+    start = datetime.combine(day, time.min)
+    return start, start + timedelta(days=1)
+
+
+class Repository:
+    """
+    Every SQL statement the API and the enrollment tool run, in one place.
+
+    Queries are written in the SQL that SQL Server, SQLite and PostgreSQL all
+    accept: dates are passed in as parameters instead of GETDATE(), names are
+    joined and times formatted in Python instead of `+` / FORMAT / ISNULL.
+    Subclasses say how to connect, how to create the schema, and give the
+    one statement with no common syntax: the attendance upsert.
+
+    Methods take an open connection (from the pool) so a route decides how many
+    statements share one transaction. Rows come back as named tuples (`row.id`)
+    whatever the driver.
+    """
+
+    name = None
+    placeholder = '?'
+    schema_file = None
+    # INSERT of (session_id, student_id, marked_at, last_updated) as 'Present' / 'FaceID' that does
+    # nothing when UNIQUE (session_id, student_id) already has the row
+    attendance_upsert = None
+
+    def connect(self):
+        raise NotImplementedError
+
+    def create_schema(self, conn):
+        raise NotImplementedError(f"Create the {self.name} schema with database_scripts/init_db.sql "
+                                  f"(existing databases: database_scripts/upgrade_db.sql)")
+
+    # ------------------------------------------
+    # Helpers
+    # ------------------------------------------
+    _row_types = {}
+
+    def _sql(self, query):
+        return query if self.placeholder == '?' else query.replace('?', self.placeholder)
+
+    def _execute(self, conn, query, params=()):
+        cursor = conn.cursor()
+        cursor.execute(self._sql(query), params)
+        return cursor
+
+    def _rows(self, cursor, rows):
+        fields = tuple(column[0] for column in cursor.description)
+        row_type = self._row_types.get(fields)
+        if row_type is None:
+            row_type = self._row_types.setdefault(fields, namedtuple('Row', fields))
+        return [row_type(*row) for row in rows]
+
+    def _fetchone(self, conn, query, params=()):
+        cursor = self._execute(conn, query, params)
+        row = cursor.fetchone()
+        return self._rows(cursor, [row])[0] if row is not None else None
+
+    def _fetchall(self, conn, query, params=()):
+        cursor = self._execute(conn, query, params)
+        return self._rows(cursor, cursor.fetchall())
+
+    def _bulk_cursor(self, conn):
+        """Cursor for executemany() (SQL Server turns on pyodbc's fast_executemany)"""
+        return conn.cursor()
+
+    def bulk_insert(self, conn, table, columns, rows):
+        """executemany() INSERT, used by the seed generator"""
+        marks = ", ".join("?" * len(columns))
+        cursor = self._bulk_cursor(conn)
+        cursor.executemany(self._sql(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({marks})"), rows)
+
+    def ping(self, conn):
+        """Round trip that fails only if the database is unreachable"""
+        self._execute(conn, "SELECT 1").fetchone()
+
+    # ------------------------------------------
+    # Login
+    # ------------------------------------------
+    def find_student(self, conn, student_id, password):
+        return self._fetchone(conn, "SELECT id, first_name, last_name FROM student WHERE id = ? AND password = ?",
+                              (student_id, password))
+
+    def find_instructor(self, conn, username, password):
+        return self._fetchone(conn, "SELECT id, first_name, last_name, role FROM instructor WHERE username = ? AND password = ?",
+                              (username, password))
+
+    def find_admin(self, conn, username, password):
+        return self._fetchone(conn, "SELECT id, full_name, role FROM admin WHERE username = ? AND password = ?",
+                              (username, password))
+
+    # ------------------------------------------
+    # Kiosk
+    # ------------------------------------------
+    def day_sessions(self, conn, day):
+        """Every scheduled class on `day` (the kiosk's ScheduleCache loads these once)"""
+        start, end = day_bounds(day)
+        query = """
+        SELECT
+            s.session_id,
+            s.course_id,
+            c.name,
+            s.classroom_id,
+            s.session_start,
+            s.session_end,
+            s.session_type
+        FROM class_session s
+        JOIN course c ON s.course_id = c.id
+        WHERE
+            s.session_status = 'Scheduled'
+            AND s.session_start >= ? AND s.session_start < ?
+        """
+        return self._fetchall(conn, query, (start, end))
+
+    def day_enrollment(self, conn, day):
+        """(student_id, course_id) for every course that meets on `day`"""
+        start, end = day_bounds(day)
+        query = """
+        SELECT DISTINCT e.student_id, e.course_id
+        FROM enrollment e
+        JOIN class_session s ON s.course_id = e.course_id
+        WHERE
+            s.session_status = 'Scheduled'
+            AND s.session_start >= ? AND s.session_start < ?
+        """
+        return self._fetchall(conn, query, (start, end))
+
+    def day_attendance(self, conn, day):
+        """(session_id, student_id) already marked for the sessions of `day`"""
+        start, end = day_bounds(day)
+        query = """
+        SELECT ar.session_id, ar.student_id
+        FROM attendance_record ar
+        JOIN class_session s ON s.session_id = ar.session_id
+        WHERE s.session_start >= ? AND s.session_start < ?
+        """
+        return self._fetchall(conn, query, (start, end))
+
+    def upsert_attendance(self, conn, records):
+        """
+        Inserts 'Present' records [(session_id, student_id, marked_at), ...] in one
+        executemany(), skipping any (session_id, student_id) already in the table
+        (the unique constraint decides, so two workers writing the same check-in
+        can't both insert it). A batch can safely be written twice. Caller commits.
+        """
+        rows = [(session_id, int(student_id), marked_at, marked_at) for session_id, student_id, marked_at in records]
+        cursor = self._bulk_cursor(conn)
+        cursor.executemany(self._sql(self.attendance_upsert), rows)
+
+    # ------------------------------------------
+    # Student dashboard
+    # ------------------------------------------
+    def student_courses(self, conn, student_id):
+        query = """
+        SELECT c.id, c.name, i.first_name AS instructor_first, i.last_name AS instructor_last
+        FROM enrollment e
+        JOIN course c ON e.course_id = c.id
+        JOIN instructor i ON c.instructor_id = i.id
+        WHERE e.student_id = ?
+        """
+        return self._fetchall(conn, query, (student_id,))
+
+    def course_schedule(self, conn, student_id, course_id):
+        query = """
+        SELECT
+            cs.session_id, cs.session_type, cs.classroom_id,
+            cs.session_start, cs.session_end,
+            i.first_name AS instructor_first, i.last_name AS instructor_last,
+            ar.marked_at
+        FROM class_session cs
+        JOIN instructor i ON cs.instructor_id = i.id
+        LEFT JOIN attendance_record ar
+            ON ar.session_id = cs.session_id AND ar.student_id = ?
+        WHERE cs.course_id = ?
+        ORDER BY cs.session_start ASC
+        """
+        return self._fetchall(conn, query, (student_id, course_id))
+
+    # ------------------------------------------
+    # Instructor dashboard
+    # ------------------------------------------
+    def instructor_courses(self, conn, instructor_id):
+        return self._fetchall(conn, "SELECT id, name, credit_hours FROM course WHERE instructor_id = ?", (instructor_id,))
+
+    def session_attendance(self, conn, course_id, day):
+        """One row per enrolled student per session of `course_id` on `day`; marked_at is NULL if absent"""
+        start, end = day_bounds(day)
+        query = """
+        SELECT
+            st.first_name, st.last_name,
+            st.id AS student_id,
+            ar.marked_at,
+            cs.session_type
+        FROM enrollment e
+        JOIN student st ON e.student_id = st.id
+        JOIN class_session cs ON cs.course_id = e.course_id
+        LEFT JOIN attendance_record ar ON ar.student_id = st.id AND ar.session_id = cs.session_id
+        WHERE e.course_id = ? AND cs.session_start >= ? AND cs.session_start < ?
+        ORDER BY st.first_name
+        """
+        return self._fetchall(conn, query, (course_id, start, end))
+
+    # ------------------------------------------
+    # Enrollment
+    # ------------------------------------------
+    def student_exists(self, conn, student_id):
+        return self._fetchone(conn, "SELECT id FROM student WHERE id = ?", (student_id,)) is not None
+
+    def insert_student(self, conn, student_id, first_name, last_name, email, password, face_embedding):
+        """face_embedding is gallery.embedding_to_blob() bytes. Caller commits."""
+        self._execute(conn, """
+            INSERT INTO student (id, first_name, last_name, email, password, face_embedding, face_updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """, (student_id, first_name, last_name, email, password, face_embedding))
+
+    def insert_students(self, conn, rows):
+        """
+        insert_student() for many students in one executemany():
+        rows are (id, first_name, last_name, email, password, face_embedding). Caller commits.
+        """
+        cursor = self._bulk_cursor(conn)
+        cursor.executemany(self._sql("""
+            INSERT INTO student (id, first_name, last_name, email, password, face_embedding, face_updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """), rows)
+
+    def set_face_embedding(self, conn, student_id, face_embedding):
+        """Re-enrollment (None removes the face). Caller commits."""
+        if face_embedding is None:
+            # A NULL parameter is sent as varchar by pyodbc, which SQL Server won't put in VARBINARY
+            self._execute(conn, "UPDATE student SET face_embedding = NULL, face_updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                          (student_id,))
+            return
+        self._execute(conn, "UPDATE student SET face_embedding = ?, face_updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                      (face_embedding, student_id))
+
+    def existing_students(self, conn, student_ids, chunk=500):
+        """The ids (as str) of `student_ids` that are already in the student table"""
+        ids = [int(sid) for sid in student_ids]
+        found = set()
+        for start in range(0, len(ids), chunk):
+            part = ids[start:start + chunk]
+            rows = self._fetchall(conn, f"SELECT id FROM student WHERE id IN ({', '.join('?' * len(part))})", part)
+            found.update(str(row.id) for row in rows)
+        return found
+
+    # ------------------------------------------
+    # Enrolled faces (EnrolledFaces syncs these into the recognition gallery)
+    # ------------------------------------------
+    def face_embeddings_since(self, conn, since=None):
+        """
+        Students whose face was written at or after `since` (every enrolled face
+        if None), oldest first. face_updated_at is stamped with the database's
+        own CURRENT_TIMESTAMP, so `since` must be a value read back from it.
+        """
+        query = """
+            SELECT id, first_name, last_name, face_embedding, face_updated_at
+            FROM student
+            WHERE face_updated_at IS NOT NULL
+        """
+        params = ()
+        if since is not None:
+            query += " AND face_updated_at >= ?"
+            params = (since,)
+        return self._fetchall(conn, query + " ORDER BY face_updated_at", params)
+
+    def legacy_face_encodings(self, conn):
+        """Students enrolled before face_embedding existed (JSON text in facial_encoding)"""
+        return self._fetchall(conn, """
+            SELECT id, facial_encoding FROM student
+            WHERE facial_encoding IS NOT NULL AND face_embedding IS NULL
+        """)
+
+
+class SqlServerRepository(Repository):
+    """The production database (Windows auth through the ODBC driver)"""
+
+    name = 'sqlserver'
+    # HOLDLOCK: without it two sessions can both see "not matched" and the second hits the unique key
+    attendance_upsert = """
+        MERGE attendance_record WITH (HOLDLOCK) AS ar
+        USING (SELECT ? AS session_id, ? AS student_id, ? AS marked_at, ? AS last_updated) AS src
+        ON ar.session_id = src.session_id AND ar.student_id = src.student_id
+        WHEN NOT MATCHED THEN
+            INSERT (session_id, student_id, status, marked_at, last_updated, method)
+            VALUES (src.session_id, src.student_id, 'Present', src.marked_at, src.last_updated, 'FaceID');
+    """
+
+    def __init__(self, server=SQLSERVER_NAME, database=SQLSERVER_DATABASE, driver='SQL Server'):
+        self.conn_str = (
+            f"Driver={{{driver}}};"
+            f"Server={server};"
+            f"Database={database};"
+            f"Trusted_Connection=yes;"
+        )
+
+    def connect(self):
+        import pyodbc
+        return pyodbc.connect(self.conn_str)
+
+    def legacy_face_encodings(self, conn):
+        # init_db.sql never had facial_encoding: only databases the old enroll.py wrote JSON into do
+        if self._fetchone(conn, "SELECT COL_LENGTH('dbo.student', 'facial_encoding') AS length").length is None:
+            return []
+        return super().legacy_face_encodings(conn)
+
+    def _bulk_cursor(self, conn):
+        cursor = conn.cursor()
+        cursor.fast_executemany = True   # Parameters sent as one array per batch, not one round trip per row
+        return cursor
+
+
+class SqliteRepository(Repository):
+    """Single-file database for local runs, load tests and seeded benchmarks"""
+
+    name = 'sqlite'
+    schema_file = 'init_db_sqlite.sql'
+    attendance_upsert = """
+        INSERT OR IGNORE INTO attendance_record (session_id, student_id, status, marked_at, last_updated, method)
+        VALUES (?, ?, 'Present', ?, ?, 'FaceID')
+    """
+
+    def __init__(self, path=SQLITE_PATH):
+        self.path = path
+
+    def connect(self):
+        # Pooled connections move between request threads
+        conn = sqlite3.connect(self.path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("PRAGMA journal_mode = WAL")
+        return conn
+
+    def create_schema(self, conn):
+        with open(os.path.join(SCHEMA_DIR, self.schema_file), encoding='utf-8') as f:
+            conn.executescript(f.read())
+
+
+class PostgresRepository(Repository):
+    """PostgreSQL through psycopg2 (pip install psycopg2-binary)"""
+
+    name = 'postgres'
+    placeholder = '%s'
+    schema_file = 'init_db_postgres.sql'
+    attendance_upsert = """
+        INSERT INTO attendance_record (session_id, student_id, status, marked_at, last_updated, method)
+        VALUES (?, ?, 'Present', ?, ?, 'FaceID')
+        ON CONFLICT (session_id, student_id) DO NOTHING
+    """
+
+    def __init__(self, dsn=POSTGRES_DSN):
+        self.dsn = dsn
+
+    def connect(self):
+        import psycopg2
+        return psycopg2.connect(self.dsn)
+
+    def create_schema(self, conn):
+        with open(os.path.join(SCHEMA_DIR, self.schema_file), encoding='utf-8') as f:
+            conn.cursor().execute(f.read())
+        conn.commit()
+
+
+REPOSITORIES = {
+    SqlServerRepository.name: SqlServerRepository,
+    SqliteRepository.name: SqliteRepository,
+    PostgresRepository.name: PostgresRepository,
+}
+
+
+def build_repository(backend=DB_BACKEND, **options):
+    """Creates the repository for `backend`; options go to its constructor (path, dsn, server...)"""
+    if backend not in REPOSITORIES:
+        raise ValueError(f"Unknown database backend '{backend}'. Choose from: {', '.join(REPOSITORIES)}")
+    return REPOSITORIES[backend](**options)
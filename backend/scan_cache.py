@@ -0,0 +1,135 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# --- CONFIGURATION ---
+TTL_SECONDS = 120          # A cached scan result is reused for at most this long
+MAX_UPLOADS = 2048         # Recent upload digests remembered (all classrooms together)
+PROBES_PER_ROOM = 32       # Recent identified embeddings remembered per classroom
+PROBE_SIMILARITY = 0.92    # A new probe this close (cosine) to a recent one reuses its identity
+# ---------------------
+
+
+def content_digest(data):
+    return hashlib.blake2b(bytes(data), digest_size=16).digest()
+
+
+class ScanCache:
+    """
+    Short-lived memory of recent kiosk scans, so a student rescanning
+    ("already marked present") doesn't pay for the whole pipeline again.
+
+      1. UPLOADS - identical image bytes (keyed by content hash) return the
+                   previous result with no decode, detection or embedding at all.
+      2. PROBES  - per classroom, the last few identified embeddings. A new probe
+                   within PROBE_SIMILARITY of one of them takes its identity and
+                   skips the gallery search (one tiny matrix product instead).
+
+    Both are LRU with a TTL. clear() is called whenever a new gallery is loaded,
+    since cached identities came from the old one.
+    """
+
+    def __init__(self, ttl_seconds=TTL_SECONDS, max_uploads=MAX_UPLOADS,
+                 probes_per_room=PROBES_PER_ROOM, probe_similarity=PROBE_SIMILARITY):
+        self.ttl_seconds = ttl_seconds
+        self.max_uploads = max_uploads
+        self.probes_per_room = probes_per_room
+        self.probe_similarity = probe_similarity
+
+        self._lock = threading.Lock()
+        self._uploads = OrderedDict()      # digest -> (stored_at, result)
+        self._probes = {}                  # classroom_id -> OrderedDict(key -> (stored_at, embedding, result))
+        self._next_key = 0
+        self.counters = {"lookups": 0, "upload_hits": 0, "probe_hits": 0, "probe_misses": 0, "evicted": 0, "expired": 0}
+
+    # ------------------------------------------
+    # 1. Identical uploads
+    # ------------------------------------------
+    def lookup_upload(self, digest):
+        """Every scan starts here, so this also counts the lookups behind hit_rate"""
+        with self._lock:
+            self.counters["lookups"] += 1
+            entry = self._uploads.get(digest)
+            if entry is not None and self._fresh(entry[0]):
+                self._uploads.move_to_end(digest)
+                self.counters["upload_hits"] += 1
+                return entry[1]
+            if entry is not None:
+                del self._uploads[digest]
+                self.counters["expired"] += 1
+            return None
+
+    def put_upload(self, digest, result):
+        with self._lock:
+            self._uploads[digest] = (time.monotonic(), result)
+            self._uploads.move_to_end(digest)
+            while len(self._uploads) > self.max_uploads:
+                self._uploads.popitem(last=False)
+                self.counters["evicted"] += 1
+
+    # ------------------------------------------
+    # 2. Nearby probes, per classroom
+    # ------------------------------------------
+    def lookup_probe(self, classroom_id, embedding):
+        """The result of the most similar recent probe in this room, or None"""
+        with self._lock:
+            recent = self._probes.get(classroom_id)
+            if recent:
+                self._expire(recent)
+            if not recent:
+                self.counters["probe_misses"] += 1
+                return None
+
+            keys = list(recent)
+            matrix = np.stack([recent[key][1] for key in keys])
+            similarities = matrix @ np.asarray(embedding, dtype=np.float32)
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.probe_similarity:
+                self.counters["probe_misses"] += 1
+                return None
+
+            recent.move_to_end(keys[best])
+            self.counters["probe_hits"] += 1
+            return recent[keys[best]][2]
+
+    def put_probe(self, classroom_id, embedding, result):
+        with self._lock:
+            recent = self._probes.setdefault(classroom_id, OrderedDict())
+            recent[self._next_key] = (time.monotonic(), np.asarray(embedding, dtype=np.float32), result)
+            self._next_key += 1
+            while len(recent) > self.probes_per_room:
+                recent.popitem(last=False)
+                self.counters["evicted"] += 1
+
+    # ------------------------------------------
+    # Maintenance
+    # ------------------------------------------
+    def _fresh(self, stored_at):
+        return time.monotonic() - stored_at <= self.ttl_seconds
+
+    def _expire(self, recent):
+        """Drops expired probes from one room (caller holds the lock; rooms hold few probes)"""
+        for key in [key for key, (stored_at, _, _) in recent.items() if not self._fresh(stored_at)]:
+            del recent[key]
+            self.counters["expired"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._uploads.clear()
+            self._probes.clear()
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+            probes = sum(len(recent) for recent in self._probes.values())
+            uploads = len(self._uploads)
+        hits = counters["upload_hits"] + counters["probe_hits"]
+        return dict(
+            counters,
+            uploads=uploads,
+            probes=probes,
+            hit_rate=round(hits / counters["lookups"], 3) if counters["lookups"] else 0.0,
+        )
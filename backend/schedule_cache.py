@@ -0,0 +1,149 @@
+import time
+import threading
+from collections import namedtuple
+from datetime import date
+
+# --- CONFIGURATION ---
+TTL_SECONDS = 300          # Reload today's timetable at least this often (admin edits show up within it)
+# ---------------------
+
+# Same fields (and order) the kiosk used to get from the per-scan join
+Session = namedtuple('Session', ['session_id', 'name', 'classroom_id', 'session_start', 'session_end', 'session_type'])
+
+# One day's timetable, swapped as ONE object on reload (like app.Brain)
+DaySchedule = namedtuple('DaySchedule', ['day', 'loaded_at', 'sessions', 'by_student', 'by_classroom', 'marked'])
+
+
+class ScheduleCache:
+    """
+    Today's class sessions held in memory, indexed by student and by classroom.
+
+    Kiosk scans resolve "which class is this student in right now?" without a
+    query. The whole day is loaded in three queries (sessions, who is enrolled
+    in them, who is already marked) the first time it is needed, again when the
+    date changes or TTL_SECONDS pass, and on invalidate().
+
+    One caller loads, outside the lock, and swaps the new day in as one
+    reference. Until then the others keep using an expired schedule of the same
+    day; they only wait when there is none (first load, new day, invalidate()).
+
+    `marked` holds the (session_id, student_id) pairs already present, so a
+    repeat scan doesn't even reach the database. It is a hint, not the truth:
+    the attendance INSERT itself still refuses duplicates.
+    """
+
+    def __init__(self, repo, connection, ttl_seconds=TTL_SECONDS):
+        self.repo = repo
+        self._connection = connection      # Context manager factory, e.g. FaceEngine.db
+        self.ttl_seconds = ttl_seconds
+        self._schedule = None
+        self._lock = threading.Lock()
+        self._loaded = threading.Condition(self._lock)
+        self._loading = False
+        self._generation = 0               # Bumped by invalidate(): a load started before it is not kept
+        self.counters = {"hits": 0, "loads": 0, "stale_hits": 0}
+
+    # ------------------------------------------
+    # Lookups
+    # ------------------------------------------
+    def current(self):
+        schedule = self._schedule
+        if schedule is None or schedule.day != date.today() or self._expired(schedule):
+            schedule = self._reload(stale=schedule)
+        else:
+            self.counters["hits"] += 1
+        return schedule
+
+    def sessions_for_student(self, student_id):
+        return self.current().by_student.get(str(student_id), ())
+
+    def sessions_in_classroom(self, classroom_id):
+        return self.current().by_classroom.get(classroom_id, ())
+
+    def is_marked(self, session_id, student_id):
+        return (session_id, str(student_id)) in self.current().marked
+
+    def mark(self, session_id, student_id):
+        """Remembers an attendance written by this process"""
+        self.current().marked.add((session_id, str(student_id)))
+
+    # ------------------------------------------
+    # Loading
+    # ------------------------------------------
+    def invalidate(self):
+        """Drops the cached day; the next lookup reloads it. Returns the fresh schedule."""
+        with self._lock:
+            self._schedule = None
+            self._generation += 1
+        return self.current()
+
+    def _expired(self, schedule):
+        return self.ttl_seconds and time.monotonic() - schedule.loaded_at > self.ttl_seconds
+
+    def _reload(self, stale):
+        with self._lock:
+            while self._loading:
+                if stale is not None and stale.day == date.today():
+                    self.counters["stale_hits"] += 1
+                    return stale               # Expired, not wrong: no need to wait for the other thread's load
+                self._loaded.wait()
+            # Another thread may have reloaded while we waited for the lock (None = invalidated, load it)
+            if self._schedule is not None and self._schedule is not stale:
+                return self._schedule
+            self._loading = True
+            generation = self._generation
+
+        fresh = None
+        try:
+            fresh = self._load(date.today())   # Queries run without the lock
+        finally:
+            with self._lock:
+                self._loading = False
+                if fresh is not None and generation == self._generation:
+                    current = self._schedule
+                    if current is not None and current.day == fresh.day:
+                        fresh.marked.update(current.marked)   # Marks made while we were loading
+                    self._schedule = fresh
+                    self.counters["loads"] += 1
+                self._loaded.notify_all()
+        return fresh
+
+    def _load(self, day):
+        with self._connection() as conn:
+            rows = self.repo.day_sessions(conn, day)
+            enrolled = self.repo.day_enrollment(conn, day)
+            marked = self.repo.day_attendance(conn, day)
+
+        sessions, by_course, by_classroom = {}, {}, {}
+        for row in rows:
+            session = Session(row.session_id, row.name, row.classroom_id,
+                              row.session_start, row.session_end, row.session_type)
+            sessions[session.session_id] = session
+            by_course.setdefault(row.course_id, []).append(session)
+            by_classroom.setdefault(session.classroom_id, []).append(session)
+
+        by_student = {}
+        for student_id, course_id in enrolled:
+            by_student.setdefault(str(student_id), []).extend(by_course.get(course_id, ()))
+
+        return DaySchedule(
+            day=day,
+            loaded_at=time.monotonic(),
+            sessions=sessions,
+            by_student={sid: tuple(found) for sid, found in by_student.items()},
+            by_classroom={room: tuple(found) for room, found in by_classroom.items()},
+            marked={(session_id, str(student_id)) for session_id, student_id in marked},
+        )
+
+    def stats(self):
+        schedule = self._schedule
+        loaded_for = round(time.monotonic() - schedule.loaded_at, 1) if schedule else None
+        return dict(
+            self.counters,
+            day=schedule.day.isoformat() if schedule else None,
+            sessions=len(schedule.sessions) if schedule else 0,
+            students=len(schedule.by_student) if schedule else 0,
+            marked=len(schedule.marked) if schedule else 0,
+            age_seconds=loaded_for,
+            ttl_seconds=self.ttl_seconds,
+        )
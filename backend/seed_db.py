@@ -0,0 +1,144 @@
+import sys
+import time
+import random
+import argparse
+from datetime import date, datetime, time as clock, timedelta
+from repository import build_repository, SQLITE_PATH
+
+# --- CONFIGURATION ---
+STUDENTS = 5000
+INSTRUCTORS = 120
+DEPARTMENTS = 8
+CLASSROOMS = 60
+COURSES = 300
+COURSES_PER_STUDENT = 6
+MEETINGS_PER_WEEK = 2        # Class sessions per course per week
+PAST_DAYS = 28               # Sessions (with attendance) generated before today ...
+FUTURE_DAYS = 14             # ... and scheduled after it
+ATTENDANCE_RATE = 0.85       # Share of enrolled students marked present in a past session
+FIRST_STUDENT_ID = 20220000  # Student ids are FIRST_STUDENT_ID + n
+SEED = 42
+# ---------------------
+
+FIRST_NAMES = ["Ahmed", "Mohamed", "Omar", "Youssef", "Ali", "Mariam", "Nour", "Salma", "Hana", "Laila",
+               "Karim", "Mostafa", "Aya", "Farida", "Hassan", "Mona", "Tarek", "Yasmin", "Ziad", "Rana"]
+LAST_NAMES = ["Hassan", "Ibrahim", "Mahmoud", "Saeed", "Fathy", "Adel", "Nabil", "Samir", "Kamal", "Fouad",
+              "Gamal", "Ashraf", "Hamdy", "Sherif", "Zaki", "Lotfy", "Ragab", "Shawky", "Badr", "Younes"]
+SLOTS = [clock(8, 30), clock(10, 30), clock(12, 30), clock(14, 30), clock(16, 30)]
+SESSION_MINUTES = 90
+
+
+def student_ids(count=STUDENTS):
+    """Ids seeded for `count` students (load tests build matching gallery labels from these)"""
+    return [FIRST_STUDENT_ID + n for n in range(count)]
+
+
+def generate(rng, students, courses, today):
+    """Every table's rows, in insert order. Ids are 1..N (fresh schema)."""
+    tables = {}
+    tables['admin'] = (("username", "password", "full_name", "role"), [("admin", "admin", "System Admin", "Admin")])
+    tables['department'] = (("name",), [(f"Department {d + 1}",) for d in range(DEPARTMENTS)])
+    tables['instructor'] = (
+        ("first_name", "last_name", "email", "department_id", "password", "role", "username"),
+        [(rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), f"instr{i + 1}@fue.edu.eg",
+          i % DEPARTMENTS + 1, "admin123", rng.choice(["Dr", "Eng"]), f"instr{i + 1}")
+         for i in range(INSTRUCTORS)]
+    )
+    tables['student'] = (
+        ("id", "first_name", "last_name", "email", "password", "academic_year"),
+        [(sid, rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), f"{sid}@fue.edu.eg", "123456", str(rng.randint(1, 5)))
+         for sid in student_ids(students)]
+    )
+    tables['camera'] = (("location",), [(f"Room {r + 1}",) for r in range(CLASSROOMS)])
+    tables['classroom'] = (("building", "capacity", "camera_id"),
+                           [(f"Building {chr(65 + r % 4)}", rng.choice([40, 60, 120]), r + 1) for r in range(CLASSROOMS)])
+
+    course_instructor = [rng.randint(1, INSTRUCTORS) for _ in range(courses)]
+    tables['course'] = (("name", "credit_hours", "department_id", "instructor_id"),
+                        [(f"Course {c + 1}", rng.choice([2, 3, 4]), c % DEPARTMENTS + 1, course_instructor[c])
+                         for c in range(courses)])
+
+    # Each course meets on MEETINGS_PER_WEEK fixed weekdays, in a fixed slot and room
+    meetings = []
+    for c in range(courses):
+        weekdays = rng.sample(range(7), min(MEETINGS_PER_WEEK, 7))
+        meetings.append((weekdays, rng.choice(SLOTS), rng.randint(1, CLASSROOMS)))
+
+    sessions, session_courses = [], []
+    for offset in range(-PAST_DAYS, FUTURE_DAYS + 1):
+        day = today + timedelta(days=offset)
+        for c, (weekdays, slot, room) in enumerate(meetings):
+            if day.weekday() not in weekdays:
+                continue
+            start = datetime.combine(day, slot)
+            end = start + timedelta(minutes=SESSION_MINUTES)
+            s_type = rng.choice(["TH", "TH", "PR"])
+            sessions.append((c + 1, course_instructor[c], room, s_type, start, end, "Scheduled", start, end))
+            session_courses.append((c + 1, start))
+    tables['class_session'] = (
+        ("course_id", "instructor_id", "classroom_id", "session_type", "session_start", "session_end",
+         "session_status", "attendance_start", "attendance_end"),
+        sessions
+    )
+
+    enrolled = {c + 1: [] for c in range(courses)}
+    enrollment = []
+    for sid in student_ids(students):
+        for c in rng.sample(range(1, courses + 1), min(COURSES_PER_STUDENT, courses)):
+            enrolled[c].append(sid)
+            enrollment.append((sid, c, "Enrolled", today - timedelta(days=PAST_DAYS), "Fall", "2025/2026"))
+    tables['enrollment'] = (("student_id", "course_id", "status", "enrolled_date", "semester", "academic_year"), enrollment)
+
+    now = datetime.now()
+    attendance = []
+    for session_id, (c, start) in enumerate(session_courses, start=1):
+        if start >= now:
+            continue
+        for sid in enrolled[c]:
+            if rng.random() < ATTENDANCE_RATE:
+                marked_at = start + timedelta(minutes=rng.randint(0, 15))
+                attendance.append((session_id, sid, "FaceID", "Present", marked_at, marked_at))
+    tables['attendance_record'] = (("session_id", "student_id", "method", "status", "marked_at", "last_updated"), attendance)
+    return tables
+
+
+def seed(repo, students=STUDENTS, courses=COURSES, seed_value=SEED):
+    rng = random.Random(seed_value)
+    conn = repo.connect()
+    try:
+        repo.create_schema(conn)
+        tables = generate(rng, students, courses, date.today())
+        for table, (columns, rows) in tables.items():
+            start = time.perf_counter()
+            repo.bulk_insert(conn, table, columns, rows)
+            print(f"   {table:<18} {len(rows):>9,} rows  ({time.perf_counter() - start:.2f}s)")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Creates the schema and fills it with realistic fake data")
+    parser.add_argument('--backend', default='sqlite', help="sqlite | postgres (SQL Server: run init_db.sql)")
+    parser.add_argument('--path', default=SQLITE_PATH, help="SQLite database file")
+    parser.add_argument('--dsn', help="PostgreSQL DSN (default: repository.POSTGRES_DSN)")
+    parser.add_argument('--students', type=int, default=STUDENTS)
+    parser.add_argument('--courses', type=int, default=COURSES)
+    parser.add_argument('--seed', type=int, default=SEED)
+    args = parser.parse_args()
+
+    if args.backend == 'sqlite':
+        repo = build_repository('sqlite', path=args.path)
+    elif args.dsn:
+        repo = build_repository(args.backend, dsn=args.dsn)
+    else:
+        repo = build_repository(args.backend)
+
+    print(f"🌱 Seeding {args.backend} with {args.students} students, {args.courses} courses...")
+    start = time.perf_counter()
+    try:
+        seed(repo, args.students, args.courses, args.seed)
+    except NotImplementedError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"✅ Done in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,262 @@
+import os
+import cv2
+import time
+import argparse
+import numpy as np
+from embedder import FaceEmbedder, PROFILES
+from gallery import load_gallery, match_faces_across
+from enrolled_faces import EnrolledFaces
+from db_pool import ConnectionPool
+from repository import build_repository
+from schedule_cache import ScheduleCache
+from attendance_journal import AttendanceJournal
+from checkin import check_in
+
+# --- CONFIGURATION ---
+BRAIN_FILE = 'face_gallery.json'            # Same gallery the API serves
+LEGACY_BRAIN_FILE = 'face_encodings.pkl'
+PROFILE = PROFILES['stream']                # 640px detector, all cores (see embedder.py)
+DETECT_FPS = 5              # Detector runs on this many frames per second of video; tracks fill the gaps
+MIN_FACE = 40               # Faces narrower than this (px) are tracked but never embedded
+IOU_MATCH = 0.3             # Minimum overlap to continue a track with a new detection
+MAX_MISSES = 10             # Detection rounds a track survives without a matching face
+EMBED_RETRY_EVERY = 3       # Detection rounds between attempts on a still-unknown track ...
+MAX_EMBED_ATTEMPTS = 5      # ... and how many attempts before giving up on it
+MATCH_THRESHOLD = 0.5
+JOURNAL_FILE = 'stream_journal.log'         # Own journal: the API process owns attendance_journal.log
+REPORT_SECONDS = 5
+# ---------------------
+
+
+def iou_matrix(a, b):
+    """Pairwise intersection-over-union of [x1, y1, x2, y2] boxes (len(a) x len(b))"""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-6)
+
+
+class Track:
+    __slots__ = ('track_id', 'bbox', 'velocity', 'misses', 'attempts', 'last_attempt',
+                 'student_id', 'name', 'score')
+
+    def __init__(self, track_id, bbox):
+        self.track_id = track_id
+        self.bbox = bbox
+        self.velocity = np.zeros(4, dtype=np.float32)
+        self.misses = 0
+        self.attempts = 0
+        self.last_attempt = None
+        self.student_id = None
+        self.name = None
+        self.score = 0.0
+
+    def wants_embedding(self, round_no):
+        if self.student_id is not None or self.attempts >= MAX_EMBED_ATTEMPTS:
+            return False
+        return self.last_attempt is None or round_no - self.last_attempt >= EMBED_RETRY_EVERY
+
+
+class FaceTracker:
+    """
+    IoU tracker. Between detection rounds each track moves with its last
+    velocity (constant-velocity prediction), so a face walking past the camera
+    still overlaps its track when the detector runs again.
+    """
+
+    def __init__(self, iou_match=IOU_MATCH, max_misses=MAX_MISSES):
+        self.iou_match = iou_match
+        self.max_misses = max_misses
+        self.tracks = []
+        self._next_id = 1
+        self.created = 0
+
+    def update(self, boxes):
+        """Associates this round's boxes with tracks. Returns the track of each box."""
+        predicted = np.array([t.bbox + t.velocity for t in self.tracks], dtype=np.float32).reshape(-1, 4)
+        overlaps = iou_matrix(predicted, boxes)
+
+        owners = [None] * len(boxes)
+        used = set()
+        for k in np.argsort(-overlaps, axis=None):
+            t, d = np.unravel_index(k, overlaps.shape)
+            if overlaps[t, d] < self.iou_match:
+                break
+            if t in used or owners[d] is not None:
+                continue
+            track = self.tracks[t]
+            track.velocity = boxes[d] - track.bbox
+            track.bbox = boxes[d]
+            track.misses = 0
+            owners[d] = track
+            used.add(t)
+
+        for t, track in enumerate(self.tracks):
+            if t not in used:
+                track.misses += 1
+                track.bbox = track.bbox + track.velocity
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+
+        for d, owner in enumerate(owners):
+            if owner is None:
+                owners[d] = Track(self._next_id, boxes[d])
+                self.tracks.append(owners[d])
+                self._next_id += 1
+                self.created += 1
+        return owners
+
+
+class StreamRecognizer:
+    """
+    Detects every `detect_every`-th frame, tracks faces across rounds and embeds
+    each track once it is big enough, instead of every face in every frame.
+    All crops of a round go through ONE batched ArcFace call and ONE gallery
+    matrix product. `on_identified(track)` fires once per identified track.
+    Faces enrolled in the database since train.py are a second, small gallery
+    (`enrolled`), matched together with the brain file's.
+    """
+
+    def __init__(self, embedder, gallery, on_identified, detect_every=1,
+                 min_face=MIN_FACE, threshold=MATCH_THRESHOLD, enrolled=None):
+        self.embedder = embedder
+        self.galleries = [gallery] if enrolled is None else [gallery, enrolled]
+        self.on_identified = on_identified
+        self.detect_every = max(1, detect_every)
+        self.min_face = min_face
+        self.threshold = threshold
+        self.tracker = FaceTracker()
+        self.counters = {"frames": 0, "detections": 0, "faces": 0, "embeddings": 0, "identified": 0}
+        self._round = 0
+
+    def process(self, frame):
+        index = self.counters["frames"]
+        self.counters["frames"] += 1
+        if index % self.detect_every:
+            return
+
+        self._round += 1
+        self.counters["detections"] += 1
+        bboxes, kpss = self.embedder.detect(frame)
+        self.counters["faces"] += len(bboxes)
+        tracks = self.tracker.update(bboxes[:, :4].astype(np.float32))
+        if not tracks:
+            return
+
+        pending = []
+        for track, bbox, kps in zip(tracks, bboxes, kpss):
+            if bbox[2] - bbox[0] >= self.min_face and track.wants_embedding(self._round):
+                track.attempts += 1
+                track.last_attempt = self._round
+                pending.append((track, kps))
+        if not pending:
+            return
+
+        embeddings = self.embedder.embed_crops([self.embedder.align(frame, kps) for _, kps in pending])
+        self.counters["embeddings"] += len(pending)
+
+        for face, gallery, row, score in match_faces_across(self.galleries, embeddings, self.threshold):
+            track = pending[face][0]
+            track.student_id = gallery.ids[row]
+            track.name = gallery.names[row]
+            track.score = score
+            self.counters["identified"] += 1
+            self.on_identified(track)
+
+    def stats(self, elapsed):
+        elapsed = max(elapsed, 1e-6)
+        return dict(
+            self.counters,
+            tracks=self.tracker.created,
+            fps=round(self.counters["frames"] / elapsed, 1),
+            embeddings_per_sec=round(self.counters["embeddings"] / elapsed, 2),
+        )
+
+
+def open_source(source):
+    """Camera index ('0'), video file or stream URL (rtsp://, http://)"""
+    capture = cv2.VideoCapture(int(source) if source.isdigit() else source)
+    if not capture.isOpened():
+        raise RuntimeError(f"Cannot open video source '{source}'")
+    return capture
+
+
+def run(source, classroom_id=None, realtime=False, max_frames=0):
+    brain_file = BRAIN_FILE if os.path.exists(BRAIN_FILE) else LEGACY_BRAIN_FILE
+    gallery = load_gallery(brain_file)
+    print(f"✅ Loaded {len(gallery)} faces from {brain_file}")
+
+    capture = open_source(source)
+    video_fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    detect_every = max(1, round(video_fps / DETECT_FPS))
+    print(f"🎥 {source}: {video_fps:.1f} fps, detecting every {detect_every} frame(s)")
+
+    journal, enrolled_gallery = None, None
+    if classroom_id is not None:
+        repo = build_repository()
+        pool = ConnectionPool(repo.connect, max_size=2)
+        schedule = ScheduleCache(repo, pool.connection)
+        journal = AttendanceJournal(repo, pool.connection, path=JOURNAL_FILE)
+        enrolled = EnrolledFaces(repo, pool.connection)
+        enrolled.sync()
+        enrolled_gallery = enrolled.gallery(model_name=gallery.model_name)   # Students enrolled since the last train.py run
+        print(f"✅ Loaded {len(enrolled_gallery)} enrolled faces from the database")
+
+    def on_identified(track):
+        line = f"👤 track {track.track_id}: {track.name} ({track.student_id}) score {track.score:.2f}"
+        if journal is not None:
+            payload, _ = check_in(schedule, journal, track.student_id, track.name, classroom_id)
+            line += " -> " + payload["message"].replace("\n", " ")
+        print(line)
+
+    recognizer = StreamRecognizer(FaceEmbedder.from_profile(PROFILE), gallery, on_identified, detect_every,
+                                  enrolled=enrolled_gallery)
+
+    start = last_report = time.perf_counter()
+    frame_interval = 1.0 / video_fps
+    try:
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            recognizer.process(frame)
+
+            now = time.perf_counter()
+            if realtime:
+                # Files play at their own speed, like a live camera would deliver them
+                behind = start + recognizer.counters["frames"] * frame_interval - now
+                if behind > 0:
+                    time.sleep(behind)
+            if now - last_report >= REPORT_SECONDS:
+                print(f"📊 {recognizer.stats(now - start)}")
+                last_report = now
+            if max_frames and recognizer.counters["frames"] >= max_frames:
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        capture.release()
+
+    elapsed = time.perf_counter() - start
+    if journal is not None:
+        journal.flush()
+    stats = recognizer.stats(elapsed)
+    print(f"\n✅ {stats['frames']} frames in {elapsed:.1f}s: {stats['fps']} fps, "
+          f"{stats['embeddings']} embeddings ({stats['embeddings_per_sec']}/s) for {stats['tracks']} tracks, "
+          f"{stats['identified']} identified")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recognize faces in a video file, camera or RTSP stream")
+    parser.add_argument('source', help="Video file, camera index (0) or stream URL (rtsp://...)")
+    parser.add_argument('--classroom', type=int, help="Mark attendance for this classroom_id (omit to only print matches)")
+    parser.add_argument('--realtime', action='store_true', help="Pace a video file at its own frame rate")
+    parser.add_argument('--max-frames', type=int, default=0)
+    args = parser.parse_args()
+    run(args.source, classroom_id=args.classroom, realtime=args.realtime, max_frames=args.max_frames)
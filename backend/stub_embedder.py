@@ -0,0 +1,111 @@
+import time
+import cv2
+import numpy as np
+from gallery import EMBEDDING_DIM
+
+# --- CONFIGURATION ---
+DETECT_MS = 8              # Simulated detector time per image (sleeps, so it releases the GIL like ONNX Runtime)
+EMBED_MS = 4               # Simulated ArcFace time per crop
+BLOCK = 16                 # Side (px) of one bit of the identity code
+SYNC_BITS = [1, 0, 1, 1, 0, 1, 0, 0]   # First row of blocks: "a face is here"
+ID_ROWS = 4                # 4 rows x 8 blocks = 32-bit identity index
+UNKNOWN = 0xFFFFFFFF       # Index that maps to nobody in the gallery
+IDENTITY_SEED = 7          # Same seed for the synthetic gallery and the stub, or nothing matches
+# ---------------------
+
+CODE_WIDTH = BLOCK * len(SYNC_BITS)
+CODE_HEIGHT = BLOCK * (1 + ID_ROWS)
+
+
+def identity_embedding(index, seed=IDENTITY_SEED):
+    """The unit-length 'true' embedding of synthetic person `index`"""
+    vector = np.random.default_rng((seed, index)).standard_normal(EMBEDDING_DIM).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def scan_image(index, noise_rng=None, noise_rows=48):
+    """
+    A small BGR image the stub 'recognizes' as person `index` (UNKNOWN = a stranger).
+    With `noise_rng`, random pixels below the code make every upload's bytes unique.
+    """
+    bits = SYNC_BITS + [(index >> (31 - b)) & 1 for b in range(32)]
+    code = np.array(bits, dtype=np.uint8).reshape(1 + ID_ROWS, len(SYNC_BITS)) * 255
+    img = np.repeat(np.repeat(code, BLOCK, axis=0), BLOCK, axis=1)
+    if noise_rng is not None:
+        img = np.vstack([img, noise_rng.integers(0, 256, (noise_rows, CODE_WIDTH), dtype=np.uint8)])
+    return cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+
+
+def read_code(img):
+    """The identity index drawn by scan_image(), or None if there is no code (no face)"""
+    if img is None or img.shape[0] < CODE_HEIGHT or img.shape[1] < CODE_WIDTH:
+        return None
+    gray = cv2.cvtColor(img[:CODE_HEIGHT, :CODE_WIDTH], cv2.COLOR_BGR2GRAY)
+    means = gray.reshape(1 + ID_ROWS, BLOCK, len(SYNC_BITS), BLOCK).mean(axis=(1, 3))
+    bits = (means > 127).astype(int).ravel().tolist()
+    if bits[:len(SYNC_BITS)] != SYNC_BITS:
+        return None
+    index = 0
+    for bit in bits[len(SYNC_BITS):]:
+        index = (index << 1) | bit
+    return index
+
+
+class StubEmbedder:
+    """
+    Deterministic stand-in for FaceEmbedder (same methods), for load tests on
+    machines without the InsightFace models or a GPU. An image drawn by
+    scan_image(i) has one 'face' whose embedding is identity_embedding(i);
+    anything else has no face. DETECT_MS / EMBED_MS of sleep stand in for the
+    models' compute time.
+    """
+
+    def __init__(self, model_name='stub', det_size=(640, 640), batch_size=32,
+                 detect_ms=DETECT_MS, embed_ms=EMBED_MS, **_):
+        self.model_name = model_name
+        self.det_size = tuple(det_size)
+        self.batch_size = batch_size
+        self.detect_ms = detect_ms
+        self.embed_ms = embed_ms
+
+    @classmethod
+    def from_profile(cls, profile, providers=None):
+        """Same call as FaceEmbedder.from_profile(); the profile only names the stub (no models to size)"""
+        name = profile if isinstance(profile, str) else profile.name
+        print(f"⚙️  Engine profile '{name}': STUB model ({DETECT_MS} ms detect, {EMBED_MS} ms/crop embed)")
+        return cls()
+
+    @property
+    def crop_size(self):
+        return 112
+
+    def detect(self, img, max_num=0):
+        time.sleep(self.detect_ms / 1000)
+        index = read_code(img)
+        if index is None:
+            return np.zeros((0, 5), dtype=np.float32), np.zeros((0, 5, 2), dtype=np.float32)
+        bbox = np.array([[0, 0, CODE_WIDTH, CODE_HEIGHT, 0.99]], dtype=np.float32)
+        kps = np.full((1, 5, 2), index, dtype=np.float64)   # The "landmarks" carry the identity to align()
+        return bbox, kps
+
+    def align(self, img, kps):
+        return int(kps[0, 0])
+
+    def embed_crops(self, crops):
+        if len(crops) == 0:
+            return np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        time.sleep(self.embed_ms * len(crops) / 1000)
+        return np.stack([identity_embedding(index) for index in crops])
+
+    def embed_largest_face(self, img):
+        bboxes, kpss = self.detect(img)
+        if bboxes.shape[0] == 0:
+            return None, None
+        return bboxes[0], self.embed_crops([self.align(img, kpss[0])])[0]
+
+    def sample_image(self):
+        return scan_image(0)
+
+    def embed_all_faces(self, img, min_face=0):
+        bboxes, kpss = self.detect(img)
+        return bboxes, self.embed_crops([self.align(img, kps) for kps in kpss])
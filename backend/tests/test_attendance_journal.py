@@ -0,0 +1,177 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from attendance_journal import AttendanceJournal, _read_journal
+
+
+class FakeConnection:
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+class FakeRepo:
+    """attendance_record as a dict; can be taken down or told to reject some students"""
+
+    def __init__(self):
+        self.rows = {}
+        self.rejected = set()    # Student ids the "database" refuses, like a foreign key violation
+        self.down = False
+        self.lock = threading.Lock()
+
+    def upsert_attendance(self, conn, records):
+        if self.down:
+            raise ConnectionError("database unreachable")
+        for record in records:
+            if record[1] in self.rejected:
+                raise ValueError(f"FOREIGN KEY constraint failed (student {record[1]})")
+        with self.lock:
+            for session_id, student_id, marked_at in records:
+                self.rows.setdefault((session_id, student_id), marked_at)
+
+    def ping(self, conn):
+        if self.down:
+            raise ConnectionError("database unreachable")
+
+
+@contextmanager
+def fake_connection():
+    yield FakeConnection()
+
+
+def make_journal(tmp_path, repo, owner, **options):
+    options.setdefault('flush_interval', 3600)   # Tests flush by hand unless they want the thread
+    return AttendanceJournal(repo, fake_connection, path=str(tmp_path / 'journal.log'), owner=owner, **options)
+
+
+def crash(journal):
+    """What the OS does when the process dies: its files close and its lock is released"""
+    os.close(journal._fd)
+    os.close(journal._owner_lock)
+
+
+def test_a_crashed_workers_journal_is_replayed_by_the_next_one(tmp_path):
+    repo = FakeRepo()
+    first = make_journal(tmp_path, repo, owner='101')
+    for student_id in ('1', '2', '3'):
+        first.record(7, student_id)
+    crash(first)
+    with open(first.path, 'a', encoding='utf-8') as f:
+        f.write('{"session_id": 7, "student_id": "4", "marked_')   # Torn by the crash
+
+    second = make_journal(tmp_path, repo, owner='102')
+    assert second.stats()["pending"] == 3
+    assert not os.path.exists(first.path)
+    assert len(_read_journal(second.path)) == 3
+
+    assert second.flush() == 3
+    assert sorted(repo.rows) == [(7, '1'), (7, '2'), (7, '3')]
+    assert _read_journal(second.path) == []
+
+
+def test_a_live_workers_journal_is_left_alone(tmp_path):
+    repo = FakeRepo()
+    first = make_journal(tmp_path, repo, owner='201')
+    first.record(7, '1')
+
+    second = make_journal(tmp_path, repo, owner='202')
+    assert second.stats()["pending"] == 0
+    assert len(_read_journal(first.path)) == 1
+    assert first.flush() == 1
+
+
+def test_compaction_while_appending_loses_nothing(tmp_path):
+    repo = FakeRepo()
+    journal = make_journal(tmp_path, repo, owner='301', batch_size=7)
+    writers, per_writer = 4, 150
+    done = threading.Event()
+
+    def write(worker):
+        for i in range(per_writer):
+            journal.record(worker, str(i))
+
+    def flush_until_done():
+        while not done.is_set():
+            journal.flush()
+
+    flusher = threading.Thread(target=flush_until_done)
+    flusher.start()
+    threads = [threading.Thread(target=write, args=(worker,)) for worker in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    done.set()
+    flusher.join()
+
+    # Everything recorded is either in the database or still in the journal file
+    journaled = {record[:2] for record in _read_journal(journal.path)}
+    assert len(journaled | set(repo.rows)) == writers * per_writer
+
+    journal.flush()
+    assert len(repo.rows) == writers * per_writer
+    assert _read_journal(journal.path) == []
+
+
+def test_a_failed_flush_keeps_the_records(tmp_path):
+    repo = FakeRepo()
+    journal = make_journal(tmp_path, repo, owner='401')
+    journal.record(7, '1')
+    journal.record(7, '2')
+
+    repo.down = True
+    try:
+        journal.flush()
+        assert False, "flush should have raised"
+    except ConnectionError:
+        pass
+    assert journal.stats()["pending"] == 2
+    assert len(_read_journal(journal.path)) == 2
+
+    repo.down = False
+    assert journal.flush() == 2
+    assert journal.stats()["pending"] == 0
+
+
+def test_rows_the_database_keeps_rejecting_are_dead_lettered(tmp_path):
+    repo = FakeRepo()
+    repo.rejected.add('2')
+    journal = make_journal(tmp_path, repo, owner='501', flush_interval=0.01, retry_seconds=0.01, max_attempts=3)
+    for student_id in ('1', '2', '3'):
+        journal.record(7, student_id)
+
+    deadline = time.time() + 5
+    while journal.stats()["dead_lettered"] == 0 and time.time() < deadline:
+        time.sleep(0.01)
+
+    stats = journal.stats()
+    assert stats["dead_lettered"] == 1
+    assert stats["failures"] >= 3
+    assert stats["pending"] == 0
+    assert sorted(repo.rows) == [(7, '1'), (7, '3')]
+    assert [record[:2] for record in _read_journal(journal.dead_letter_path)] == [(7, '2')]
+
+
+def test_nothing_is_dead_lettered_while_the_database_is_down(tmp_path):
+    repo = FakeRepo()
+    journal = make_journal(tmp_path, repo, owner='601')
+    journal.record(7, '1')
+    repo.down = True
+
+    assert journal.quarantine() == 0
+    assert journal.stats()["pending"] == 1
+    assert not os.path.exists(journal.dead_letter_path)
+
+
+def test_record_many_skips_students_already_recorded(tmp_path):
+    repo = FakeRepo()
+    journal = make_journal(tmp_path, repo, owner='701')
+    journal.record(7, '2')
+
+    assert journal.record_many([(7, '1'), (7, '2'), (7, 3)]) == [True, False, True]
+    assert journal.record_many([(7, '1')]) == [False]
+    assert [record[:2] for record in _read_journal(journal.path)] == [(7, '2'), (7, '1'), (7, '3')]
+    assert journal.flush() == 3
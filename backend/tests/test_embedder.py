@@ -0,0 +1,28 @@
+import pytest
+
+pytest.importorskip("insightface")
+pytest.importorskip("onnxruntime")
+import embedder   # noqa: E402
+
+BUFFALO_L = ['1k3d68.onnx', '2d106det.onnx', 'det_10g.onnx', 'genderage.onnx', 'w600k_r50.onnx']
+
+
+def pack(tmp_path, files):
+    for name in files:
+        (tmp_path / name).write_bytes(b'')
+    return str(tmp_path)
+
+
+def test_known_pack_uses_its_recognizer_file(tmp_path):
+    path = embedder._recognizer_file('buffalo_l', pack(tmp_path, BUFFALO_L))
+    assert path.endswith('w600k_r50.onnx')
+
+
+def test_unknown_pack_is_matched_by_file_name(tmp_path):
+    path = embedder._recognizer_file('my_pack', pack(tmp_path, ['scrfd_2.5g.onnx', 'glintr100.onnx']))
+    assert path.endswith('glintr100.onnx')
+
+
+def test_ambiguous_pack_is_an_error(tmp_path):
+    with pytest.raises(RuntimeError, match="RECOGNIZER_FILES"):
+        embedder._recognizer_file('my_pack', pack(tmp_path, ['det.onnx', 'rec.onnx']))
@@ -0,0 +1,99 @@
+import shutil
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+import pytest
+from gallery import FaceGallery, StoreChanged, embedding_to_blob, match_faces_across
+from enrolled_faces import EnrolledFaces
+
+DIM = 8
+
+
+def unit(rng, count):
+    vectors = rng.standard_normal((count, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_match_faces_across_finds_faces_in_either_gallery():
+    rng = np.random.default_rng(0)
+    vectors = unit(rng, 6)
+    base = FaceGallery.from_arrays(vectors[:4], [f"Student {i} - {i}" for i in range(4)])
+    enrolled = FaceGallery.from_arrays(vectors[4:], ["New One - 10", "New Two - 11"])
+
+    matches = match_faces_across([base, enrolled], vectors[[1, 5]], 0.5)
+    assert [(face, gallery is enrolled, gallery.ids[row]) for face, gallery, row, _ in matches] == \
+        [(0, False, '1'), (1, True, '11')]
+
+
+def test_a_student_in_both_galleries_is_given_to_one_face_only():
+    rng = np.random.default_rng(1)
+    vectors = unit(rng, 2)
+    base = FaceGallery.from_arrays(vectors[:1], ["Ada Lovelace - 1"])
+    re_enrolled = FaceGallery.from_arrays(vectors[1:], ["Ada Lovelace - 1"])
+
+    matches = match_faces_across([base, re_enrolled], vectors, -1.0)
+    assert len(matches) == 1
+    assert matches[0][1].ids[matches[0][2]] == '1'
+
+
+def test_single_gallery_match_faces_is_unchanged():
+    rng = np.random.default_rng(2)
+    vectors = unit(rng, 6)
+    gallery = FaceGallery.from_arrays(vectors, [f"Student {i % 3} - {i % 3}" for i in range(6)])
+    assert [(face, row) for face, row, _ in gallery.match_faces(vectors[[0, 4]], 0.5)] == [(0, 0), (1, 4)]
+
+
+FaceRow = namedtuple('FaceRow', ['id', 'first_name', 'last_name', 'face_embedding', 'face_updated_at'])
+
+
+class FakeFaceRepo:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def face_embeddings_since(self, conn, since=None):
+        return [row for row in self.rows if since is None or row.face_updated_at >= since]
+
+
+@contextmanager
+def no_connection():
+    yield None
+
+
+def test_enrolled_faces_are_a_gallery_of_their_own():
+    rng = np.random.default_rng(3)
+    vectors = unit(rng, 2)
+    stamp = datetime(2025, 1, 6, 9)
+    repo = FakeFaceRepo([FaceRow(10, 'New', 'One', embedding_to_blob(vectors[0]), stamp),
+                         FaceRow(11, 'New', 'Two', embedding_to_blob(vectors[1]), stamp)])
+    enrolled = EnrolledFaces(repo, no_connection, dim=DIM)
+    assert enrolled.sync(full=True) == 2
+
+    gallery = enrolled.gallery(model_name='buffalo_l')
+    assert len(gallery) == 2 and gallery.model_name == 'buffalo_l'
+    assert sorted(gallery.ids) == ['10', '11']
+
+    repo.rows[1] = FaceRow(11, 'New', 'Two', None, datetime(2025, 1, 6, 10))
+    assert enrolled.sync() == 1
+    assert list(enrolled.gallery().ids) == ['10']
+
+
+def test_a_store_rewritten_while_opening_is_read_again(tmp_path):
+    rng = np.random.default_rng(4)
+    labels = [f"Student {i} - {i}" for i in range(4)]
+    path, old_header = str(tmp_path / 'gallery.json'), str(tmp_path / 'old.json')
+    FaceGallery.from_arrays(unit(rng, 4), labels).save_store(path)
+    shutil.copy(path, old_header)
+    new = FaceGallery.from_arrays(unit(rng, 4), labels)
+    new.save_store(path)
+    shutil.copy(path, str(tmp_path / 'new.json'))
+
+    # A reader that got the old header, then mapped the re-embedded rows (same count)
+    shutil.copy(old_header, path)
+    with pytest.raises(StoreChanged):
+        FaceGallery.from_store(path, attempts=1)
+
+    threading.Timer(0.02, shutil.copy, (str(tmp_path / 'new.json'), path)).start()
+    reopened = FaceGallery.from_store(path)
+    assert np.array_equal(reopened.embeddings, new.embeddings)
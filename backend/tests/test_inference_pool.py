@@ -0,0 +1,100 @@
+import threading
+import numpy as np
+import pytest
+from inference_pool import InferenceScheduler
+
+DIM = 4
+
+
+class CountingEmbedder:
+    """One 'face' per image; the image is a number that becomes the embedding"""
+
+    model_name = 'fake'
+
+    def __init__(self):
+        self.embed_calls = []    # Crops per embed_crops() call
+        self.lock = threading.Lock()
+
+    def detect(self, img, max_num=0):
+        if isinstance(img, str):
+            raise ValueError(f"cannot decode {img}")
+        if img is None:
+            return np.zeros((0, 5), dtype=np.float32), np.zeros((0, 5, 2))
+        return np.array([[0, 0, 10, 10, 0.9]], dtype=np.float32), np.zeros((1, 5, 2))
+
+    def align(self, img, kps):
+        return img
+
+    def embed_crops(self, crops):
+        with self.lock:
+            self.embed_calls.append(len(crops))
+        return np.array([np.full(DIM, value, dtype=np.float32) for value in crops]).reshape(-1, DIM)
+
+    def sample_image(self):
+        return 0
+
+
+def make_scheduler(**options):
+    embedder = CountingEmbedder()
+    return InferenceScheduler(lambda: embedder, replicas=1, **options), embedder
+
+
+def test_scans_arriving_together_share_one_embed_call():
+    scheduler, embedder = make_scheduler(max_batch=8, batch_window_ms=300)
+    futures = [scheduler.submit(i) for i in range(8)]
+    results = [future.result(timeout=5) for future in futures]
+
+    assert embedder.embed_calls == [8]
+    for i, (bbox, embedding, timing) in enumerate(results):
+        assert embedding[0] == i                 # Each scan gets its own face back
+        assert timing["batch_size"] == 8
+    assert scheduler.stats()["avg_batch_size"] == 8
+
+
+def test_batches_are_capped_at_max_batch():
+    scheduler, embedder = make_scheduler(max_batch=4, batch_window_ms=300)
+    futures = [scheduler.submit(i) for i in range(10)]
+    for future in futures:
+        future.result(timeout=5)
+
+    assert sum(embedder.embed_calls) == 10
+    assert max(embedder.embed_calls) <= 4
+
+
+def test_images_without_a_face_do_not_reach_the_recognizer():
+    scheduler, embedder = make_scheduler(max_batch=8, batch_window_ms=300)
+    futures = [scheduler.submit(img) for img in (1, None, 3)]
+    results = [future.result(timeout=5) for future in futures]
+
+    assert embedder.embed_calls == [2]
+    assert results[1][0] is None and results[1][1] is None
+
+
+def test_a_bad_image_fails_only_its_own_scan():
+    scheduler, embedder = make_scheduler(max_batch=8, batch_window_ms=300)
+    futures = [scheduler.submit(img) for img in (1, 'corrupt.jpg', 3)]
+
+    with pytest.raises(ValueError):
+        futures[1].result(timeout=5)
+    assert [future.result(timeout=5)[1][0] for future in (futures[0], futures[2])] == [1, 3]
+    assert embedder.embed_calls == [2]
+    assert scheduler.stats()["failed"] == 1
+
+
+def test_kiosk_profile_embeds_a_full_batch_in_one_recognizer_call():
+    pytest.importorskip("insightface")
+    from embedder import FaceEmbedder, PROFILES
+    from inference_pool import MAX_BATCH
+
+    class Recognizer:
+        calls = 0
+
+        def get_feat(self, crops):
+            Recognizer.calls += 1
+            return np.ones((len(crops), 512), dtype=np.float32)
+
+    embedder = FaceEmbedder.__new__(FaceEmbedder)
+    embedder.batch_size = PROFILES['kiosk'].batch_size
+    embedder.recognizer = Recognizer()
+    embedder.embed_crops([np.zeros((112, 112, 3), dtype=np.uint8)] * MAX_BATCH)
+    assert Recognizer.calls == 1
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from gallery import FaceGallery
+from compaction import rows_by_label
+from matchers import ExactMatcher, CentroidMatcher, IVFMatcher, Int8Matcher, build_matcher
+
+DIM = 64
+
+
+def synthetic(rows=2000, per_person=4, noise=0.3, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((rows // per_person, DIM)).astype(np.float32)
+    vectors = np.repeat(centers, per_person, axis=0) + rng.standard_normal((rows, DIM)).astype(np.float32) * noise
+    labels = [f"Student {i // per_person} - {i // per_person}" for i in range(rows)]
+    return FaceGallery.from_arrays(vectors, labels), rng
+
+
+def probes_near(gallery, rng, count=50, noise=0.05):
+    picked = gallery.embeddings[rng.integers(0, len(gallery), count)]
+    probes = picked + rng.standard_normal(picked.shape).astype(np.float32) * noise
+    return probes / np.linalg.norm(probes, axis=1, keepdims=True)
+
+
+def test_int8_agrees_with_exact():
+    gallery, rng = synthetic()
+    exact, int8 = ExactMatcher(gallery), Int8Matcher(gallery)
+    for probe in probes_near(gallery, rng):
+        row, score = int8.search(probe)
+        assert (row, score) == pytest.approx(exact.search(probe))
+
+
+def test_int8_keeps_no_float32_copy_of_the_gallery():
+    gallery, _ = synthetic()
+    int8 = Int8Matcher(gallery)
+    arrays = [value for value in vars(int8).values() if isinstance(value, np.ndarray)]
+    assert all(array.dtype != np.float32 or array.size <= len(gallery) for array in arrays)
+    assert int8.nbytes < gallery.embeddings.nbytes / 3
+
+
+def float32_bytes(matcher):
+    return sum(value.nbytes for value in vars(matcher).values()
+               if isinstance(value, np.ndarray) and value.dtype == np.float32)
+
+
+def test_centroid_reads_candidate_rows_from_the_gallery():
+    gallery, _ = synthetic(rows=4000, per_person=8)
+    assert float32_bytes(CentroidMatcher(gallery)) < gallery.embeddings.nbytes / 4
+
+
+def test_ivf_lists_row_numbers_only():
+    gallery, _ = synthetic(rows=4000, per_person=8)
+    ivf = IVFMatcher(gallery)
+    assert float32_bytes(ivf) == ivf._centroids.nbytes
+    assert ivf._row_index.shape == (len(gallery),)
+
+
+def test_centroid_and_ivf_find_the_exact_row():
+    gallery, rng = synthetic(rows=4000, per_person=8, noise=0.5)
+    exact = ExactMatcher(gallery)
+    probes = probes_near(gallery, rng, count=100)
+    expected = [exact.search(probe)[0] for probe in probes]
+    for matcher in (CentroidMatcher(gallery), IVFMatcher(gallery)):
+        found = [matcher.search(probe)[0] for probe in probes]
+        assert np.mean(np.array(found) == expected) >= 0.99, matcher.name
+
+
+def test_ivf_keeps_each_identity_in_one_list():
+    gallery, _ = synthetic(rows=4000, per_person=8, noise=0.5)
+    ivf = IVFMatcher(gallery)
+    cell_of_row = np.repeat(np.arange(ivf.nlist), np.diff(ivf._offsets))[np.argsort(ivf._row_index)]
+    for rows in rows_by_label(gallery.labels).values():
+        assert len(set(cell_of_row[rows])) == 1
+
+
+def test_ivf_rebuilds_an_index_saved_in_an_older_layout(tmp_path):
+    gallery, _ = synthetic(rows=400)
+    path = str(tmp_path / 'gallery.ivf.npz')
+    ivf = build_matcher('ivf', gallery, index_path=path)
+    with np.load(path) as data:
+        old = {key: data[key] for key in data.files if key != 'version'}
+    np.savez(path, **old)
+
+    assert IVFMatcher.load(path, gallery) is None
+    build_matcher('ivf', gallery, index_path=path)
+    assert IVFMatcher.load(path, gallery).nlist == ivf.nlist
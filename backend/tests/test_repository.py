@@ -0,0 +1,43 @@
+import sqlite3
+from datetime import datetime
+import pytest
+from repository import build_repository
+
+
+@pytest.fixture
+def sqlite_repo(tmp_path):
+    repo = build_repository('sqlite', path=str(tmp_path / 'ams.db'))
+    conn = repo.connect()
+    repo.create_schema(conn)
+    conn.execute("INSERT INTO student (id, first_name, last_name) VALUES (1, 'Ada', 'Lovelace'), (2, 'Alan', 'Turing')")
+    conn.execute("INSERT INTO class_session (session_id, session_start, session_end) VALUES (7, ?, ?)",
+                 (datetime(2025, 1, 6, 9), datetime(2025, 1, 6, 11)))
+    conn.commit()
+    yield repo, conn
+    conn.close()
+
+
+def attendance(conn):
+    return conn.execute("SELECT session_id, student_id, marked_at FROM attendance_record ORDER BY student_id").fetchall()
+
+
+def test_upsert_attendance_keeps_the_first_mark(sqlite_repo):
+    repo, conn = sqlite_repo
+    first, later = datetime(2025, 1, 6, 9, 5), datetime(2025, 1, 6, 9, 30)
+    repo.upsert_attendance(conn, [(7, '1', first), (7, '1', later), (7, '2', first)])
+    repo.upsert_attendance(conn, [(7, '1', later)])
+    conn.commit()
+    assert attendance(conn) == [(7, 1, first), (7, 2, first)]
+
+
+def test_attendance_is_unique_per_session_and_student(sqlite_repo):
+    _, conn = sqlite_repo
+    conn.execute("INSERT INTO attendance_record (session_id, student_id, status) VALUES (7, 1, 'Present')")
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute("INSERT INTO attendance_record (session_id, student_id, status) VALUES (7, 1, 'Late')")
+
+
+def test_upsert_attendance_still_rejects_unknown_students(sqlite_repo):
+    repo, conn = sqlite_repo
+    with pytest.raises(sqlite3.IntegrityError):
+        repo.upsert_attendance(conn, [(7, '99', datetime(2025, 1, 6, 9, 5))])
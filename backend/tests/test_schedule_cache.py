@@ -0,0 +1,118 @@
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime, date
+from schedule_cache import ScheduleCache
+
+SessionRow = namedtuple('SessionRow', ['session_id', 'name', 'classroom_id', 'session_start', 'session_end',
+                                       'session_type', 'course_id'])
+
+
+class FakeScheduleRepo:
+    """Today's timetable; day_sessions can be held open to stand in for a slow query"""
+
+    def __init__(self):
+        start = datetime.combine(date.today(), datetime.min.time()).replace(hour=9)
+        self.sessions = [SessionRow(7, 'Algebra', 'R1', start, start.replace(hour=11), 'Lecture', 100)]
+        self.enrollment = [(1, 100), (2, 100)]
+        self.attendance = [(7, 1)]
+        self.queries = 0
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def day_sessions(self, conn, day):
+        self.queries += 1
+        self.entered.set()
+        assert self.release.wait(5)
+        return list(self.sessions)
+
+    def day_enrollment(self, conn, day):
+        return list(self.enrollment)
+
+    def day_attendance(self, conn, day):
+        return list(self.attendance)
+
+
+@contextmanager
+def no_connection():
+    yield None
+
+
+def hold_queries(repo):
+    repo.entered.clear()
+    repo.release.clear()
+
+
+def test_lookups_come_from_one_load():
+    repo = FakeScheduleRepo()
+    cache = ScheduleCache(repo, no_connection)
+
+    assert [s.session_id for s in cache.sessions_for_student(2)] == [7]
+    assert [s.name for s in cache.sessions_in_classroom('R1')] == ['Algebra']
+    assert cache.is_marked(7, 1) and not cache.is_marked(7, '2')
+    cache.mark(7, 2)
+    assert cache.is_marked(7, '2')
+    assert repo.queries == 1
+
+
+def test_an_expired_schedule_is_served_while_another_thread_reloads():
+    repo = FakeScheduleRepo()
+    cache = ScheduleCache(repo, no_connection, ttl_seconds=0.001)
+    first = cache.current()
+    cache._schedule = first._replace(loaded_at=first.loaded_at - 1)   # Past its TTL
+    stale = cache._schedule
+    hold_queries(repo)
+    repo.enrollment.append((3, 100))
+
+    loader = threading.Thread(target=cache.current)
+    loader.start()
+    assert repo.entered.wait(5)
+
+    # The loader is inside its query: others neither wait for it nor query again
+    assert cache.current() is stale
+    assert cache.sessions_for_student(3) == ()
+    cache.mark(7, 2)
+    assert cache.stats()["sessions"] == 1
+    assert repo.queries == 2
+
+    repo.release.set()
+    loader.join(5)
+    assert [s.session_id for s in cache.sessions_for_student(3)] == [7]
+    assert cache.is_marked(7, 2)          # Marked during the load, kept by the swap
+    assert cache.counters["loads"] == 2
+
+
+def test_invalidate_does_not_keep_a_load_that_started_before_it():
+    repo = FakeScheduleRepo()
+    cache = ScheduleCache(repo, no_connection)
+    hold_queries(repo)
+
+    loader = threading.Thread(target=cache.current)
+    loader.start()
+    assert repo.entered.wait(5)
+    repo.sessions[0] = repo.sessions[0]._replace(classroom_id='R2')   # The admin's edit, after that query
+
+    threading.Timer(0.05, repo.release.set).start()
+    fresh = cache.invalidate()
+    loader.join(5)
+    assert [s.session_id for s in fresh.by_classroom['R2']] == [7]
+    assert cache.sessions_in_classroom('R1') == ()
+    assert repo.queries == 2
+
+
+def test_an_expired_lookup_right_after_invalidate_loads_the_day():
+    repo = FakeScheduleRepo()
+    cache = ScheduleCache(repo, no_connection, ttl_seconds=0.001)
+    first = cache.current()
+    stale = cache._schedule = first._replace(loaded_at=first.loaded_at - 1)
+
+    # invalidate() has dropped the day but not started its load yet
+    with cache._lock:
+        cache._schedule = None
+        cache._generation += 1
+    fresh = cache._reload(stale)
+
+    assert fresh is not None and fresh is cache._schedule
+    assert [s.session_id for s in fresh.by_student['1']] == [7]
+    assert repo.queries == 2
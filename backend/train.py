@@ -1,87 +1,271 @@
 import os
 import cv2
+import time
+import queue
+import argparse
+import threading
 import numpy as np
-import pickle
-from insightface.app import FaceAnalysis
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from embedder import FaceEmbedder, PROFILES
+from gallery import FaceGallery, EMBEDDING_DIM
+from embedding_cache import EmbeddingCache, file_digest
+from compaction import BUDGET, face_quality, compact, evaluate
 
 # --- CONFIGURATION ---
 DATASET_DIR = 'dataset/train'      # Where your photo folders are
-SAVE_FILE = 'face_encodings.pkl'   # The file where we save the "Brain"
-MODEL_NAME = 'buffalo_l'           # The most accurate model
+SAVE_FILE = 'face_gallery.json'    # The file where we save the "Brain" (+ .npy data files)
+PROFILE = PROFILES['training']     # Detector size / model pack / ORT threads (see embedder.py)
+MODEL_NAME = PROFILE.model_name    # buffalo_l: the most accurate model
+CACHE_FILE = 'train_cache.npz'     # Per-image embeddings from earlier runs (delete to force a full retrain)
+PREFETCH_IMAGES = 8                # Decoded images waiting for the model, per worker
+COMPACT = False                    # Quality filter + per-person budget before saving (see compaction.py, --compact)
+STAGES = ('decode', 'detect', 'embed')   # 'detect' includes the face alignment warp and quality measures
 # ---------------------
 
-def train():
-    # 1. Initialize the InsightFace Model
+def load_model(intra_op_threads=None):
     # ctx_id=0 for GPU, -1 for CPU
-    print("Loading Model...")
-    app = FaceAnalysis(name=MODEL_NAME, providers=['CUDAExecutionProvider', 'CPUExecutionProvider'])
-    app.prepare(ctx_id=0, det_size=(640, 640))
+    print(f"Loading Model... (pid {os.getpid()})")
+    profile = PROFILE
+    if intra_op_threads:
+        profile = profile._replace(intra_op_threads=intra_op_threads)
+    return FaceEmbedder.from_profile(profile, providers=['CUDAExecutionProvider', 'CPUExecutionProvider'])
+
+def cache_tag(aligned):
+    """Embeddings depend on the detector too (it places the alignment landmarks)"""
+    if aligned:
+        return f"{MODEL_NAME}/aligned"
+    return f"{MODEL_NAME}/{PROFILE.detector_pack}@{PROFILE.det_size[0]}x{PROFILE.det_size[1]}"
+
+def prepare_crop(embedder, img, aligned, timings):
+    """(aligned crop, quality) of the ONLY face in the image, or (None, None)"""
+    start = time.perf_counter()
+    try:
+        # Pre-cropped dataset: the image already IS the aligned face
+        if aligned:
+            face_px = min(img.shape[:2])
+            if img.shape[:2] != (embedder.crop_size, embedder.crop_size):
+                img = cv2.resize(img, (embedder.crop_size, embedder.crop_size))
+            return img, face_quality(img, face_px=face_px)
+
+        # Detect faces
+        bboxes, kpss = embedder.detect(img)
+
+        # STRICT RULE: We only learn if there is exactly ONE face.
+        # If there are 0 or 2+ faces, we might learn the wrong person.
+        if bboxes.shape[0] != 1:
+            return None, None
+        x1, y1, x2, y2, score = bboxes[0][:5]
+        crop = embedder.align(img, kpss[0])
+        return crop, face_quality(crop, det_score=score, face_px=min(x2 - x1, y2 - y1))
+    finally:
+        timings['detect'] += time.perf_counter() - start
+
+# ==========================================
+# WORKERS: one model per process, images decoded ahead on a thread
+# ==========================================
+_worker_embedder = None
+_worker_aligned = False
+
+def init_worker(aligned=False, intra_op_threads=None):
+    global _worker_embedder, _worker_aligned
+    _worker_embedder = load_model(intra_op_threads)
+    _worker_aligned = aligned
+
+def _decode_ahead(paths, out):
+    for path in paths:
+        start = time.perf_counter()
+        img = cv2.imread(path)
+        out.put((path, img, time.perf_counter() - start))
+    out.put(None)
+
+def embed_folder(paths):
+    """Runs in a worker: returns ([(path, embedding-or-None, quality-or-None), ...], stage timings)"""
+    timings = dict.fromkeys(STAGES, 0.0)
+    decoded = queue.Queue(maxsize=PREFETCH_IMAGES)   # Bounded: decoding never runs far ahead of the model
+    threading.Thread(target=_decode_ahead, args=(paths, decoded), daemon=True).start()
+
+    # Detect + align every image first...
+    crops, crop_paths, qualities = [], [], {}
+    while True:
+        item = decoded.get()
+        if item is None:
+            break
+        path, img, decode_s = item
+        timings['decode'] += decode_s
+        crop, quality = prepare_crop(_worker_embedder, img, _worker_aligned, timings) if img is not None else (None, None)
+        if crop is not None:
+            crops.append(crop)
+            crop_paths.append(path)
+            qualities[path] = quality
+
+    # ...then get the "Math" (Embeddings, already normalized) in batched ArcFace calls
+    start = time.perf_counter()
+    embeddings = dict(zip(crop_paths, _worker_embedder.embed_crops(crops)))
+    timings['embed'] += time.perf_counter() - start
+
+    return [(path, embeddings.get(path), qualities.get(path)) for path in paths], timings
+
+def compute_pending(pending, workers, aligned=False):
+    """Embeds {folder: [paths]} with N processes. Returns ({path: (embedding, quality)}, timings)."""
+    embeddings = {}
+    timings = dict.fromkeys(STAGES, 0.0)
+
+    def collect(folder_results):
+        results, folder_timings = folder_results
+        embeddings.update((path, (embedding, quality)) for path, embedding, quality in results)
+        for stage in STAGES:
+            timings[stage] += folder_timings[stage]
+
+    if workers <= 1:
+        init_worker(aligned)
+        for paths in pending.values():
+            collect(embed_folder(paths))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                 initargs=(aligned, max(1, (os.cpu_count() or 1) // workers))) as pool:
+            for folder_results in pool.map(embed_folder, pending.values()):
+                collect(folder_results)
+
+    return embeddings, timings
+
+# ==========================================
+# TRAINING
+# ==========================================
+def train(workers=1, aligned=False, compact_gallery=COMPACT, budget=BUDGET, holdout=False):
+    # 1. Load the embeddings of earlier runs. The model itself is only loaded
+    #    once we meet an image that is new or changed.
+    cache = EmbeddingCache.load(CACHE_FILE, cache_tag(aligned))
 
     known_embeddings = []
     known_names = []
-    
-    # 2. Loop through every folder in dataset/train
+    known_quality = []
+
     if not os.path.exists(DATASET_DIR):
         print(f"Error: Directory '{DATASET_DIR}' not found.")
         return
 
     print(f"Scanning '{DATASET_DIR}' for faces...")
-    
-    for folder_name in os.listdir(DATASET_DIR):
+
+    # 2. SCAN: Loop through every folder in dataset/train and sort images into
+    #    "cached" and "pending" (new or changed, needs the model)
+    plan = []       # (label, img_path, stat, digest, cached embedding, cached quality) in dataset order
+    pending = {}    # folder label -> [img_path, ...] that need the model
+
+    for folder_name in sorted(os.listdir(DATASET_DIR)):
         folder_path = os.path.join(DATASET_DIR, folder_name)
-        
+
         # We only care about folders
         if not os.path.isdir(folder_path):
             continue
-            
+
         # The folder name IS the label (e.g., "Abdulrahman Seyam - 20225389")
         person_label = folder_name
-        
-        print(f" -> Processing: {person_label}")
-        
-        # Scan images inside the folder
-        images_processed = 0
-        for img_name in os.listdir(folder_path):
+
+        for img_name in sorted(os.listdir(folder_path)):
             img_path = os.path.join(folder_path, img_name)
-            
-            # Read image
-            img = cv2.imread(img_path)
-            if img is None: continue
-            
-            # Detect faces
-            faces = app.get(img)
-            
-            # STRICT RULE: We only learn if there is exactly ONE face.
-            # If there are 0 or 2+ faces, we might learn the wrong person.
-            if len(faces) == 1:
-                # Get the "Math" (Embedding)
-                embedding = faces[0].embedding
-                
-                # NORMALIZE (Crucial for accuracy)
-                embedding = embedding / np.linalg.norm(embedding)
-                
-                known_embeddings.append(embedding)
-                known_names.append(person_label)
-                images_processed += 1
-        
-        print(f"    Learned {images_processed} images.")
-
-    # 3. Save the "Brain" to a file
+            if not os.path.isfile(img_path):
+                continue
+
+            # Unchanged since last run? (path + size + mtime)
+            stat = os.stat(img_path)
+            digest = None
+            hit, embedding, quality = cache.lookup(img_path, stat)
+
+            if not hit:
+                # Same content seen before (touched / renamed)?
+                with open(img_path, 'rb') as f:
+                    digest = file_digest(f.read())
+                hit, embedding, quality = cache.lookup_digest(digest)
+                if not hit:
+                    pending.setdefault(person_label, []).append(img_path)
+
+            plan.append((person_label, img_path, stat, digest, embedding, quality))
+
+    # 3. COMPUTE: new / changed images, sharded by person folder across workers
+    computed, timings = {}, dict.fromkeys(STAGES, 0.0)
+    to_compute = sum(len(paths) for paths in pending.values())
+    wall_s = 0.0
+    if to_compute:
+        print(f"🧠 Embedding {to_compute} new/changed images from {len(pending)} people with {workers} worker(s)...")
+        start = time.perf_counter()
+        computed, timings = compute_pending(pending, workers, aligned)
+        wall_s = time.perf_counter() - start
+
+    # 4. MERGE: always in dataset order, so the output is the same for any --workers
+    reused = recomputed = 0
+    learned = {}
+    for person_label, img_path, stat, digest, embedding, quality in plan:
+        if img_path in computed:
+            embedding, quality = computed[img_path]
+            recomputed += 1
+        else:
+            reused += 1
+        if digest is not None:
+            cache.put(img_path, stat, digest, embedding, quality)
+
+        if embedding is not None:
+            known_embeddings.append(embedding)
+            known_names.append(person_label)
+            known_quality.append(quality)
+            learned[person_label] = learned.get(person_label, 0) + 1
+
+    for person_label in dict.fromkeys(label for label, *_ in plan):
+        print(f" -> {person_label}: Learned {learned.get(person_label, 0)} images.")
+
+    # Removed images / folders are simply not "seen", so save() drops them
+    dropped = cache.save(CACHE_FILE, EMBEDDING_DIM)
+    print(f"\n♻️  Reused {reused} cached images, recomputed {recomputed}, dropped {dropped} removed from the dataset.")
+
+    if recomputed:
+        print(f"⚡ Throughput: {recomputed / wall_s:.1f} images/sec ({wall_s:.1f}s wall, {workers} worker(s))")
+        for stage in STAGES:
+            print(f"   {stage:<7} {timings[stage]:8.1f}s (all workers) | {timings[stage] / recomputed * 1000:7.1f} ms/image")
+
     if len(known_names) == 0:
         print("No faces were found! Check your images.")
         return
 
-    data = {
-        "embeddings": known_embeddings,
-        "names": known_names
-    }
+    # 5. COMPACT: drop blurry / tiny / low-confidence photos and near-duplicates,
+    #    keep up to `budget` diverse faces per person (the cache still has them all)
+    known_quality = [q if q is not None else (np.nan,) * 3 for q in known_quality]
+    if holdout:
+        report = evaluate(known_embeddings, known_names, known_quality, budget)
+        print(f"\n🧪 Held-out check ({report['probes']} photos): top-1 accuracy "
+              f"{report['full_accuracy']:.2%} with all {report['full_faces']} faces, "
+              f"{report['compact_accuracy']:.2%} with {report['compact_faces']} after compaction")
+
+    if compact_gallery:
+        keep, counters = compact(known_embeddings, known_names, known_quality, budget)
+        before = Counter(known_names)
+        known_embeddings = [known_embeddings[i] for i in keep]
+        known_names = [known_names[i] for i in keep]
+        after = Counter(known_names)
+        print(f"\n🗜️  Compaction (budget {budget or 'unlimited'}/person): kept {counters['kept']} of {counters['samples']} faces "
+              f"({1 - counters['kept'] / counters['samples']:.0%} smaller)")
+        for person_label, count in before.items():
+            if after[person_label] < count:
+                print(f" -> {person_label}: kept {after[person_label]} of {count} images (dropped {count - after[person_label]}).")
+        print(f"   dropped: {counters['low_det_score']} low score, {counters['low_face_px']} small, "
+              f"{counters['low_sharpness']} blurry, {counters['duplicates']} near-duplicates, "
+              f"{counters['over_budget']} over budget ({counters['rescued']} people kept their best photo anyway)")
+
+    # 6. Save the "Brain" to a file
+    gallery = FaceGallery.from_arrays(known_embeddings, known_names, model_name=MODEL_NAME)
+    gallery.save_store(SAVE_FILE)
 
-    with open(SAVE_FILE, 'wb') as f:
-        pickle.dump(data, f)
-        
     print(f"\n--- SUCCESS ---")
     print(f"Model trained on {len(set(known_names))} people.")
     print(f"Brain saved to: {SAVE_FILE}")
 
 if __name__ == "__main__":
-    train()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Build the face gallery from dataset/train")
+    parser.add_argument('--workers', type=int, default=1, help="Processes embedding images in parallel (each loads its own model)")
+    parser.add_argument('--aligned', action='store_true', help="Images are already-aligned 112x112 face crops: skip detection")
+    parser.add_argument('--budget', type=int, default=BUDGET, help="With --compact: max faces kept per person after quality filtering (0 = no cap)")
+    parser.add_argument('--compact', action='store_true', default=COMPACT,
+                        help="Drop poor / near-duplicate faces and keep at most --budget per person before saving")
+    parser.add_argument('--evaluate', action='store_true', help="Report held-out top-1 accuracy with and without compaction")
+    args = parser.parse_args()
+    train(workers=args.workers, aligned=args.aligned, compact_gallery=args.compact,
+          budget=args.budget, holdout=args.evaluate)
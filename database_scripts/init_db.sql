@@ -142,6 +142,11 @@ CREATE TABLE [dbo].[attendance_record](
 PRIMARY KEY CLUSTERED 
 (
 	[id] ASC
+)WITH (PAD_INDEX = OFF, STATISTICS_NORECOMPUTE = OFF, IGNORE_DUP_KEY = OFF, ALLOW_ROW_LOCKS = ON, ALLOW_PAGE_LOCKS = ON, OPTIMIZE_FOR_SEQUENTIAL_KEY = OFF) ON [PRIMARY],
+CONSTRAINT [UQ_attendance_session_student] UNIQUE NONCLUSTERED 
+(
+	[session_id] ASC,
+	[student_id] ASC
 )WITH (PAD_INDEX = OFF, STATISTICS_NORECOMPUTE = OFF, IGNORE_DUP_KEY = OFF, ALLOW_ROW_LOCKS = ON, ALLOW_PAGE_LOCKS = ON, OPTIMIZE_FOR_SEQUENTIAL_KEY = OFF) ON [PRIMARY]
 ) ON [PRIMARY]
 GO
@@ -304,6 +309,8 @@ CREATE TABLE [dbo].[student](
 	[password] [nvarchar](255) NULL,
 	[date_of_birth] [date] NULL,
 	[academic_year] [nvarchar](20) NULL,
+	[face_embedding] [varbinary](max) NULL,
+	[face_updated_at] [datetime] NULL,
 PRIMARY KEY CLUSTERED 
 (
 	[id] ASC
@@ -312,7 +319,7 @@ UNIQUE NONCLUSTERED
 (
 	[email] ASC
 )WITH (PAD_INDEX = OFF, STATISTICS_NORECOMPUTE = OFF, IGNORE_DUP_KEY = OFF, ALLOW_ROW_LOCKS = ON, ALLOW_PAGE_LOCKS = ON, OPTIMIZE_FOR_SEQUENTIAL_KEY = OFF) ON [PRIMARY]
-) ON [PRIMARY]
+) ON [PRIMARY] TEXTIMAGE_ON [PRIMARY]
 GO
 ALTER TABLE [dbo].[admin] ADD  DEFAULT ('Moderator') FOR [role]
 GO
@@ -387,6 +394,8 @@ GO
 ALTER TABLE [dbo].[instructor]  WITH CHECK ADD FOREIGN KEY([department_id])
 REFERENCES [dbo].[department] ([id])
 GO
+CREATE NONCLUSTERED INDEX [ix_student_face_updated] ON [dbo].[student] ([face_updated_at] ASC)
+GO
 USE [master]
 GO
 ALTER DATABASE [Attendsystem] SET  READ_WRITE 
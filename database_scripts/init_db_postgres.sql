@@ -0,0 +1,126 @@
+-- PostgreSQL version of init_db.sql (Linux servers, load tests, seed_db.py).
+-- Recreates every table: all existing rows are lost.
+
+DROP TABLE IF EXISTS attempt_log, attendance_record, enrollment, course_assignment, class_session,
+    course, classroom, camera, student, instructor, department, admin CASCADE;
+
+CREATE TABLE admin (
+    id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    username VARCHAR(50) NOT NULL UNIQUE,
+    password VARCHAR(50) NOT NULL,
+    full_name VARCHAR(100) NOT NULL,
+    email VARCHAR(100),
+    phone_number VARCHAR(20),
+    role VARCHAR(50) DEFAULT 'Moderator',
+    created_at TIMESTAMP DEFAULT LOCALTIMESTAMP
+);
+
+CREATE TABLE department (
+    id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    name VARCHAR(100) NOT NULL
+);
+
+CREATE TABLE instructor (
+    id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    first_name VARCHAR(50) NOT NULL,
+    last_name VARCHAR(50) NOT NULL,
+    email VARCHAR(100) UNIQUE,
+    phone_number VARCHAR(20),
+    department_id INTEGER REFERENCES department (id),
+    password VARCHAR(255) DEFAULT 'admin123',
+    role VARCHAR(50),
+    username VARCHAR(50)
+);
+
+CREATE TABLE student (
+    id INTEGER PRIMARY KEY,
+    first_name VARCHAR(50) NOT NULL,
+    last_name VARCHAR(50) NOT NULL,
+    email VARCHAR(100) UNIQUE,
+    phone_number VARCHAR(20),
+    password VARCHAR(255) DEFAULT '123456',
+    date_of_birth DATE,
+    academic_year VARCHAR(20),
+    facial_encoding TEXT,                -- Legacy JSON, see enrolled_faces.py --migrate
+    face_embedding BYTEA,                -- float32 little-endian, gallery.embedding_to_blob()
+    face_updated_at TIMESTAMP
+);
+
+CREATE TABLE camera (
+    id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    location VARCHAR(100)
+);
+
+CREATE TABLE classroom (
+    id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    building VARCHAR(50),
+    capacity INTEGER,
+    camera_id INTEGER REFERENCES camera (id)
+);
+
+CREATE TABLE course (
+    id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    credit_hours INTEGER,
+    department_id INTEGER REFERENCES department (id),
+    instructor_id INTEGER REFERENCES instructor (id)
+);
+
+CREATE TABLE course_assignment (
+    assignment_id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    course_id INTEGER REFERENCES course (id),
+    instructor_id INTEGER REFERENCES instructor (id),
+    role VARCHAR(50) DEFAULT 'Lecturer',
+    semester VARCHAR(20),
+    academic_year VARCHAR(20)
+);
+
+CREATE TABLE class_session (
+    session_id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    course_id INTEGER REFERENCES course (id),
+    instructor_id INTEGER REFERENCES instructor (id),
+    classroom_id INTEGER REFERENCES classroom (id),
+    session_type VARCHAR(50),
+    session_start TIMESTAMP,
+    session_end TIMESTAMP,
+    session_status VARCHAR(20) DEFAULT 'Scheduled',
+    attendance_start TIMESTAMP,
+    attendance_end TIMESTAMP
+);
+
+CREATE TABLE enrollment (
+    enrollment_id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    student_id INTEGER REFERENCES student (id) ON DELETE CASCADE,
+    course_id INTEGER REFERENCES course (id),
+    status VARCHAR(50) DEFAULT 'Enrolled',
+    enrolled_date DATE DEFAULT CURRENT_DATE,
+    semester VARCHAR(20),
+    academic_year VARCHAR(20)
+);
+
+CREATE TABLE attendance_record (
+    id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    session_id INTEGER REFERENCES class_session (session_id),
+    student_id INTEGER REFERENCES student (id) ON DELETE CASCADE,
+    method VARCHAR(50) DEFAULT 'FaceID',
+    status VARCHAR(50),
+    marked_at TIMESTAMP DEFAULT LOCALTIMESTAMP,
+    last_updated TIMESTAMP DEFAULT LOCALTIMESTAMP,
+    UNIQUE (session_id, student_id)
+);
+
+CREATE TABLE attempt_log (
+    log_id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    student_id INTEGER REFERENCES student (id),
+    session_id INTEGER REFERENCES class_session (session_id),
+    status VARCHAR(50),
+    image_metadata TEXT,
+    attempt_time TIMESTAMP DEFAULT LOCALTIMESTAMP
+);
+
+-- Lookups the API runs on every scan / dashboard load
+CREATE INDEX ix_enrollment_student ON enrollment (student_id, course_id);
+CREATE INDEX ix_enrollment_course ON enrollment (course_id);
+CREATE INDEX ix_session_course_start ON class_session (course_id, session_start);
+CREATE INDEX ix_attendance_student ON attendance_record (student_id);
+CREATE INDEX ix_student_face_updated ON student (face_updated_at);
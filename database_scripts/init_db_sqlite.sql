@@ -0,0 +1,141 @@
+-- SQLite version of init_db.sql (local runs, load tests, seed_db.py).
+-- Same tables and defaults; DATETIME values are stored as ISO text.
+-- Recreates every table: all existing rows are lost.
+
+PRAGMA foreign_keys = OFF;
+
+DROP TABLE IF EXISTS attempt_log;
+DROP TABLE IF EXISTS attendance_record;
+DROP TABLE IF EXISTS enrollment;
+DROP TABLE IF EXISTS course_assignment;
+DROP TABLE IF EXISTS class_session;
+DROP TABLE IF EXISTS course;
+DROP TABLE IF EXISTS classroom;
+DROP TABLE IF EXISTS camera;
+DROP TABLE IF EXISTS student;
+DROP TABLE IF EXISTS instructor;
+DROP TABLE IF EXISTS department;
+DROP TABLE IF EXISTS admin;
+
+PRAGMA foreign_keys = ON;
+
+CREATE TABLE admin (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL UNIQUE,
+    password TEXT NOT NULL,
+    full_name TEXT NOT NULL,
+    email TEXT,
+    phone_number TEXT,
+    role TEXT DEFAULT 'Moderator',
+    created_at DATETIME DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TABLE department (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL
+);
+
+CREATE TABLE instructor (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    first_name TEXT NOT NULL,
+    last_name TEXT NOT NULL,
+    email TEXT UNIQUE,
+    phone_number TEXT,
+    department_id INTEGER REFERENCES department (id),
+    password TEXT DEFAULT 'admin123',
+    role TEXT,
+    username TEXT
+);
+
+CREATE TABLE student (
+    id INTEGER PRIMARY KEY,
+    first_name TEXT NOT NULL,
+    last_name TEXT NOT NULL,
+    email TEXT UNIQUE,
+    phone_number TEXT,
+    password TEXT DEFAULT '123456',
+    date_of_birth DATE,
+    academic_year TEXT,
+    facial_encoding TEXT,                -- Legacy JSON, see enrolled_faces.py --migrate
+    face_embedding BLOB,                 -- float32 little-endian, gallery.embedding_to_blob()
+    face_updated_at DATETIME
+);
+
+CREATE TABLE camera (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    location TEXT
+);
+
+CREATE TABLE classroom (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    building TEXT,
+    capacity INTEGER,
+    camera_id INTEGER REFERENCES camera (id)
+);
+
+CREATE TABLE course (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    credit_hours INTEGER,
+    department_id INTEGER REFERENCES department (id),
+    instructor_id INTEGER REFERENCES instructor (id)
+);
+
+CREATE TABLE course_assignment (
+    assignment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    course_id INTEGER REFERENCES course (id),
+    instructor_id INTEGER REFERENCES instructor (id),
+    role TEXT DEFAULT 'Lecturer',
+    semester TEXT,
+    academic_year TEXT
+);
+
+CREATE TABLE class_session (
+    session_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    course_id INTEGER REFERENCES course (id),
+    instructor_id INTEGER REFERENCES instructor (id),
+    classroom_id INTEGER REFERENCES classroom (id),
+    session_type TEXT,
+    session_start DATETIME,
+    session_end DATETIME,
+    session_status TEXT DEFAULT 'Scheduled',
+    attendance_start DATETIME,
+    attendance_end DATETIME
+);
+
+CREATE TABLE enrollment (
+    enrollment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    student_id INTEGER REFERENCES student (id) ON DELETE CASCADE,
+    course_id INTEGER REFERENCES course (id),
+    status TEXT DEFAULT 'Enrolled',
+    enrolled_date DATE DEFAULT (date('now', 'localtime')),
+    semester TEXT,
+    academic_year TEXT
+);
+
+CREATE TABLE attendance_record (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id INTEGER REFERENCES class_session (session_id),
+    student_id INTEGER REFERENCES student (id) ON DELETE CASCADE,
+    method TEXT DEFAULT 'FaceID',
+    status TEXT,
+    marked_at DATETIME DEFAULT (datetime('now', 'localtime')),
+    last_updated DATETIME DEFAULT (datetime('now', 'localtime')),
+    UNIQUE (session_id, student_id)
+);
+
+CREATE TABLE attempt_log (
+    log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    student_id INTEGER REFERENCES student (id),
+    session_id INTEGER REFERENCES class_session (session_id),
+    status TEXT,
+    image_metadata TEXT,
+    attempt_time DATETIME DEFAULT (datetime('now', 'localtime'))
+);
+
+-- Lookups the API runs on every scan / dashboard load
+CREATE INDEX ix_enrollment_student ON enrollment (student_id, course_id);
+CREATE INDEX ix_enrollment_course ON enrollment (course_id);
+CREATE INDEX ix_session_course_start ON class_session (course_id, session_start);
+CREATE INDEX ix_attendance_student ON attendance_record (student_id);
+CREATE INDEX ix_student_face_updated ON student (face_updated_at);
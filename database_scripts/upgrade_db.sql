@@ -0,0 +1,35 @@
+-- Brings an existing Attendsystem database up to the schema in init_db.sql.
+-- Every step checks before it changes anything, so the script can be run again.
+USE [Attendsystem]
+GO
+/****** student: stored face embeddings (enroll.py, enrolled_faces.py) ******/
+IF COL_LENGTH('dbo.student', 'face_embedding') IS NULL
+	ALTER TABLE [dbo].[student] ADD [face_embedding] [varbinary](max) NULL
+GO
+IF COL_LENGTH('dbo.student', 'face_updated_at') IS NULL
+	ALTER TABLE [dbo].[student] ADD [face_updated_at] [datetime] NULL
+GO
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = N'ix_student_face_updated' AND object_id = OBJECT_ID(N'dbo.student'))
+	CREATE NONCLUSTERED INDEX [ix_student_face_updated] ON [dbo].[student] ([face_updated_at] ASC)
+GO
+/****** attendance_record: one row per student per session (the MERGE ... WITH (HOLDLOCK) upsert relies on it) ******/
+SET XACT_ABORT ON
+GO
+IF NOT EXISTS (SELECT 1 FROM sys.key_constraints WHERE name = N'UQ_attendance_session_student' AND parent_object_id = OBJECT_ID(N'dbo.attendance_record'))
+BEGIN
+	BEGIN TRANSACTION
+	-- Duplicates would block the constraint: keep each student's first mark in a session
+	;WITH ranked AS (
+		SELECT ROW_NUMBER() OVER (PARTITION BY [session_id], [student_id]
+		                          ORDER BY CASE WHEN [marked_at] IS NULL THEN 1 ELSE 0 END, [marked_at], [id]) AS n
+		FROM [dbo].[attendance_record] WITH (TABLOCKX, HOLDLOCK)
+	)
+	DELETE FROM ranked WHERE n > 1
+	ALTER TABLE [dbo].[attendance_record] ADD CONSTRAINT [UQ_attendance_session_student] UNIQUE NONCLUSTERED 
+	(
+		[session_id] ASC,
+		[student_id] ASC
+	)
+	COMMIT TRANSACTION
+END
+GO